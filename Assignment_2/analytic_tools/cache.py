@@ -0,0 +1,141 @@
+"""Module containing the binary cache of parsed .csv files.
+
+The array parsed from a file is saved as a .npy file in the cache directory, named by a hash of the absolute path,
+size and modification time of the file. A changed file therefore gets a new entry, and the stale entry ages out.
+Cached arrays are memory-mapped read-only, so processes reading the same entry share its pages through the OS cache.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+from pathlib import Path
+import threading
+from typing import Callable
+
+import numpy as np
+
+from analytic_tools.readers import read_csv_series
+
+
+class ParseCache:
+    """Size bounded, least recently used cache of parsed files.
+
+    Attributes:
+        - cache_dir (pathlib.Path) : Absolute path to the directory holding the .npy entries
+        - max_bytes (int) : Total size of the entries above which the least recently used are deleted, unbounded if None
+        - hits (int) : Number of reads served from the cache
+        - misses (int) : Number of reads that had to parse the file
+    """
+
+    def __init__(self, cache_dir: str or Path, max_bytes: int = None) -> None:
+        if not isinstance(cache_dir, (str, Path)):
+            raise TypeError("Invalid type for cache_dir. Expected a path...")
+
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes should not be negative")
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Entry names mapped to their sizes, least recently used first
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".npy") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total = sum(self._entries.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def key(self, path: str or Path) -> str:
+        """Return the name of the cache entry of the file pointed to by path in its current state."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        fingerprint = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()
+        return hashlib.sha1(fingerprint).hexdigest() + ".npy"
+
+    def load(self, path: str or Path, parse: Callable[[Path], np.ndarray] = read_csv_series) -> np.ndarray:
+        """Return the array parsed from the file pointed to by path, parsing and caching it if it is not cached yet.
+
+        Parameters:
+            - path (str or pathlib.Path) : Absolute path to the file to read
+            - parse (Callable) : Function parsing the file into an array, default to read_csv_series
+
+        Returns:
+            - (np.ndarray) : The parsed array, a read-only memory map on a cache hit
+        """
+        name = self.key(path)
+        entry = self.cache_dir / name
+
+        with self._lock:
+            cached = name in self._entries
+            if cached:
+                self._entries.move_to_end(name)
+
+        # The entry may also have been written by another process sharing the cache directory
+        if cached or entry.exists():
+            try:
+                array = self._read(entry)
+                os.utime(entry)
+                self.hits += 1
+                if not cached:
+                    self._add(name, entry)
+                return array
+            except FileNotFoundError:
+                # Evicted by another process sharing the cache directory
+                with self._lock:
+                    self._total -= self._entries.pop(name, 0)
+
+        array = parse(Path(path))
+        self.misses += 1
+        tmp_entry = entry.with_name(f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_entry, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_entry, entry)
+
+        self._add(name, entry)
+        return array
+
+    def _add(self, name: str, entry: Path) -> None:
+        size = entry.stat().st_size
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = size
+                self._total += size
+            self._evict()
+
+    def _read(self, entry: Path) -> np.ndarray:
+        try:
+            return np.load(entry, mmap_mode="r")
+        except ValueError:
+            # Arrays without data cannot be memory-mapped
+            return np.load(entry)
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        while self._total > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(self.cache_dir / name)
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Delete every entry of the cache."""
+        with self._lock:
+            for name in self._entries:
+                try:
+                    os.unlink(self.cache_dir / name)
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total = 0
@@ -0,0 +1,225 @@
+"""Module containing the persistent catalog of the files of a directory tree, kept in a SQLite database.
+
+The catalog stores every directory with its modification time, and every file with its source directory, gas,
+suffix, size, modification time and, for .csv files, number of data rows. A refresh only lists the directories whose
+modification time changed since the last refresh, so an unchanged archive costs one stat call per directory.
+Diagnostics and the files of a gas are then answered from the indexes of the database without walking the tree.
+
+Adding, removing or renaming a file changes the modification time of its directory, but rewriting a file in place
+does not. Such edits are only picked up by a full refresh.
+"""
+import os
+from pathlib import Path
+import sqlite3
+from typing import Dict, List
+
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier, name_suffix
+from analytic_tools.scanning import DirectoryNode
+
+CATALOG_NAME = "catalog.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    gas TEXT,
+    suffix TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    rows INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_gas ON files (gas);
+CREATE INDEX IF NOT EXISTS files_suffix ON files (suffix);
+"""
+
+
+def count_csv_rows(path: str or Path) -> int:
+    """Count the data rows of a .csv file, that is its non-empty lines after the header line."""
+    with open(path, "rb") as f:
+        f.readline()
+        return sum(1 for line in f if line.strip())
+
+
+def _join(rel: str, name: str) -> str:
+    return f"{rel}/{name}" if rel else name
+
+
+class Catalog:
+    """Catalog of the directory tree with root directory root, stored in the SQLite database db_path.
+
+    Attributes:
+        - root (pathlib.Path) : Absolute path to the cataloged directory
+        - db_path (pathlib.Path) : Absolute path to the database file
+        - classifier (Classifier) : Classifies the files into diagnostic buckets and gases
+    """
+
+    def __init__(self, db_path: str or Path, root: str or Path, classifier: Classifier = None) -> None:
+        if not isinstance(db_path, (str, Path)) or not isinstance(root, (str, Path)):
+            raise TypeError("Invalid type for directiory. Expected a path...")
+
+        self.db_path = Path(db_path)
+        self.root = Path(root)
+        self.classifier = classifier if classifier is not None else DEFAULT_CLASSIFIER
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def refresh(self, full: bool = False) -> int:
+        """Bring the catalog up to date with the directory tree in one transaction.
+
+        Parameters:
+            - full (bool) : List every directory and stat every file, even in the directories whose modification
+                            time did not change, to pick up files rewritten in place
+
+        Returns:
+            - (int) : Number of directories listed
+        """
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"'{self.root}' is not a directiory...")
+
+        listed = 0
+        with self._conn as conn:
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                try:
+                    mtime_ns = os.stat(self.root / rel).st_mtime_ns
+                except FileNotFoundError:
+                    # Removed during the refresh, its parent will be listed again next time
+                    self._remove_dir(rel)
+                    continue
+
+                row = conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (rel,)).fetchone()
+                if not full and row is not None and row[0] == mtime_ns:
+                    stack.extend(path for (path,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (rel,)))
+                    continue
+
+                listed += 1
+                stack.extend(self._list_dir(rel, mtime_ns))
+
+        return listed
+
+    def _list_dir(self, rel: str, mtime_ns: int) -> List[str]:
+        conn = self._conn
+        conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+            (rel, rel.rpartition("/")[0] if rel else None, mtime_ns),
+        )
+        known = {
+            name: (size, file_mtime_ns)
+            for name, size, file_mtime_ns in conn.execute(
+                "SELECT name, size, mtime_ns FROM files WHERE dir = ?", (rel,)
+            )
+        }
+        source = os.path.basename(rel)
+        subdirs = []
+        names = set()
+        try:
+            entries = os.scandir(self.root / rel)
+        except (FileNotFoundError, NotADirectoryError):
+            # Removed since it was stat'ed, its parent will be listed again next time
+            self._remove_dir(rel)
+            return []
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(_join(rel, entry.name))
+                elif entry.is_file():
+                    names.add(entry.name)
+                    stat = entry.stat()
+                    if known.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    suffix = name_suffix(entry.name)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files (path, dir, name, source, gas, suffix, size, mtime_ns, rows)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            _join(rel, entry.name),
+                            rel,
+                            entry.name,
+                            source,
+                            self.classifier.gas_of(entry.name),
+                            suffix,
+                            stat.st_size,
+                            stat.st_mtime_ns,
+                            count_csv_rows(entry.path) if suffix == ".csv" else None,
+                        ),
+                    )
+
+        conn.executemany(
+            "DELETE FROM files WHERE path = ?", ((_join(rel, name),) for name in known.keys() - names)
+        )
+        kept = set(subdirs)
+        for (path,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (rel,)).fetchall():
+            if path not in kept:
+                self._remove_dir(path)
+        return subdirs
+
+    def _remove_dir(self, rel: str) -> None:
+        # Remove the directory and everything below it, comparing prefixes rather than using LIKE,
+        # whose wildcards may appear in file names
+        prefix = rel + "/"
+        for table in ("files", "dirs"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE path = ? OR substr(path, 1, ?) = ?", (rel, len(prefix), prefix)
+            )
+
+    def diagnostics(self) -> Dict[str, int]:
+        """Return the counts of get_diagnostics for the cataloged tree, as of the last refresh.
+
+        Returns:
+            - (Dict[str, int]) : The number of files, subdirectories and files in each bucket of the classifier
+        """
+        res = {"files": 0, "subdirectories": 0}
+        res.update(dict.fromkeys(self.classifier.bucket_names(), 0))
+        (dirs,) = self._conn.execute("SELECT count(*) FROM dirs").fetchone()
+        res["subdirectories"] = max(dirs - 1, 0)
+        for suffix, count in self._conn.execute("SELECT suffix, count(*) FROM files GROUP BY suffix"):
+            res["files"] += count
+            res[self.classifier.buckets.get(suffix, self.classifier.other)] += count
+        return res
+
+    def gases(self) -> List[str]:
+        """Return the gas formulas with at least one original gas .csv file, sorted."""
+        return [gas for (gas,) in self._conn.execute("SELECT DISTINCT gas FROM files WHERE gas IS NOT NULL ORDER BY gas")]
+
+    def gas_files(self, gas: str) -> List[Path]:
+        """Return the absolute paths to the original .csv files of gas, sorted by path."""
+        return [
+            self.root / path
+            for (path,) in self._conn.execute("SELECT path FROM files WHERE gas = ? ORDER BY path", (gas,))
+        ]
+
+    def rows(self, path: str or Path) -> int or None:
+        """Return the number of data rows recorded for the .csv file pointed to by path, None if it is unknown."""
+        rel = Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+        row = self._conn.execute("SELECT rows FROM files WHERE path = ?", (rel,)).fetchone()
+        return row[0] if row is not None else None
+
+    def index(self) -> DirectoryNode:
+        """Rebuild the tree of the last refresh as a DirectoryNode, to use in place of scan_directory."""
+        nodes = {"": DirectoryNode(str(self.root))}
+        for path, parent in self._conn.execute("SELECT path, parent FROM dirs WHERE path != '' ORDER BY path"):
+            node = DirectoryNode(str(self.root / path))
+            nodes[path] = node
+            nodes[parent].subdirs.append(node)
+        for dir, name in self._conn.execute("SELECT dir, name FROM files ORDER BY dir, name"):
+            nodes[dir].files.append(name)
+        return nodes[""]
@@ -0,0 +1,116 @@
+"""Module containing the classification of files by name, used by the diagnostics and the restructuring.
+
+A file is classified from its name alone, never its full path, so a directory called notes.md does not make the
+files below it .md files. The suffix is looked up in a dict built once, and the gas formulas are kept in a frozenset,
+so classifying a name is a constant amount of work whatever the number of buckets or gases.
+
+The original gas files are the [gas_formula].csv files. A classifier made with binary=True also takes the
+[gas_formula]_[number].npy series found next to them as original gas files, see analytic_tools.readers.
+"""
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Mapping
+
+GAS_FORMULAS = frozenset(["CO2", "CH4", "N2O", "SF6", "H2"])
+
+SUFFIX_BUCKETS = {
+    ".csv": ".csv files",
+    ".txt": ".txt files",
+    ".npy": ".npy files",
+    ".md": ".md files",
+}
+
+OTHER_BUCKET = "other files"
+
+
+def name_suffix(name: str) -> str:
+    """Return the lowercased suffix of a file name, e.g. .csv for CO2.CSV, or an empty string if it has none.
+        As for pathlib, a name starting with its only dot such as .DS_Store has no suffix.
+    """
+    dot = name.rfind(".")
+    if dot <= 0:
+        return ""
+    return name[dot:].lower()
+
+
+def series_gas(name: str) -> str:
+    """Return the gas formula a series file is named after, e.g. CO2 for CO2.csv and for CO2_123.npy."""
+    dot = name.rfind(".")
+    stem = name[:dot] if dot > 0 else name
+    return stem.partition("_")[0]
+
+
+class Classifier:
+    """Classifies file names into diagnostic buckets and recognizes the original gas files.
+
+    Attributes:
+        - gases (frozenset) : The gas formulas of the original [gas_formula].csv files
+        - buckets (Dict[str, str]) : Lowercased suffixes mapped to the name of their bucket
+        - other (str) : Bucket of the names whose suffix is not in buckets
+        - binary (bool) : Whether the [gas_formula]_[number].npy series are original gas files as well
+    """
+
+    def __init__(
+        self,
+        gases: Iterable[str] = GAS_FORMULAS,
+        buckets: Mapping[str, str] = SUFFIX_BUCKETS,
+        other: str = OTHER_BUCKET,
+        binary: bool = False,
+    ) -> None:
+        if isinstance(gases, str):
+            raise TypeError("Invalid type for gases. Expected an iterable of gas formulas")
+
+        self.gases = frozenset(gases)
+        self.buckets = {suffix.lower(): bucket for suffix, bucket in buckets.items()}
+        self.other = other
+        self.binary = binary
+
+    def bucket(self, name: str) -> str:
+        """Return the bucket of the file called name."""
+        return self.buckets.get(name_suffix(name), self.other)
+
+    def gas_of(self, name: str) -> str or None:
+        """Return the gas formula of the file called name if it is an original gas file, None otherwise."""
+        suffix = name[-4:].lower()
+        if suffix == ".csv":
+            stem = name[:-4]
+            return stem if stem in self.gases else None
+        if suffix == ".npy" and self.binary:
+            gas, _, number = name[:-4].partition("_")
+            return gas if gas in self.gases and number.isdigit() else None
+        return None
+
+    def is_gas_csv(self, name: str) -> bool:
+        """Return whether the file called name is an original [gas_formula].csv file, whatever binary is."""
+        return name[-4:].lower() == ".csv" and self.gas_of(name) is not None
+
+    def is_gas_series(self, name: str) -> bool:
+        """Return whether the file called name is an original gas file, including the .npy series if binary is true."""
+        return self.gas_of(name) is not None
+
+    def bucket_names(self) -> List[str]:
+        """Return the names of all the buckets, the other bucket last."""
+        return list(dict.fromkeys(self.buckets.values())) + [self.other]
+
+    def count(self, names: Iterable[str]) -> Dict[str, int]:
+        """Batch classification: count the names falling in each bucket, including the empty buckets.
+
+        Parameters:
+            - names (Iterable[str]) : File names, e.g. the files of a DirectoryNode
+
+        Returns:
+            - (Dict[str, int]) : The number of names in each bucket
+        """
+        counts = dict.fromkeys(self.bucket_names(), 0)
+        counts.update(Counter(map(self.bucket, names)))
+        return counts
+
+    def gas_csvs(self, names: Iterable[str]) -> Iterator[str]:
+        """Batch classification: yield the names of the original [gas_formula].csv files among names, in order."""
+        return filter(self.is_gas_csv, names)
+
+    def gas_series(self, names: Iterable[str]) -> Iterator[str]:
+        """Batch classification: yield the names of the original gas files among names, in order, see is_gas_series."""
+        return filter(self.is_gas_series, names)
+
+
+DEFAULT_CLASSIFIER = Classifier()
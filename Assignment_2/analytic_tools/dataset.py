@@ -0,0 +1,198 @@
+"""Module containing the columnar in-memory dataset of the year/emission series of every (gas, source) pair.
+
+All the series are parsed once. The rows of series number i are years[offsets[i]:offsets[i + 1]] and
+values[offsets[i]:offsets[i + 1]] of two contiguous columns, years and values. The columns are only built when they
+are first used, e.g. by the statistics, which need every series in memory anyway. Until then each series is kept as
+it was read, so the .npy series stay memory-mapped: plotting them and exporting them to a .gds file reads them one
+series at a time and never copies them all into memory.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from analytic_tools.readers import load_series
+
+
+def source_from_name(name: str, gas: str) -> str:
+    """Derive the source directory name from a restructured file name, e.g. src_agriculture from src_agriculture_CH4.csv.
+        Several .npy series of a source are told apart by their number, src_agriculture_198 for src_agriculture_CH4_198.npy.
+
+    Parameters:
+        - name (str) : Name of the restructured file
+        - gas (str) : Gas formula of the file
+
+    Returns:
+        - (str) : The source name, or the stem of the file if it is not named [source]_[gas_formula].[suffix]
+                  or [source]_[gas_formula]_[number].[suffix]
+    """
+    stem = Path(name).stem
+    marker = f"_{gas}"
+    if stem.endswith(marker):
+        return stem[: -len(marker)]
+    i = stem.rfind(marker + "_")
+    if i > 0:
+        return stem[:i] + stem[i + len(marker):]
+    return stem
+
+
+class GasDataset:
+    """The year/emission series of every (gas, source) pair, stored in contiguous arrays.
+
+    Attributes:
+        - keys (List[Tuple[str, str]]) : The (gas, source) pair of each series, in the order they were loaded
+        - years (np.ndarray) : Years of all the series, back to back, built on first use
+        - values (np.ndarray) : Emissions of all the series, back to back, built on first use
+        - offsets (np.ndarray) : Start of each series in years and values, with the total length appended
+    """
+
+    def __init__(self, keys: List[Tuple[str, str]], arrays: List[np.ndarray]) -> None:
+        self.keys = list(keys)
+        lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+        self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        # The series as they were read, memory maps for the .npy files, until the columns are built
+        self._arrays = list(arrays)
+        self._years = None
+        self._values = None
+        self._lookup = {key: i for i, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_columns(
+        cls, keys: List[Tuple[str, str]], years: np.ndarray, values: np.ndarray, offsets: np.ndarray
+    ) -> "GasDataset":
+        """Wrap existing columns without copying them, e.g. arrays memory-mapped from an exported file."""
+        dataset = cls.__new__(cls)
+        dataset.keys = list(keys)
+        dataset._arrays = None
+        dataset._years = years
+        dataset._values = values
+        dataset.offsets = np.asarray(offsets, dtype=np.int64)
+        dataset._lookup = {key: i for i, key in enumerate(dataset.keys)}
+        return dataset
+
+    @classmethod
+    def from_files(cls, files: Iterable[Tuple[str, str, Path]], cache=None) -> "GasDataset":
+        """Load a dataset from (gas, source, path) triples, reading each file exactly once with the reader of its suffix.
+            If cache, an analytic_tools.cache.ParseCache, is given the files that have to be parsed are read through it.
+        """
+        keys = []
+        arrays = []
+        for gas, source, path in files:
+            keys.append((gas, source))
+            arrays.append(load_series(path, cache))
+        return cls(keys, arrays)
+
+    @classmethod
+    def from_by_gas_dir(cls, by_gas_dir: str or Path, gases: Iterable[str] = None, cache=None) -> "GasDataset":
+        """Load a dataset from the gas_[gas_formula] subdirectories of pollution_data_restructured/by_gas.
+
+        Parameters:
+            - by_gas_dir (str or pathlib.Path) : Absolute path to the by_gas directory
+            - gases (Iterable[str]) : Gas formulas to load, all gas_[gas_formula] subdirectories are loaded if not given
+            - cache (ParseCache) : Binary cache the files are read through, the files are parsed directly if not given
+
+        Returns:
+            - (GasDataset) : The loaded dataset
+        """
+        by_gas_dir = Path(by_gas_dir)
+        if not by_gas_dir.is_dir():
+            raise NotADirectoryError(f"Object pointed to by {by_gas_dir} is not a directory")
+
+        if gases is not None:
+            gases = set(gases)
+
+        def files():
+            for gas_subdir in sorted(by_gas_dir.iterdir()):
+                gas = gas_subdir.name[len("gas_"):]
+                if not gas_subdir.is_dir() or (gases is not None and gas not in gases):
+                    continue
+                for file in sorted(gas_subdir.iterdir()):
+                    yield gas, source_from_name(file.name, gas), file
+
+        return cls.from_files(files(), cache)
+
+    @classmethod
+    def from_view(cls, view: Dict[str, Dict[str, Path]], cache=None) -> "GasDataset":
+        """Load a dataset from a virtual by_gas view built by analytic_tools.restructuring.gas_view."""
+        return cls.from_files(
+            (
+                (gas, source_from_name(name, gas), path)
+                for gas, files in view.items()
+                for name, path in files.items()
+            ),
+            cache,
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def rows(self) -> int:
+        """Total number of rows of all the series."""
+        return int(self.offsets[-1])
+
+    @property
+    def years(self) -> np.ndarray:
+        if self._years is None:
+            self._build_columns()
+        return self._years
+
+    @property
+    def values(self) -> np.ndarray:
+        if self._values is None:
+            self._build_columns()
+        return self._values
+
+    def _build_columns(self) -> None:
+        data = np.concatenate(self._arrays) if self._arrays else np.empty((0, 2))
+        self._years = np.ascontiguousarray(data[:, 0])
+        self._values = np.ascontiguousarray(data[:, 1])
+        self._arrays = None
+
+    def iter_columns(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield the years and the emissions of each series in order, without building the columns."""
+        for key in self.keys:
+            yield self.series(*key)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._lookup
+
+    def gases(self) -> List[str]:
+        """Return the gas formulas in the dataset, in the order they were loaded."""
+        return list(dict.fromkeys(gas for gas, _ in self.keys))
+
+    def sources(self, gas: str) -> List[str]:
+        """Return the sources with a series for gas, in the order they were loaded."""
+        return [source for key_gas, source in self.keys if key_gas == gas]
+
+    def subset(self, gases: Iterable[str]) -> "GasDataset":
+        """Return a new dataset holding only the series of the given gas formulas, e.g. to send to another process."""
+        gases = set(gases)
+        keys = [key for key in self.keys if key[0] in gases]
+        if self._arrays is not None:
+            arrays = [self._arrays[self._lookup[key]] for key in keys]
+        else:
+            arrays = [np.column_stack(self.series(*key)) for key in keys]
+        return GasDataset(keys, arrays)
+
+    def series(self, gas: str, source: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the years and the emissions of the (gas, source) series as views into the series as read, or into
+            the columns once they are built.
+
+        Parameters:
+            - gas (str) : Gas formula of the series
+            - source (str) : Source directory name of the series, e.g. src_agriculture
+
+        Returns:
+            - (Tuple[np.ndarray, np.ndarray]) : The years and the emissions
+        """
+        try:
+            i = self._lookup[(gas, source)]
+        except KeyError:
+            raise KeyError(f"No series for gas {gas} from source {source}") from None
+        if self._arrays is not None:
+            array = self._arrays[i]
+            return array[:, 0], array[:, 1]
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return self._years[start:stop], self._values[start:stop]
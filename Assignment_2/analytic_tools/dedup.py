@@ -0,0 +1,90 @@
+"""Module containing the detection of byte-identical files, used by the deduplicating restructuring.
+
+The files are first bucketed by size, which is known from a stat call. A file alone in its size bucket cannot have
+a duplicate and is never read, only the files sharing a size are hashed, in a thread pool since hashlib releases the
+GIL while hashing. Files with the same size and BLAKE2b digest are duplicates of the first of them in the given order.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from analytic_tools.manifest import file_hash
+
+MODES = ("skip", "link")
+
+
+def check_mode(mode: str) -> None:
+    """Raise an error if mode is not one of MODES."""
+    if not isinstance(mode, str):
+        raise TypeError("Invalid type for dedup. Expected type str")
+
+    if mode not in MODES:
+        raise ValueError(f"Invalid dedup mode: {mode}, expected one of {', '.join(MODES)}")
+
+
+class DedupReport:
+    """Outcome of a search for duplicates.
+
+    Attributes:
+        - duplicates (Dict[pathlib.Path, pathlib.Path]) : Each duplicate file mapped to the first file with the same content
+        - files (int) : Number of files examined
+        - hashed (int) : Number of files that had to be hashed, the others had a size of their own
+        - bytes_saved (int) : Total size of the duplicates, which need not be copied
+    """
+
+    def __init__(self) -> None:
+        self.duplicates: Dict[Path, Path] = {}
+        self.files = 0
+        self.hashed = 0
+        self.bytes_saved = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{len(self.duplicates)} duplicate files, {self.bytes_saved} bytes saved, "
+            f"{self.hashed} of {self.files} files hashed"
+        )
+
+
+def find_duplicates(paths: Iterable[Path], workers: int = 1) -> DedupReport:
+    """Find the files among paths whose content is identical to an earlier file.
+
+    Parameters:
+        - paths (Iterable[pathlib.Path]) : Absolute paths to the files to compare, the first of identical files is kept
+        - workers (int) : Number of threads hashing files, default to one
+
+    Returns:
+        - (DedupReport) : The duplicates and the number of files examined, hashed and bytes saved
+    """
+    if not isinstance(workers, int) or isinstance(workers, bool):
+        raise TypeError("Invalid type for workers. Expected type int")
+
+    if workers < 1:
+        raise ValueError("workers should be at least 1")
+
+    report = DedupReport()
+    by_size: Dict[int, List[Path]] = {}
+    for path in paths:
+        by_size.setdefault(os.stat(path).st_size, []).append(path)
+        report.files += 1
+
+    candidates = [path for group in by_size.values() if len(group) > 1 for path in group]
+    report.hashed = len(candidates)
+    if workers == 1 or len(candidates) < 2:
+        digests = list(map(file_hash, candidates))
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = list(pool.map(file_hash, candidates))
+
+    digest_of = dict(zip(candidates, digests))
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        first: Dict[str, Path] = {}
+        for path in group:
+            original = first.setdefault(digest_of[path], path)
+            if original is not path:
+                report.duplicates[path] = original
+                report.bytes_saved += size
+    return report
@@ -0,0 +1,227 @@
+"""Module containing the bulk removal of files and directory trees, used to clean up old restructured outputs.
+
+A tree is removed in two passes. First its directories are emptied in a thread pool: each task reads one directory
+with os.scandir, unlinks every entry that is not a directory, and hands its subdirectories back to be emptied by
+other tasks. Then the directories are removed bottom-up, the deepest first. Symbolic links are unlinked, never
+followed. An error on one entry is recorded in the report and the removal goes on with the others.
+"""
+from collections import deque
+import os
+from pathlib import Path
+import stat
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+class DeletionReport:
+    """Outcome of a removal.
+
+    Attributes:
+        - files (int) : Number of files and links removed, or that would be removed in a dry run
+        - dirs (int) : Number of directories removed, or that would be removed in a dry run
+        - bytes_freed (int) : Total size of the files whose last link was removed. A file with hard links outside the
+                              removed paths, such as a deduplicated by_gas copy, frees no space and is not counted
+        - errors (List[Tuple[pathlib.Path, OSError]]) : The paths that could not be removed and why
+        - dry_run (bool) : Whether nothing was actually removed
+    """
+
+    def __init__(self, dry_run: bool = False) -> None:
+        self.files = 0
+        self.dirs = 0
+        self.bytes_freed = 0
+        self.errors: List[Tuple[Path, OSError]] = []
+        self.dry_run = dry_run
+        self._lock = threading.Lock()
+        # The (device, inode) of the files with several links mapped to the number of their links not removed yet
+        self._links: Dict[Tuple[int, int], int] = {}
+
+    def add(self, files: int, bytes_freed: int, errors: List[Tuple[Path, OSError]]) -> None:
+        with self._lock:
+            self.files += files
+            self.bytes_freed += bytes_freed
+            self.errors.extend(errors)
+
+    def freed(self, stat: os.stat_result) -> int:
+        """Return the bytes freed by removing one link of the file of stat, its size if it is the last link."""
+        key = (stat.st_dev, stat.st_ino)
+        if stat.st_nlink == 1 and key not in self._links:
+            return stat.st_size
+        with self._lock:
+            # Counted from the number of links when first seen, since it drops as the links are removed
+            remaining = self._links.get(key, stat.st_nlink) - 1
+            if remaining:
+                self._links[key] = remaining
+                return 0
+            self._links.pop(key, None)
+            return stat.st_size
+
+    def __str__(self) -> str:
+        verb = "Would remove" if self.dry_run else "Removed"
+        return (
+            f"{verb} {self.files} files and {self.dirs} directories, {self.bytes_freed} bytes"
+            + (f", {len(self.errors)} errors" if self.errors else "")
+        )
+
+
+def _check_safe(path: Path) -> None:
+    """Refuse to remove a filesystem root or a directory containing the current working directory."""
+    absolute = Path(os.path.abspath(path))
+    if absolute == Path(absolute.anchor):
+        raise ValueError(f"Refusing to remove the filesystem root {absolute}")
+    cwd = Path.cwd()
+    if absolute == cwd or absolute in cwd.parents:
+        raise ValueError(f"Refusing to remove {absolute}, which contains the current working directory")
+
+
+def _empty_directory(path: str, report: DeletionReport, dry_run: bool) -> List[str]:
+    """Unlink every entry of the directory pointed to by path that is not a directory, and return its subdirectories."""
+    subdirs = []
+    files = 0
+    bytes_freed = 0
+    errors = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    size = report.freed(entry.stat(follow_symlinks=False)) if entry.is_file(follow_symlinks=False) else 0
+                    if not dry_run:
+                        os.unlink(entry.path)
+                    files += 1
+                    bytes_freed += size
+                except OSError as error:
+                    errors.append((Path(entry.path), error))
+    except OSError as error:
+        errors.append((Path(path), error))
+    report.add(files, bytes_freed, errors)
+    return subdirs
+
+
+def _remove_directory(path: str, dry_run: bool) -> OSError or None:
+    """Remove the empty directory pointed to by path, returning the error instead of raising it."""
+    try:
+        if not dry_run:
+            os.rmdir(path)
+    except OSError as error:
+        return error
+    return None
+
+
+def _remove_tree(root: str, report: DeletionReport, workers: int, dry_run: bool) -> None:
+    # The directories of the tree by depth, to remove the deepest first
+    levels: List[List[str]] = [[root]]
+
+    def found(depth: int, subdirs: List[str]) -> None:
+        if subdirs:
+            if len(levels) == depth + 1:
+                levels.append([])
+            levels[depth + 1].extend(subdirs)
+
+    if workers == 1:
+        stack = [(0, root)]
+        while stack:
+            depth, path = stack.pop()
+            subdirs = _empty_directory(path, report, dry_run)
+            found(depth, subdirs)
+            stack.extend((depth + 1, subdir) for subdir in subdirs)
+        results = [list(map(_remove_directory, level, [dry_run] * len(level))) for level in reversed(levels)]
+    else:
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        waiting = deque([(0, root)])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while waiting or running:
+                # At most two directories per worker are queued in the pool at a time
+                while waiting and len(running) < 2 * workers:
+                    depth, path = waiting.popleft()
+                    running[pool.submit(_empty_directory, path, report, dry_run)] = depth
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = running.pop(future)
+                    subdirs = future.result()
+                    found(depth, subdirs)
+                    waiting.extend((depth + 1, subdir) for subdir in subdirs)
+            # A level is only removed once the deeper levels are gone
+            results = [
+                list(pool.map(_remove_directory, level, [dry_run] * len(level))) for level in reversed(levels)
+            ]
+
+    for level, errors in zip(reversed(levels), results):
+        for path, error in zip(level, errors):
+            if error is None:
+                report.dirs += 1
+            else:
+                report.errors.append((Path(path), error))
+
+
+def remove_paths(
+    paths: Iterable[str or Path],
+    workers: int = 1,
+    dry_run: bool = False,
+    confirm: Callable[[str], bool] = None,
+) -> DeletionReport:
+    """Remove the files and the whole directory trees pointed to by paths.
+
+    Parameters:
+        - paths (Iterable[str or pathlib.Path]) : Absolute paths to the files and directories to remove
+        - workers (int) : Number of threads emptying the directories of a tree, default to one
+        - dry_run (bool) : Only count what would be removed, without removing anything
+        - confirm (Callable[[str], bool]) : Asked once with a description of the batch before anything is removed,
+                                            nothing is removed if it returns false. Not asked in a dry run,
+                                            and the paths are removed without asking if not given
+
+    Returns:
+        - (DeletionReport) : The number of files and directories removed, the bytes freed and the errors
+    """
+    if not isinstance(workers, int) or isinstance(workers, bool):
+        raise TypeError("Invalid type for workers. Expected type int")
+
+    if workers < 1:
+        raise ValueError("workers should be at least 1")
+
+    report = DeletionReport(dry_run)
+    targets = []
+    for path in paths:
+        if not isinstance(path, (str, Path)):
+            raise TypeError("Invalid type for path. Expected a path...")
+        path = Path(path)
+        _check_safe(path)
+        try:
+            mode = os.lstat(path).st_mode
+        except OSError as error:
+            report.errors.append((path, error))
+            continue
+        targets.append((path, stat.S_ISDIR(mode)))
+
+    if not targets:
+        return report
+
+    if not dry_run and confirm is not None:
+        dirs = sum(is_dir for _, is_dir in targets)
+        names = ", ".join(str(path) for path, _ in targets[:3]) + (", ..." if len(targets) > 3 else "")
+        if not confirm(f"Remove {len(targets) - dirs} files and {dirs} directory trees ({names})?"):
+            return report
+
+    for path, is_dir in targets:
+        if is_dir:
+            _remove_tree(str(path), report, workers, dry_run)
+            continue
+        try:
+            info = os.lstat(path)
+            size = report.freed(info) if stat.S_ISREG(info.st_mode) else 0
+            if not dry_run:
+                os.unlink(path)
+            report.add(1, size, [])
+        except OSError as error:
+            report.errors.append((path, error))
+    return report
+
+
+def ask(question: str, prompt: Callable[[str], str] = None) -> bool:
+    """Ask question with prompt, default to input, and return whether the answer is yes."""
+    if prompt is None:
+        prompt = input
+    return prompt(f"{question} (yes/no) ").strip().lower() in ("y", "yes")
@@ -0,0 +1,180 @@
+"""Module containing the export of a whole by_gas dataset into one consolidated file.
+
+The default .gds format is laid out to be memory-mapped:
+
+    8 bytes    magic number GASDS001
+    8 bytes    length of the header, little endian
+    header     JSON with the (gas, source) keys, the offsets of the series and the number of rows
+    padding    up to a multiple of 64 bytes
+    years      float64, the years of all the series back to back
+    values     float64, the emissions of all the series back to back
+
+Loading it opens the file once and parses nothing but the header, the series are views into the mapped columns.
+The dataset can also be exported as a .npz archive, or as a Parquet file if pyarrow is installed. These two formats
+take the whole columns, so unlike the .gds export they copy all the series into memory.
+"""
+import json
+import os
+from pathlib import Path
+import struct
+from typing import Dict
+
+import numpy as np
+
+from analytic_tools.cache import ParseCache
+from analytic_tools.dataset import GasDataset
+
+EXPORT_NAME = "by_gas.gds"
+FORMATS = ("gds", "npz", "parquet")
+
+_MAGIC = b"GASDS001"
+_ALIGNMENT = 64
+_DTYPE = np.dtype("<f8")
+
+
+def _format_of(path: Path, fmt: str = None) -> str:
+    fmt = fmt if fmt is not None else path.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}, expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def export_dataset(dataset: GasDataset, path: str or Path, fmt: str = None) -> Path:
+    """Write all the series of dataset into the single file pointed to by path. The file is replaced atomically.
+
+    Parameters:
+        - dataset (GasDataset) : The series to export
+        - path (str or pathlib.Path) : Absolute path to the file to write
+        - fmt (str) : One of gds, npz and parquet, derived from the suffix of path if not given
+
+    Returns:
+        - (pathlib.Path) : Absolute path to the written file
+    """
+    if not isinstance(path, (str, Path)):
+        raise TypeError("Invalid type for path. Expected a path...")
+
+    path = Path(path)
+    fmt = _format_of(path, fmt)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    if fmt == "gds":
+        header = json.dumps(
+            {"keys": dataset.keys, "offsets": dataset.offsets.tolist(), "rows": int(dataset.offsets[-1])}
+        ).encode()
+        prefix = len(_MAGIC) + 8 + len(header)
+        padding = -prefix % _ALIGNMENT
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<Q", len(header) + padding))
+            f.write(header + b" " * padding)
+            # One series at a time, so memory-mapped series are never all copied into memory
+            for column in (0, 1):
+                for series in dataset.iter_columns():
+                    f.write(np.ascontiguousarray(series[column], dtype=_DTYPE).tobytes())
+    elif fmt == "npz":
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                gases=np.array([gas for gas, _ in dataset.keys], dtype=str),
+                sources=np.array([source for _, source in dataset.keys], dtype=str),
+                offsets=dataset.offsets,
+                years=dataset.years,
+                values=dataset.values,
+            )
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Exporting to Parquet requires pyarrow") from None
+        lengths = np.diff(dataset.offsets)
+        table = pa.table(
+            {
+                "gas": np.repeat(np.array([gas for gas, _ in dataset.keys], dtype=str), lengths),
+                "source": np.repeat(np.array([source for _, source in dataset.keys], dtype=str), lengths),
+                "year": np.asarray(dataset.years, dtype=_DTYPE),
+                "value": np.asarray(dataset.values, dtype=_DTYPE),
+            }
+        )
+        pq.write_table(table, tmp_path)
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_dataset(path: str or Path, fmt: str = None) -> GasDataset:
+    """Load a dataset written by export_dataset. The columns of a .gds file are memory-mapped read-only.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the exported file
+        - fmt (str) : One of gds, npz and parquet, derived from the suffix of path if not given
+
+    Returns:
+        - (GasDataset) : The exported series
+    """
+    if not isinstance(path, (str, Path)):
+        raise TypeError("Invalid type for path. Expected a path...")
+
+    path = Path(path)
+    fmt = _format_of(path, fmt)
+
+    if fmt == "gds":
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not an exported gas dataset")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+            data_offset = f.tell()
+            rows = header["rows"]
+            if rows:
+                columns = np.memmap(f, dtype=_DTYPE, mode="r", offset=data_offset, shape=(2, rows))
+            else:
+                columns = np.empty((2, 0))
+        keys = [tuple(key) for key in header["keys"]]
+        return GasDataset.from_columns(keys, columns[0], columns[1], header["offsets"])
+
+    if fmt == "npz":
+        with np.load(path) as data:
+            keys = list(zip(data["gases"].tolist(), data["sources"].tolist()))
+            return GasDataset.from_columns(keys, data["years"], data["values"], data["offsets"])
+
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    gases = np.array(table.column("gas").to_pylist(), dtype=str)
+    sources = np.array(table.column("source").to_pylist(), dtype=str)
+    years = table.column("year").to_numpy()
+    values = table.column("value").to_numpy()
+    # The rows of a series are consecutive, a new series starts where the key changes
+    starts = np.flatnonzero((gases[1:] != gases[:-1]) | (sources[1:] != sources[:-1])) + 1
+    starts = np.concatenate([[0], starts]) if len(years) else starts
+    keys = list(zip(gases[starts].tolist(), sources[starts].tolist()))
+    offsets = np.append(starts, len(years)).astype(np.int64)
+    return GasDataset.from_columns(keys, years, values, offsets)
+
+
+def export_by_gas(
+    by_gas_dir: str or Path,
+    path: str or Path,
+    view: Dict[str, Dict[str, Path]] = None,
+    cache: ParseCache = None,
+    fmt: str = None,
+) -> Path:
+    """Export stage: parse every file of pollution_data_restructured/by_gas once and write them into one file.
+
+    Parameters:
+        - by_gas_dir (str or pathlib.Path) : Absolute path to the by_gas directory
+        - path (str or pathlib.Path) : Absolute path to the file to write
+        - view (Dict[str, Dict[str, pathlib.Path]]) : Virtual by_gas view built by analytic_tools.restructuring.gas_view,
+                                                    read instead of by_gas_dir when the restructuring was virtual
+        - cache (ParseCache) : Binary cache the files are read through, the files are parsed directly if not given
+        - fmt (str) : One of gds, npz and parquet, derived from the suffix of path if not given
+
+    Returns:
+        - (pathlib.Path) : Absolute path to the written file
+    """
+    if view is not None:
+        dataset = GasDataset.from_view(view, cache)
+    else:
+        dataset = GasDataset.from_by_gas_dir(by_gas_dir, cache=cache)
+    return export_dataset(dataset, path, fmt)
@@ -0,0 +1,143 @@
+"""Module containing the manifest used to restructure the pollution_data directory incrementally.
+
+The manifest is a JSON file mapping each source file (relative to pollution_data) to the size, modification time,
+content hash, gas and destination (relative to by_gas) it had when it was last copied.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Set
+
+from analytic_tools.classification import series_gas
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_hash(path: str or Path, chunk_size: int = 1 << 20) -> str:
+    """Compute the hexadecimal BLAKE2b digest of the content of the file pointed to by path.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the file to hash
+        - chunk_size (int) : Number of bytes read at a time
+
+    Returns:
+        - (str) : The hexadecimal digest
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path: str or Path) -> Dict[str, dict]:
+    """Read the manifest pointed to by path.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the manifest file
+
+    Returns:
+        - (Dict[str, dict]) : The manifest entries keyed by source path, empty if the manifest does not exist yet
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)["files"]
+
+
+def save_manifest(path: str or Path, entries: Dict[str, dict]) -> None:
+    """Write the manifest entries to path. The file is replaced atomically, so an interrupted run leaves the old manifest.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the manifest file
+        - entries (Dict[str, dict]) : The manifest entries keyed by source path
+
+    Returns:
+    None
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": 1, "files": entries}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def record_file(
+    src: Path,
+    dest: Path,
+    pollution_dir: Path,
+    dest_dir: Path,
+    old_entries: Dict[str, dict],
+    new_entries: Dict[str, dict],
+    materialized: bool = True,
+) -> bool:
+    """Record the source file src in new_entries and decide whether it has to be copied to dest.
+        A file whose size and modification time match the old entry is trusted without reading it.
+        Otherwise its content hash is compared, so a file that was only touched is not copied again.
+
+    Parameters:
+        - src (pathlib.Path) : Absolute path to the source .csv file
+        - dest (pathlib.Path) : Absolute path to the destination of the copy
+        - pollution_dir (pathlib.Path) : Absolute path to the pollution_data directory the source keys are relative to
+        - dest_dir (pathlib.Path) : Absolute path to the by_gas directory the destinations are relative to
+        - old_entries (Dict[str, dict]) : Entries of the manifest written by the previous run
+        - new_entries (Dict[str, dict]) : Entries of the manifest being built by this run, updated in place
+        - materialized (bool) : Whether the strategy creates dest, False for the virtual strategy. The old entry alone
+                                then decides, as there is no copy that could be missing
+
+    Returns:
+        - (bool) : True if src is new or changed, or if its copy is missing, and it must be copied
+    """
+    key = src.relative_to(pollution_dir).as_posix()
+    dest_name = dest.relative_to(dest_dir).as_posix()
+    stat = os.stat(src)
+    old = old_entries.get(key)
+    unchanged_dest = old is not None and old["dest"] == dest_name and (not materialized or dest.exists())
+
+    if unchanged_dest and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+        new_entries[key] = old
+        return False
+
+    digest = file_hash(src)
+    new_entries[key] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": digest,
+        "gas": series_gas(src.name),
+        "dest": dest_name,
+    }
+    return not (unchanged_dest and old["hash"] == digest)
+
+
+def remove_stale_outputs(dest_dir: Path, old_entries: Dict[str, dict], new_entries: Dict[str, dict]) -> Set[str]:
+    """Delete the copies in dest_dir whose source files have disappeared since the previous run.
+        Gas directories left empty are removed as well.
+
+    Parameters:
+        - dest_dir (pathlib.Path) : Absolute path to the by_gas directory
+        - old_entries (Dict[str, dict]) : Entries of the manifest written by the previous run
+        - new_entries (Dict[str, dict]) : Entries of the manifest built by this run
+
+    Returns:
+        - (Set[str]) : The gas formulas whose directories lost files
+    """
+    kept = {entry["dest"] for entry in new_entries.values()}
+    gases = set()
+    for key in old_entries.keys() - new_entries.keys():
+        entry = old_entries[key]
+        if entry["dest"] in kept:
+            continue
+        dest = dest_dir / entry["dest"]
+        if dest.exists():
+            dest.unlink()
+        gases.add(entry["gas"])
+        gas_dir = dest.parent
+        if gas_dir.is_dir() and not any(gas_dir.iterdir()):
+            try:
+                gas_dir.rmdir()
+            except OSError:
+                # Another shard has just copied a file into it
+                pass
+    return gases
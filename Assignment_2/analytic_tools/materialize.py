@@ -0,0 +1,121 @@
+"""Module containing the strategies used to materialize a source file at a new path.
+
+    - copy : a byte-for-byte copy made with shutil.copy
+    - hardlink : a new name for the same file, only possible on the same filesystem
+    - symlink : a symbolic link to the absolute path of the source
+    - reflink : a copy-on-write clone (FICLONE), or a kernel side copy with os.copy_file_range where cloning is not supported
+    - virtual : nothing is written, the consumer reads the source directly
+
+Every strategy except virtual falls back to copy when it is not possible for a file.
+"""
+import errno
+import os
+from pathlib import Path
+import shutil
+
+STRATEGIES = ("copy", "hardlink", "symlink", "reflink", "virtual")
+
+# ioctl request number of FICLONE on Linux, _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def check_strategy(strategy: str) -> None:
+    """Raise an error if strategy is not one of STRATEGIES."""
+    if not isinstance(strategy, str):
+        raise TypeError("Invalid type for strategy. Expected type str")
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Invalid strategy: {strategy}, expected one of {', '.join(STRATEGIES)}")
+
+
+def _reflink(src: str, dest: str) -> None:
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        try:
+            import fcntl
+
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except (ImportError, OSError):
+            if not hasattr(os, "copy_file_range"):
+                raise OSError(errno.ENOTSUP, "Neither FICLONE nor copy_file_range is supported", src)
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    shutil.copymode(src, dest)
+
+
+def materialize_file(src: str or Path, dest: str or Path, strategy: str = "copy") -> str:
+    """Make the file pointed to by src available at dest using strategy, falling back to a copy if the strategy fails.
+        An existing file or link at dest is replaced, never written through.
+
+    Parameters:
+        - src (str or pathlib.Path) : Absolute path to the source file
+        - dest (str or pathlib.Path) : Absolute path to the new file
+        - strategy (str) : One of STRATEGIES, default to copy
+
+    Returns:
+        - (str) : The strategy that was actually used
+    """
+    check_strategy(strategy)
+
+    if strategy == "virtual":
+        return strategy
+
+    try:
+        os.unlink(dest)
+    except FileNotFoundError:
+        pass
+
+    try:
+        if strategy == "hardlink":
+            os.link(src, dest)
+        elif strategy == "symlink":
+            os.symlink(os.path.abspath(src), dest)
+        elif strategy == "reflink":
+            _reflink(src, dest)
+        else:
+            shutil.copy(src, dest)
+        return strategy
+    except OSError:
+        if strategy == "copy":
+            raise
+
+    shutil.copy(src, dest)
+    return "copy"
+
+
+def materialize_tree(src_dir: str or Path, dest_dir: str or Path, strategy: str = "copy") -> Path:
+    """Mirror the directory tree pointed to by src_dir at dest_dir, materializing every file with strategy.
+
+    Parameters:
+        - src_dir (str or pathlib.Path) : Absolute path to the directory to mirror
+        - dest_dir (str or pathlib.Path) : Absolute path to the mirror, which must not exist yet
+        - strategy (str) : One of STRATEGIES, default to copy
+
+    Returns:
+        - (pathlib.Path) : Absolute path to the directory to read the tree from, which is src_dir itself for the virtual strategy
+    """
+    check_strategy(strategy)
+
+    src_dir = Path(src_dir)
+    dest_dir = Path(dest_dir)
+
+    if not src_dir.is_dir():
+        raise NotADirectoryError(f"'{src_dir}' is not a directiory...")
+
+    if strategy == "virtual":
+        return src_dir
+
+    if strategy == "copy":
+        shutil.copytree(src_dir, dest_dir)
+        return dest_dir
+
+    for root, dirs, files in os.walk(src_dir):
+        target = dest_dir / os.path.relpath(root, src_dir)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            materialize_file(os.path.join(root, name), target / name, strategy)
+
+    return dest_dir
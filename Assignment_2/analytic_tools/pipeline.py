@@ -0,0 +1,284 @@
+"""Module containing the streaming version of the pollution_data pipeline.
+
+Every stage is a generator consuming the items of the previous stage as they arrive:
+
+    discover -> classify -> copy_stage -> parse_stage -> plot_stage
+
+threaded runs a stage in a background thread feeding a bounded queue, so the stages work concurrently and a fast
+stage blocks when the queue is full instead of buffering (backpressure). Only the directories waiting to be read and
+at most max_series parsed series are held in memory, never the listing of the whole tree: beyond that, the series of
+the plot stage are released and read again from their files when their gas is drawn.
+"""
+import os
+from pathlib import Path
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier, series_gas
+from analytic_tools.dataset import source_from_name
+from analytic_tools.materialize import check_strategy, materialize_file
+from analytic_tools.plotting import FigureTemplate, gas_title, source_label
+from analytic_tools.readers import load_series
+from analytic_tools.utilities import merge_parent_and_basename
+
+_DONE = object()
+
+# Default number of parsed series the plot stage keeps in memory
+MAX_SERIES = 4096
+
+
+class _Failure:
+    """Exception raised in a producer thread, handed over to the consumer."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def threaded(iterable: Iterable, maxsize: int = 64) -> Iterator:
+    """Run iterable in a background thread and yield its items through a queue holding at most maxsize items.
+        An exception raised by iterable is raised again in the consumer. If the consumer stops early, the producer
+        thread stops at its next item.
+
+    Parameters:
+        - iterable (Iterable) : The stage to run in the background
+        - maxsize (int) : Capacity of the queue, default to 64
+
+    Returns:
+        - (Iterator) : The items of iterable, in order
+    """
+    if maxsize < 1:
+        raise ValueError("maxsize should be at least 1")
+
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+        else:
+            put(_DONE)
+        finally:
+            # Stop the upstream stages as well when the consumer stopped early
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def discover(root: str or Path) -> Iterator[os.DirEntry]:
+    """Discovery stage: yield the entry of every file below root while the tree is being read with os.scandir."""
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry
+
+
+def classify(entries: Iterable[os.DirEntry], classifier: Classifier = None) -> Iterator[Path]:
+    """Classification stage: yield the paths of the original gas files among entries, judged by name alone.
+        With Classifier(binary=True) these include the [gas_formula]_[number].npy series.
+    """
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+    for entry in entries:
+        if classifier.is_gas_series(entry.name):
+            yield Path(entry.path)
+
+
+def copy_stage(paths: Iterable[Path], dest_dir: Path, strategy: str = "copy") -> Iterator[Tuple[str, str, Path]]:
+    """Copy stage: materialize every original gas file in its gas_[gas_formula] directory under dest_dir.
+
+    Parameters:
+        - paths (Iterable[pathlib.Path]) : Absolute paths to original gas files
+        - dest_dir (pathlib.Path) : Absolute path to the by_gas directory
+        - strategy (str) : Materialization strategy from analytic_tools.materialize.STRATEGIES, default to copy
+
+    Returns:
+        - (Iterator[Tuple[str, str, pathlib.Path]]) : The gas, the source and the file to read the data from, which is
+                                                      the source file itself for the virtual strategy
+    """
+    check_strategy(strategy)
+    gas_dirs = {}
+    for path in paths:
+        gas = series_gas(path.name)
+        if gas not in gas_dirs:
+            gas_dirs[gas] = dest_dir / f"gas_{gas}"
+            gas_dirs[gas].mkdir(parents=True, exist_ok=True)
+        dest = gas_dirs[gas] / merge_parent_and_basename(path)
+        used = materialize_file(path, dest, strategy)
+        yield gas, source_from_name(dest.name, gas), path if used == "virtual" else dest
+
+
+def parse_stage(
+    files: Iterable[Tuple[str, str, Path]], cache=None
+) -> Iterator[Tuple[str, str, Path, np.ndarray]]:
+    """Parse stage: yield the gas, the source, the file and the (rows, 2) array of every file, read with the reader of
+        its suffix. If cache, an analytic_tools.cache.ParseCache, is given the files that have to be parsed are read
+        through it.
+    """
+    for gas, source, path in files:
+        yield gas, source, path, load_series(path, cache)
+
+
+def plot_stage(
+    series: Iterable[Tuple[str, str, Path, np.ndarray]],
+    fig_dir: Path,
+    refresh_interval: float = 1.0,
+    fmt: str = "png",
+    dpi: int = 200,
+    compress_level: int = None,
+    max_series: int = MAX_SERIES,
+    cache=None,
+) -> Iterator[Path]:
+    """Plot stage: draw the figure of each gas as its series arrive.
+        A gas with new series is drawn again at most every refresh_interval seconds while series are still arriving,
+        so the first figures are written before the scan has finished. Every figure is drawn a last time at the end.
+        A figure shows every series of its gas, but at most max_series parsed series are kept between two drawings.
+        Beyond that the kept series are released, and read again from their files the next time their gas is drawn.
+
+    Parameters:
+        - series (Iterable[Tuple[str, str, pathlib.Path, np.ndarray]]) : The gas, the source, the file and the data
+                                                                       of each series
+        - fig_dir (pathlib.Path) : Absolute path to the directory to save the figures in
+        - refresh_interval (float) : Minimum number of seconds between two drawings of the same gas before the end
+        - fmt (str) : Output format, one of png, svg, pdf and rgba, default to png
+        - dpi (int) : Resolution of the png and rgba output, default to 200
+        - compress_level (int) : zlib compression level 0-9 of png output, default to the Pillow default
+        - max_series (int) : Maximum number of parsed series kept in memory, default to MAX_SERIES
+        - cache (ParseCache) : Binary cache the released series are read again through, parsed directly if not given
+
+    Returns:
+        - (Iterator[pathlib.Path]) : The path of each figure every time it is written
+    """
+    if max_series < 1:
+        raise ValueError("max_series should be at least 1")
+
+    template = FigureTemplate()
+    # The label, the file and the data, None once released, of the series of each gas
+    by_gas: Dict[str, List[list]] = {}
+    held = 0
+    last_drawn: Dict[str, float] = {}
+    dirty = set()
+
+    def draw(gas: str) -> Path:
+        lines = []
+        for label, path, data in by_gas[gas]:
+            if data is None:
+                data = load_series(path, cache)
+            lines.append((label, data[:, 0], data[:, 1]))
+        template.render(gas_title(f"gas_{gas}"), lines)
+        figpath = fig_dir / f"gas_{gas}.{fmt}"
+        template.save(figpath, fmt, dpi, compress_level)
+        last_drawn[gas] = time.monotonic()
+        dirty.discard(gas)
+        return figpath
+
+    for gas, source, path, data in series:
+        by_gas.setdefault(gas, []).append([source_label(source, gas), path, data])
+        held += 1
+        if held > max_series:
+            for entries in by_gas.values():
+                for entry in entries:
+                    entry[2] = None
+            held = 0
+        dirty.add(gas)
+        if time.monotonic() - last_drawn.get(gas, float("-inf")) >= refresh_interval:
+            yield draw(gas)
+
+    for gas in sorted(dirty):
+        yield draw(gas)
+
+
+def stream_pollution_data(
+    pollution_dir: str or Path,
+    restructured_dir: str or Path,
+    strategy: str = "copy",
+    cache=None,
+    queue_size: int = 64,
+    refresh_interval: float = 1.0,
+    fmt: str = "png",
+    dpi: int = 200,
+    compress_level: int = None,
+    classifier: Classifier = None,
+    max_series: int = MAX_SERIES,
+) -> Iterator[Path]:
+    """Restructure and plot the pollution_data directory as one streaming pipeline.
+        Discovery, copying and parsing each run in their own thread, connected by queues of queue_size items,
+        and the figures are drawn in the calling thread as the series arrive.
+
+    Parameters:
+        - pollution_dir (str or pathlib.Path) : Absolute path to the pollution_data directory
+        - restructured_dir (str or pathlib.Path) : Absolute path to pollution_data_restructured, where the by_gas and figures
+                                             directories are created if they do not exist
+        - strategy (str) : Materialization strategy of the by_gas files, default to copy
+        - cache (ParseCache) : Binary cache the files are read through, the files are parsed directly if not given
+        - queue_size (int) : Capacity of the queues between the stages, default to 64
+        - refresh_interval (float) : Minimum number of seconds between two drawings of the same gas before the end
+        - fmt (str) : Output format of the figures, default to png
+        - dpi (int) : Resolution of the png and rgba output, default to 200
+        - compress_level (int) : zlib compression level 0-9 of png output, default to the Pillow default
+        - classifier (Classifier) : Recognizes the original gas files, default to the [gas_formula].csv files
+        - max_series (int) : Maximum number of parsed series the plot stage keeps in memory, default to MAX_SERIES
+
+    Returns:
+        - (Iterator[pathlib.Path]) : The path of each figure every time it is written
+    """
+    # Validate the arguments now rather than at the first iteration
+    if not isinstance(pollution_dir, (str, Path)) or not isinstance(restructured_dir, (str, Path)):
+        raise TypeError("Object is not path-like")
+
+    pollution_dir = Path(pollution_dir)
+    restructured_dir = Path(restructured_dir)
+
+    if not pollution_dir.is_dir():
+        raise NotADirectoryError(f"{pollution_dir} is not directory or doesnt exist")
+
+    check_strategy(strategy)
+
+    if queue_size < 1:
+        raise ValueError("queue_size should be at least 1")
+
+    if max_series < 1:
+        raise ValueError("max_series should be at least 1")
+
+    by_gas_dir = restructured_dir / "by_gas"
+    figures_dir = restructured_dir / "figures"
+    by_gas_dir.mkdir(parents=True, exist_ok=True)
+    figures_dir.mkdir(parents=True, exist_ok=True)
+
+    gas_csvs = classify(threaded(discover(pollution_dir), queue_size), classifier)
+    files = threaded(copy_stage(gas_csvs, by_gas_dir, strategy), queue_size)
+    series = threaded(parse_stage(files, cache), queue_size)
+    return plot_stage(series, figures_dir, refresh_interval, fmt, dpi, compress_level, max_series, cache)
@@ -1,19 +1,179 @@
 """Module containing the functions used to plot the resulting data.
+
+The figures are drawn with the object-oriented Figure API on an Agg canvas, without the global state of pyplot,
+so they can be rendered in parallel. matplotlib is only imported when the first figure is built.
 """
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
 
-import matplotlib.pyplot as plt
 import numpy as np
 
+from analytic_tools.cache import ParseCache
+from analytic_tools.dataset import GasDataset, source_from_name
+from analytic_tools.readers import READERS
+from analytic_tools.sharding import Shard
+from analytic_tools.tracing import NULL_TRACER
+
+
+def _gas_files(src_dir: Path, files: Dict[str, Path] = None) -> Iterator[Tuple[str, str, Path]]:
+    """Yield the (gas, source, path) triple of every series file to plot for the gas_[gas_formula] directory src_dir."""
+    gas = src_dir.name[len("gas_"):]
+    if files is None:
+        files = {file.name: file for file in src_dir.iterdir()}
+
+    for name, file in files.items():
+        if not file.is_file():
+            # Invalid argument, cannot read it as a file
+            raise FileNotFoundError(f"Object pointed to by {file} is not a file")
+        elif file.suffix.lower() not in READERS:
+            # Invalid file type, must be .csv, .npy or another format of analytic_tools.readers
+            raise TypeError(f"Object pointed to by {file} is not a .csv or .npy file")
+        yield gas, source_from_name(name, gas), file
+
+
+FORMATS = ("png", "svg", "pdf", "rgba")
+
+
+def gas_title(gas_dir_name: str) -> str:
+    """Return the title of the plot of the gas_[gas_formula] directory called gas_dir_name."""
+    # Create labels with correct syntax
+    name_dict = {
+        "CH4": r"$\mathrm{CH_4}$",
+        "CO2": r"$\mathrm{CO_2}$",
+        "N2O": r"$\mathrm{N_2O}$",
+    }
+    label = gas_dir_name[-3:]
+    gas_name = name_dict.get(label, label)
+    return (
+        r"Air pollution of "
+        + gas_name
+        + r" from five different sources as function of year"
+    )
+
+
+def source_label(source: str, gas: str) -> str:
+    """Return the legend label of the series of gas from source, e.g. 'oil and gass ' for src_oil_and_gass."""
+    # Create a label for the plot
+    label_parts = f"{source}_{gas}.csv".split("_")
+    label = ""
+    for i in range(1, len(label_parts) - 1):
+        label += label_parts[i] + " "
+    return label
+
+
+def _figure_api():
+    """Import matplotlib on first use and return its Figure and FigureCanvasAgg classes.
+        The non-interactive Agg backend is selected unless pyplot has already been set up by the caller.
+    """
+    import matplotlib
+
+    if "matplotlib.pyplot" not in sys.modules:
+        matplotlib.use("Agg")
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    return Figure, FigureCanvasAgg
+
+
+class FigureTemplate:
+    """A figure whose axes, labels and line artists are built once and reused for every gas.
+        Only the title, the line data and, when the labels change, the legend are updated between renders.
+
+    Attributes:
+        - figure (matplotlib.figure.Figure) : The reused figure, drawn on an Agg canvas
+        - ax (matplotlib.axes.Axes) : The axes of the figure
+    """
+
+    def __init__(self, figsize: Tuple[float, float] = (10, 8)) -> None:
+        Figure, FigureCanvasAgg = _figure_api()
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.ax.set_xlabel("Year")
+        self.ax.set_ylabel(r"1000 tonn $\mathrm{CO_2}$-equivalents AR5")
+        self._title = self.ax.set_title("")
+        self._lines = []
+        self._labels = None
+
+    def render(self, title: str, series: List[Tuple[str, np.ndarray, np.ndarray]]) -> None:
+        """Swap the title and the (label, x, y) line data of the figure."""
+        self._title.set_text(title)
+        for i, (label, x, y) in enumerate(series):
+            if i < len(self._lines):
+                line = self._lines[i]
+                line.set_data(x, y)
+                line.set_visible(True)
+            else:
+                (line,) = self.ax.plot(x, y)
+                self._lines.append(line)
+            line.set_label(label)
+        for line in self._lines[len(series):]:
+            line.set_visible(False)
+
+        labels = [label for label, _, _ in series]
+        if labels != self._labels:
+            self.ax.legend(handles=self._lines[: len(series)])
+            self._labels = labels
+
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+
+    def save(self, path: str or Path, fmt: str = "png", dpi: int = 200, compress_level: int = None) -> None:
+        """Save the figure to path.
+
+        Parameters:
+            - path (str or pathlib.Path) : Absolute path to the file to write
+            - fmt (str) : One of FORMATS. rgba writes the raw RGBA pixel buffer of the Agg canvas
+            - dpi (int) : Resolution of the png and rgba output
+            - compress_level (int) : zlib compression level 0-9 of png output, 0 being fastest, default to the Pillow default
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Invalid format: {fmt}, expected one of {', '.join(FORMATS)}")
 
-def create_plot(src_dir: str or Path, dest_dir: str or Path) -> None:
+        if fmt == "rgba":
+            Path(path).write_bytes(self.to_rgba(dpi).tobytes())
+        elif fmt == "png" and compress_level is not None:
+            self.figure.savefig(path, format=fmt, dpi=dpi, pil_kwargs={"compress_level": compress_level})
+        else:
+            self.figure.savefig(path, format=fmt, dpi=dpi)
+
+    def to_rgba(self, dpi: int = 200) -> np.ndarray:
+        """Draw the figure and return a copy of its pixels as an array of shape (height, width, 4)."""
+        self.figure.set_dpi(dpi)
+        self.canvas.draw()
+        return np.array(self.canvas.buffer_rgba())
+
+
+def create_plot(
+    src_dir: str or Path,
+    dest_dir: str or Path,
+    files: Dict[str, Path] = None,
+    dataset: GasDataset = None,
+    cache: ParseCache = None,
+    template: FigureTemplate = None,
+    fmt: str = "png",
+    dpi: int = 200,
+    compress_level: int = None,
+) -> None:
     """Read all the .csv files within src_dir and display the data in one plot.
-        Store the plot at dest_dir, named as gas_[formula].png.
+        Store the plot at dest_dir, named as gas_[formula].png (or the extension of fmt).
         This function assumes that src_dir contains original gas .csv files only and no other files and subdirectories
 
     Parameters:
         - src_dir (str or pathlib.Path) : Absolute path to gas_[gas_formula] directory containing .csv files with data
         - dest_dir (str or pathlib.Path) : Absolute path to the directory to save the plot in
+        - files (Dict[str, pathlib.Path]) : Restructured file names mapped to the files holding their data, read instead of
+                                           the contents of src_dir when the restructuring was virtual
+        - dataset (GasDataset) : Already loaded series, the gas series of the dataset are plotted and no file is read
+        - cache (ParseCache) : Binary cache the files are read through, the files are parsed directly if not given
+        - template (FigureTemplate) : Figure to reuse, a new one is built if not given
+        - fmt (str) : Output format, one of png, svg, pdf and rgba (raw pixel buffer), default to png
+        - dpi (int) : Resolution of the png and rgba output, default to 200
+        - compress_level (int) : zlib compression level 0-9 of png output, default to the Pillow default
 
     """
     src_dir = Path(src_dir)
@@ -28,48 +188,65 @@ def create_plot(src_dir: str or Path, dest_dir: str or Path) -> None:
             f"Expected an existing directory for dest_dir, but received {dest_dir}"
         )
 
-    plt.figure(1, figsize=(10, 8))
+    if fmt not in FORMATS:
+        raise ValueError(f"Invalid format: {fmt}, expected one of {', '.join(FORMATS)}")
 
-    # Create labels with correct syntax
-    name_dict = {
-        "CH4": r"$\mathrm{CH_4}$",
-        "CO2": r"$\mathrm{CO_2}$",
-        "N2O": r"$\mathrm{N_2O}$",
-    }
-    label = str(src_dir)[-3:]
-    gas_name = name_dict.get(label, label)
-    plt.title(
-        r"Air pollution of "
-        + gas_name
-        + r" from five different sources as function of year"
-    )
-    for file in src_dir.iterdir():
-        if not file.is_file():
-            # Invalid argument, cannot read it as a file
-            raise FileNotFoundError(f"Object pointed to by {file} is not a file")
-        elif not file.suffix == ".csv":
-            # Invalid file type, must be .csv
-            raise TypeError(f"Object pointed to by {file} is not a .csv file")
-        # Create a label for the plot
-        label_parts = str(file.name).split("_")
-        label = ""
-        for i in range(1, len(label_parts) - 1):
-            label += label_parts[i] + " "
-        # Plotting
-        data = np.loadtxt(file, delimiter=",", skiprows=1)
-        plt.plot(data[:, 0], data[:, 1], label=label)
-
-    plt.legend()
-    plt.xlabel("Year")
-    plt.ylabel(r"1000 tonn $\mathrm{CO_2}$-equivalents AR5")
+    if dataset is None:
+        dataset = GasDataset.from_files(_gas_files(src_dir, files), cache)
+
+    if template is None:
+        template = FigureTemplate()
+
+    title = gas_title(src_dir.name)
+    gas = src_dir.name[len("gas_"):]
+    series = []
+    for source in dataset.sources(gas):
+        years, values = dataset.series(gas, source)
+        series.append((source_label(source, gas), years, values))
+
+    # Plotting
+    template.render(title, series)
     # Create a name for the plot to store in dest_dir
-    figname = src_dir.name + ".png"
+    figname = f"{src_dir.name}.{fmt}"
     figpath = dest_dir / figname
-    plt.savefig(figpath, dpi=200)
-    plt.close()
+    template.save(figpath, fmt, dpi, compress_level)
+
+
+# Template reused by all the tasks run in one worker process
+_process_template = None
+
+
+def _timed_create_plot(
+    src_dir: Path, dest_dir: Path, dataset: GasDataset, template: FigureTemplate = None, **options
+) -> Tuple[str, int, int]:
+    """Task rendering one figure, returns the name of the figure, its start time from time.perf_counter_ns
+        and the nanoseconds it took.
+    """
+    global _process_template
+    if template is None:
+        if _process_template is None:
+            _process_template = FigureTemplate()
+        template = _process_template
+
+    start = time.perf_counter_ns()
+    create_plot(src_dir, dest_dir, dataset=dataset, template=template, **options)
+    return f"{src_dir.name}.{options.get('fmt', 'png')}", start, time.perf_counter_ns() - start
 
 
-def plot_pollution_data(by_gas_dir: str or Path, fig_dir: str or Path) -> None:
+def plot_pollution_data(
+    by_gas_dir: str or Path,
+    fig_dir: str or Path,
+    gases: Iterable[str] = None,
+    view: Dict[str, Dict[str, Path]] = None,
+    dataset: GasDataset = None,
+    cache: ParseCache = None,
+    workers: int = 1,
+    fmt: str = "png",
+    dpi: int = 200,
+    compress_level: int = None,
+    tracer=NULL_TRACER,
+    shard: Shard = None,
+) -> Dict[str, float]:
     """This function traverses the subdirectories of directory pointed to by by_gas_dir, which should be pollution_data_restructured/by_gas,
       and creates plots for each of them.
       It assumes that pollution_data_restructured/by_gas has only subdirectories of type gas_[gas_formula] as its contents,
@@ -79,9 +256,22 @@ def plot_pollution_data(by_gas_dir: str or Path, fig_dir: str or Path) -> None:
     Parameters:
         - by_gas_dir (str or pathlib.Path) : Absolute path to the pollution_data_restructured/by_gas directory containing gas_[gas_formula] subdirectories
         - fig_dir (str or pathlib.Path) : Absolute path to the pollution_data_restructured/figures directory where the plots are to be stored
+        - gases (Iterable[str]) : Gas formulas to plot, all gas_[gas_formula] subdirectories are plotted if not given
+        - view (Dict[str, Dict[str, pathlib.Path]]) : Virtual by_gas view built by analytic_tools.restructuring.gas_view,
+                                                    the data is read from its source files instead of the gas_[gas_formula] subdirectories
+        - dataset (GasDataset) : Already loaded series to plot. If not given, the files of all the plotted gasses are parsed
+                                 once into a dataset before plotting
+        - cache (ParseCache) : Binary cache the files are read through, the files are parsed directly if not given
+        - workers (int) : Number of processes rendering figures, one figure per task, default to one (render in this process)
+        - fmt (str) : Output format, one of png, svg, pdf and rgba (raw pixel buffer), default to png
+        - dpi (int) : Resolution of the png and rgba output, default to 200
+        - compress_level (int) : zlib compression level 0-9 of png output, default to the Pillow default
+        - tracer (Tracer) : Records the parse stage, a render span per figure and the files parsed, rows parsed
+                            and figures written counters, disabled by default
+        - shard (Shard) : Only plot the gasses owned by this shard, see analytic_tools.sharding
 
     Returns:
-    None
+        - timings (Dict[str, float]) : Name of each figure mapped to the seconds it took to render and save
     """
     by_gas_dir = Path(by_gas_dir)
     fig_dir = Path(fig_dir)
@@ -91,11 +281,64 @@ def plot_pollution_data(by_gas_dir: str or Path, fig_dir: str or Path) -> None:
     elif not fig_dir.exists():
         raise NotADirectoryError(f"Object pointed to by {fig_dir} does not exist")
 
+    if not isinstance(workers, int) or isinstance(workers, bool):
+        raise TypeError("Invalid type for workers. Expected type int")
+
+    if workers < 1:
+        raise ValueError("workers should be at least 1")
+
+    if gases is not None:
+        gases = set(gases)
+
+    gas_subdirs = []
     for gas_subdir in by_gas_dir.iterdir():
+        gas = gas_subdir.name[len("gas_"):]
+        if gases is not None and gas not in gases or shard is not None and not shard.owns(gas):
+            continue
         if not gas_subdir.is_dir():
             # Invalid structure of by_gas_dir
             raise NotADirectoryError(
                 f"Object pointed to by {gas_subdir} is not a directory"
             )
-        else:
-            create_plot(gas_subdir, fig_dir)
+        gas_subdirs.append(gas_subdir)
+
+    # Nothing to draw, e.g. after an incremental run that changed nothing, so matplotlib is not loaded
+    if not gas_subdirs:
+        return {}
+
+    if dataset is None:
+        files = (
+            triple
+            for gas_subdir in gas_subdirs
+            for triple in _gas_files(gas_subdir, view.get(gas_subdir.name[len("gas_"):]) if view is not None else None)
+        )
+        with tracer.span("parse"):
+            dataset = GasDataset.from_files(files, cache)
+        tracer.count("files parsed", len(dataset))
+        tracer.count("rows parsed", dataset.rows)
+
+    options = {"fmt": fmt, "dpi": dpi, "compress_level": compress_level}
+    timings = {}
+
+    def done(name: str, start: int, duration: int) -> None:
+        timings[name] = duration / 1e9
+        tracer.record("render", start, duration, "file", figure=name)
+        tracer.count("figures written")
+
+    if workers == 1 or len(gas_subdirs) < 2:
+        template = FigureTemplate()
+        for gas_subdir in gas_subdirs:
+            done(*_timed_create_plot(gas_subdir, fig_dir, dataset, template, **options))
+        return timings
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(gas_subdirs))) as pool:
+        futures = [
+            pool.submit(
+                _timed_create_plot, gas_subdir, fig_dir, dataset.subset([gas_subdir.name[len("gas_"):]]), **options
+            )
+            for gas_subdir in gas_subdirs
+        ]
+        for future in futures:
+            done(*future.result())
+
+    return timings
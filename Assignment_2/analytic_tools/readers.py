@@ -0,0 +1,128 @@
+"""Module containing the readers turning a series file into a normalized array of shape (rows, 2), year and emission.
+
+The reader of a file is chosen by its suffix in READERS:
+
+    - .csv : a header line and year,emission rows, parsed by numpy's C parser, extra columns are ignored
+    - .npy : a float array of shape (rows, 2) saved by np.save, memory-mapped read-only so it is never read as a whole
+
+Other formats are added with register_reader. load_series reads a file through a ParseCache only for the formats
+that have to be parsed, binary formats are mapped directly.
+"""
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+
+Reader = Callable[[Path], np.ndarray]
+
+READERS: Dict[str, Reader] = {}
+
+# Suffixes of the formats read through a ParseCache when one is given
+_CACHED = set()
+
+
+def read_csv_series(path: str or Path) -> np.ndarray:
+    """Read a gas .csv file with a header line and year,emission rows into an array of shape (rows, 2).
+        A body with exactly one comma per line is parsed by a single call to numpy's C parser. Other files, with blank
+        lines or more than two columns, are read by np.loadtxt, which skips the blank lines and keeps the first two
+        columns, and reports malformed files.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the .csv file
+
+    Returns:
+        - (np.ndarray) : The year column and the emission column as float64
+    """
+    with open(path) as f:
+        f.readline()
+        body = f.read().replace("\r\n", "\n").strip()
+
+    if not body:
+        return np.empty((0, 2))
+
+    rows = body.count("\n") + 1
+    if body.count(",") == rows:
+        try:
+            data = np.fromstring(body.replace("\n", ","), sep=",")
+        except ValueError:
+            data = None
+        if data is not None and data.size == 2 * rows:
+            return data.reshape(-1, 2)
+
+    data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    if data.shape[1] < 2:
+        raise ValueError(f"{path} has {data.shape[1]} column, expected year,emission rows")
+    return data[:, :2]
+
+
+def read_npy_series(path: str or Path) -> np.ndarray:
+    """Read a .npy file holding an array of shape (rows, 2) with the years in the first column and the emissions in the
+        second. A float64 array is returned as a read-only memory map, other dtypes are converted to float64.
+
+    Parameters:
+        - path (str or pathlib.Path) : Absolute path to the .npy file
+
+    Returns:
+        - (np.ndarray) : The year column and the emission column as float64
+    """
+    try:
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+    except ValueError:
+        # Arrays without data cannot be memory-mapped
+        array = np.load(path, allow_pickle=False)
+
+    if array.ndim != 2 or array.shape[1] != 2:
+        raise ValueError(f"{path} holds an array of shape {array.shape}, expected (rows, 2)")
+    if array.dtype != np.float64:
+        array = array.astype(np.float64)
+    return array
+
+
+def register_reader(suffix: str, reader: Reader, cache: bool = True) -> None:
+    """Register reader for the files whose name ends with suffix, replacing the previous reader of suffix.
+
+    Parameters:
+        - suffix (str) : Suffix of the file names, e.g. .csv
+        - reader (Callable[[pathlib.Path], np.ndarray]) : Reads a file into an array of shape (rows, 2)
+        - cache (bool) : Whether the files are read through a ParseCache when one is given, false for formats
+                         that are already binary
+
+    Returns:
+    None
+    """
+    if not suffix.startswith("."):
+        raise ValueError(f"Invalid suffix: {suffix}, expected a suffix such as .csv")
+    suffix = suffix.lower()
+    READERS[suffix] = reader
+    if cache:
+        _CACHED.add(suffix)
+    else:
+        _CACHED.discard(suffix)
+
+
+register_reader(".csv", read_csv_series)
+register_reader(".npy", read_npy_series, cache=False)
+
+
+def reader_for(path: str or Path) -> Reader:
+    """Return the reader registered for the suffix of path."""
+    suffix = Path(path).suffix.lower()
+    try:
+        return READERS[suffix]
+    except KeyError:
+        raise ValueError(f"No reader for {path}, expected one of {', '.join(sorted(READERS))}") from None
+
+
+def read_series(path: str or Path) -> np.ndarray:
+    """Read the series file pointed to by path with the reader of its suffix."""
+    return reader_for(path)(Path(path))
+
+
+def load_series(path: str or Path, cache=None) -> np.ndarray:
+    """Read the series file pointed to by path, through cache, an analytic_tools.cache.ParseCache, if it is given
+        and the format has to be parsed.
+    """
+    reader = reader_for(path)
+    if cache is not None and Path(path).suffix.lower() in _CACHED:
+        return cache.load(path, reader)
+    return reader(Path(path))
@@ -0,0 +1,204 @@
+"""Module containing the stages used to restructure the pollution_data directory into gas specific directories.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier, series_gas
+from analytic_tools.dedup import DedupReport, check_mode, find_duplicates
+from analytic_tools.manifest import load_manifest, record_file, remove_stale_outputs, save_manifest
+from analytic_tools.materialize import check_strategy, materialize_file
+from analytic_tools.scanning import DirectoryNode
+from analytic_tools.tracing import NULL_TRACER
+from analytic_tools.utilities import get_dest_dir_from_csv_file, merge_parent_and_basename
+
+
+def find_gas_csv_files(index: DirectoryNode, classifier: Classifier = None) -> Iterator[Path]:
+    """Discovery stage: stream the paths of all original gas files in a scanned tree, see Classifier.is_gas_series.
+        The files are classified by name, and only the matching names are turned into paths.
+
+    Parameters:
+        - index (DirectoryNode) : Tree read by scan_directory
+        - classifier (Classifier) : Holds the gas formulas of the original files, default to the five known gases
+
+    Returns:
+        - (Iterator[pathlib.Path]) : Absolute paths to the [gas_formula].csv files, and with Classifier(binary=True) the
+                                     [gas_formula]_[number].npy series, in the order they are found
+    """
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+
+    for node in index.walk():
+        for name in classifier.gas_series(node.files):
+            yield Path(node.path, name)
+
+
+def gas_view(index: DirectoryNode, classifier: Classifier = None) -> Dict[str, Dict[str, Path]]:
+    """Build the virtual by_gas view of a scanned tree without touching the filesystem.
+
+    Parameters:
+        - index (DirectoryNode) : Tree read by scan_directory
+        - classifier (Classifier) : Holds the gas formulas of the original files, default to the five known gases
+
+    Returns:
+        - (Dict[str, Dict[str, pathlib.Path]]) : For each gas formula, the restructured file names mapped to their source files
+    """
+    view = {}
+    for path in find_gas_csv_files(index, classifier):
+        view.setdefault(series_gas(path.name), {})[merge_parent_and_basename(path)] = path
+    return view
+
+
+class RestructurePlan:
+    """The copies needed to restructure a scanned pollution_data tree into the gas_[gas_formula] directories of dest_dir.
+        jobs streams the (source, destination) pairs to give to the copy stage, and finish must be called once they
+        have all been copied.
+
+        With a dedup mode, the files that are byte-identical to an earlier file are not given to the copy stage.
+        In skip mode they are left out of dest_dir, in link mode finish makes them hard links to the copy of the earlier file.
+
+    Attributes:
+        - changed (Set[str]) : The gas formulas whose gas_[gas_formula] directory is changed, filled while jobs is consumed
+        - report (DedupReport) : The duplicates found and the bytes saved, None without a dedup mode
+    """
+
+    def __init__(
+        self,
+        pollution_dir: Path,
+        dest_dir: Path,
+        index: DirectoryNode,
+        manifest: Path = None,
+        classifier: Classifier = None,
+        dedup: str = None,
+        hash_workers: int = 1,
+        strategy: str = "copy",
+    ) -> None:
+        if dedup is not None:
+            check_mode(dedup)
+        self.pollution_dir = pollution_dir
+        self.dest_dir = dest_dir
+        self.index = index
+        self.manifest = manifest
+        self.classifier = classifier if classifier is not None else DEFAULT_CLASSIFIER
+        self.changed: Set[str] = set()
+        self._gas_dirs: Dict[str, Path] = {}
+        self._old_entries = load_manifest(manifest) if manifest is not None else {}
+        self._new_entries: Dict[str, dict] = {}
+        self.dedup = dedup
+        self.hash_workers = hash_workers
+        # The virtual strategy creates no copy, the manifest alone tells whether a file changed
+        self.materialized = strategy != "virtual"
+        self.report: DedupReport = None
+        # (copy of the earlier file, destination) of the duplicates to link once everything is copied
+        self._links: List[Tuple[Path, Path]] = []
+
+    def jobs(self) -> Iterator[Tuple[Path, Path]]:
+        """Yield the (source, destination) pair of every file to copy. The gas directories are created once per gas.
+            With a manifest, the files recorded as unchanged are skipped.
+        """
+        paths = find_gas_csv_files(self.index, self.classifier)
+        duplicates = {}
+        if self.dedup is not None:
+            paths = list(paths)
+            self.report = find_duplicates(paths, self.hash_workers)
+            duplicates = self.report.duplicates
+
+        dests = {}
+        for path in paths:
+            original = duplicates.get(path)
+            if original is not None and self.dedup == "skip":
+                continue
+            gas = series_gas(path.name)
+            if gas not in self._gas_dirs:
+                self._gas_dirs[gas] = get_dest_dir_from_csv_file(self.dest_dir, path, self.classifier)
+            dest_path = dests[path] = self._gas_dirs[gas] / merge_parent_and_basename(path)
+            if self.manifest is None or record_file(
+                path,
+                dest_path,
+                self.pollution_dir,
+                self.dest_dir,
+                self._old_entries,
+                self._new_entries,
+                self.materialized,
+            ):
+                self.changed.add(gas)
+                if original is None:
+                    yield path, dest_path
+                else:
+                    self._links.append((dests[original], dest_path))
+
+    def finish(self) -> Set[str]:
+        """Link the duplicates in link mode and, with a manifest, delete the copies of removed files and save the manifest.
+            Returns the changed gas formulas.
+        """
+        for original, dest in self._links:
+            materialize_file(original, dest, "hardlink")
+        if self.manifest is not None:
+            self.changed |= remove_stale_outputs(self.dest_dir, self._old_entries, self._new_entries)
+            save_manifest(self.manifest, self._new_entries)
+        return self.changed
+
+
+def _traced_materialize(src: Path, dest: Path, strategy: str, tracer) -> str:
+    """Materialize one file, recording a span and the files copied and bytes copied counters when tracing.
+        A file left in place by the virtual strategy is not counted.
+    """
+    if not tracer.enabled:
+        return materialize_file(src, dest, strategy)
+
+    with tracer.span("copy", "file", path=str(src)):
+        used = materialize_file(src, dest, strategy)
+    if used != "virtual":
+        tracer.count("files copied")
+    if used in ("copy", "reflink"):
+        tracer.count("bytes copied", os.stat(src).st_size)
+    return used
+
+
+def copy_files(jobs: Iterable[Tuple[Path, Path]], workers: int = 1, strategy: str = "copy", tracer=NULL_TRACER) -> int:
+    """Copy stage: materialize every (source, destination) pair in jobs, replacing existing destinations.
+        With more than one worker the files are materialized in a thread pool. At most two files per worker are queued
+        at a time, so jobs may be a lazy generator of any length.
+
+    Parameters:
+        - jobs (Iterable[Tuple[pathlib.Path, pathlib.Path]]) : Pairs of source file and destination file
+        - workers (int) : Number of threads copying files, default to one (copy in the calling thread)
+        - strategy (str) : Materialization strategy from analytic_tools.materialize.STRATEGIES, default to copy
+        - tracer (Tracer) : Records a span per file and the files copied and bytes copied counters, disabled by default
+
+    Returns:
+        - (int) : Number of files copied
+    """
+    if not isinstance(workers, int) or isinstance(workers, bool):
+        raise TypeError("Invalid type for workers. Expected type int")
+
+    if workers < 1:
+        raise ValueError("workers should be at least 1")
+
+    check_strategy(strategy)
+
+    copied = 0
+    if workers == 1:
+        for src, dest in jobs:
+            _traced_materialize(src, dest, strategy, tracer)
+            copied += 1
+        return copied
+
+    # Only loaded when a pool is used, it is slow to import
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    max_pending = 2 * workers
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for src, dest in jobs:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    copied += 1
+            pending.add(pool.submit(_traced_materialize, src, dest, strategy, tracer))
+        for future in pending:
+            future.result()
+            copied += 1
+
+    return copied
@@ -0,0 +1,298 @@
+"""Module containing the directory scanner shared by the diagnostics, tree display and restructuring functions.
+"""
+from collections import deque
+import os
+from pathlib import Path
+import threading
+from typing import Callable, Deque, Iterator, List, Tuple, TypeVar
+
+State = TypeVar("State")
+
+
+class DirectoryNode:
+    """Compact in-memory representation of one directory in a scanned tree.
+
+    Attributes:
+        - path (str) : Absolute path to the directory
+        - files (List[str]) : Names of the files directly inside the directory
+        - subdirs (List[DirectoryNode]) : Nodes of the subdirectories directly inside the directory
+    """
+
+    __slots__ = ("path", "files", "subdirs")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.files: List[str] = []
+        self.subdirs: List["DirectoryNode"] = []
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def walk(self) -> Iterator["DirectoryNode"]:
+        """Yield this node and every node below it, parents before children."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.subdirs))
+
+    def iter_files(self) -> Iterator[Path]:
+        """Yield the path of every file in the tree below this node."""
+        for node in self.walk():
+            for name in node.files:
+                yield Path(node.path, name)
+
+    def find(self, name: str) -> "DirectoryNode" or None:
+        """Return the direct subdirectory called name, or None if there is none."""
+        for subdir in self.subdirs:
+            if subdir.name == name:
+                return subdir
+        return None
+
+
+def scan_directory(dir: str or Path) -> DirectoryNode:
+    """Read the directory tree with root directory pointed to by dir once, using os.scandir.
+        The file type information cached in each os.DirEntry is used, so no extra stat call is made per entry.
+        Symbolic links to directories are not followed, symbolic links to files are listed as files.
+
+    Parameters:
+        - dir (str or pathlib.Path) : Absolute path to the directory of interest
+
+    Returns:
+        - (DirectoryNode) : The root node of the scanned tree
+    """
+    if not isinstance(dir, (str, Path)):
+        raise TypeError("Invalid type for directiory. Expected a path...")
+
+    path = Path(dir)
+
+    if not path.is_dir():
+        raise NotADirectoryError(f"'{dir}' is not a directiory...")
+
+    root = DirectoryNode(str(path))
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        with os.scandir(node.path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    child = DirectoryNode(entry.path)
+                    node.subdirs.append(child)
+                    stack.append(child)
+                elif entry.is_file():
+                    node.files.append(entry.name)
+
+    return root
+
+
+class TreeLevel:
+    """One directory of a tree preview made by iter_tree, holding only the names to display and counts of the rest.
+
+    Attributes:
+        - path (str) : Absolute path to the directory
+        - depth (int) : Depth of the directory, 0 for the root of the preview
+        - files (List[str]) : Names of the first files of the directory
+        - more_files (int) : Number of files of the directory not in files
+        - subdirs (int) : Number of subdirectories of the directory
+        - more_subdirs (int) : Number of subdirectories not previewed, because of maxdirs or max_depth
+    """
+
+    __slots__ = ("path", "depth", "files", "more_files", "subdirs", "more_subdirs")
+
+    def __init__(self, path: str, depth: int) -> None:
+        self.path = path
+        self.depth = depth
+        self.files: List[str] = []
+        self.more_files = 0
+        self.subdirs = 0
+        self.more_subdirs = 0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+def _preview_level(path: str, depth: int, maxfiles: int, maxdirs: int or None) -> Tuple[TreeLevel, List[str]]:
+    """Read the directory pointed to by path once, keeping at most maxfiles file names and maxdirs subdirectory paths."""
+    level = TreeLevel(path, depth)
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                level.subdirs += 1
+                if maxdirs is None or len(subdirs) < maxdirs:
+                    subdirs.append(entry.path)
+            elif len(level.files) < maxfiles:
+                level.files.append(entry.name)
+            else:
+                level.more_files += 1
+    return level, subdirs
+
+
+def iter_tree(
+    dir: str or Path, maxfiles: int = 3, max_depth: int = None, maxdirs: int = None, index: DirectoryNode = None
+) -> Iterator[TreeLevel]:
+    """Stream a preview of the directory tree with root directory pointed to by dir, parents before children.
+        Each directory is read once with os.scandir. Only the first maxfiles file names and maxdirs subdirectories of a
+        directory are kept, the others are counted as they go by, so a directory of millions of files takes constant
+        memory. The entries are in the order os.scandir gives them.
+
+    Parameters:
+        - dir (str or pathlib.Path) : Absolute path to the root directory of the preview
+        - maxfiles (int) : Maximum number of file names kept for each directory, default to three
+        - max_depth (int) : Depth of the deepest directories previewed, the root being at depth 0, unlimited if not given
+        - maxdirs (int) : Maximum number of subdirectories previewed for each directory, unlimited if not given
+        - index (DirectoryNode) : Tree of dir already read by scan_directory, read instead of the filesystem if given
+
+    Returns:
+        - (Iterator[TreeLevel]) : The previewed directories
+    """
+    if index is not None:
+        stack = [(index, 0)]
+        while stack:
+            node, depth = stack.pop()
+            level = TreeLevel(node.path, depth)
+            level.files = node.files[:maxfiles]
+            level.more_files = len(node.files) - len(level.files)
+            level.subdirs = len(node.subdirs)
+            subdirs = node.subdirs if maxdirs is None else node.subdirs[:maxdirs]
+            if max_depth is not None and depth >= max_depth:
+                subdirs = []
+            level.more_subdirs = level.subdirs - len(subdirs)
+            yield level
+            stack.extend((subdir, depth + 1) for subdir in reversed(subdirs))
+        return
+
+    stack = [(str(dir), 0)]
+    while stack:
+        path, depth = stack.pop()
+        level, subdirs = _preview_level(path, depth, maxfiles, maxdirs)
+        if max_depth is not None and depth >= max_depth:
+            subdirs = []
+        level.more_subdirs = level.subdirs - len(subdirs)
+        yield level
+        stack.extend((subdir, depth + 1) for subdir in reversed(subdirs))
+
+
+class _WorkStealingWalk:
+    """Shared state of walk_parallel: one deque of directories per worker and the number of directories left to read."""
+
+    def __init__(self, root: str, workers: int, max_queue: int) -> None:
+        self.deques: List[Deque[str]] = [deque() for _ in range(workers)]
+        self.deques[0].append(root)
+        self.max_queue = max_queue
+        self.pending = 1
+        self.error: BaseException = None
+        self.cond = threading.Condition()
+
+    def take(self, i: int) -> str or None:
+        """Return the next directory for worker i, from its own deque or stolen from another, None once all are read."""
+        with self.cond:
+            while True:
+                if self.error is not None:
+                    return None
+                if self.deques[i]:
+                    # Newest first in its own deque, for locality
+                    return self.deques[i].pop()
+                for j in range(i + 1, i + len(self.deques)):
+                    victim = self.deques[j % len(self.deques)]
+                    if victim:
+                        # Oldest first from another deque, it is the highest and likely largest subtree
+                        return victim.popleft()
+                if self.pending == 0:
+                    return None
+                self.cond.wait()
+
+    def share(self, i: int, local: List[str], found: int) -> None:
+        """Count the found new directories and move the oldest of local into the deque of worker i while it has room."""
+        with self.cond:
+            self.pending += found
+            room = self.max_queue - len(self.deques[i])
+            if room > 0 and local:
+                self.deques[i].extend(local[:room])
+                del local[:room]
+                self.cond.notify_all()
+
+    def done(self, error: BaseException = None) -> None:
+        """Count one directory as read, or stop the walk on error."""
+        with self.cond:
+            self.pending -= 1
+            if error is not None and self.error is None:
+                self.error = error
+            if self.pending == 0 or self.error is not None:
+                self.cond.notify_all()
+
+    def work(self, i: int, state, visit: Callable) -> None:
+        # Directories found by this worker that did not fit in its deque, only it can read them
+        local: List[str] = []
+        while True:
+            path = local.pop() if local and self.error is None else self.take(i)
+            if path is None:
+                return
+            try:
+                dirs = []
+                files = []
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                visit(state, path, dirs, files)
+                local.extend(os.path.join(path, name) for name in dirs)
+                self.share(i, local, len(dirs))
+            except BaseException as error:
+                self.done(error)
+                return
+            self.done()
+
+
+def walk_parallel(
+    dir: str or Path,
+    init: Callable[[], State],
+    visit: Callable[[State, str, List[str], List[str]], None],
+    workers: int = 8,
+    max_queue: int = 64,
+) -> List[State]:
+    """Read the directory tree with root directory pointed to by dir with several threads, so that the latency of the
+        readdir calls on a network filesystem overlaps. Each worker reads the directories of its own deque, newest
+        first, and steals the oldest directory of another deque when its own is empty. A deque holds at most max_queue
+        directories, the others found by a worker stay private to it until there is room.
+        As in scan_directory, symbolic links to directories are not followed and symbolic links to files are files.
+
+    Parameters:
+        - dir (str or pathlib.Path) : Absolute path to the directory of interest
+        - init (Callable[[], State]) : Called once per worker to create its local state, e.g. its counters
+        - visit (Callable[[State, str, List[str], List[str]], None]) : Called by a worker with its state, the path to a
+                                                                      directory and the names of its subdirectories
+                                                                      and files
+        - workers (int) : Number of threads, default to eight
+        - max_queue (int) : Maximum number of directories in the deque of a worker, default to 64
+
+    Returns:
+        - (List[State]) : The state of each worker, to reduce into the result
+    """
+    if not isinstance(dir, (str, Path)):
+        raise TypeError("Invalid type for directiory. Expected a path...")
+
+    if not isinstance(workers, int) or isinstance(workers, bool):
+        raise TypeError("Invalid type for workers. Expected type int")
+
+    if workers < 1 or max_queue < 1:
+        raise ValueError("workers and max_queue should be at least 1")
+
+    if not Path(dir).is_dir():
+        raise NotADirectoryError(f"'{dir}' is not a directiory...")
+
+    walk = _WorkStealingWalk(str(dir), workers, max_queue)
+    states = [init() for _ in range(workers)]
+    threads = [threading.Thread(target=walk.work, args=(i, states[i], visit), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if walk.error is not None:
+        raise walk.error
+    return states
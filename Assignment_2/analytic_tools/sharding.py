@@ -0,0 +1,207 @@
+"""Module containing the partitioning of the work into shards handled by independent workers.
+
+The restructuring is split by source directory and the plotting by gas. A key belongs to the shard given by a hash
+of its name that does not depend on the process or the host, so N workers sharing a filesystem agree on the
+partition without talking to each other. Each worker only scans its own src_[name] directories, and writes its own
+manifest and diagnostics next to pollution_data_restructured/by_gas, and in incremental mode the gasses whose files
+changed. merge_manifests, merge_diagnostics and merge_changes then combine them once every worker of the
+restructuring is done, before the plotting starts.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+from analytic_tools.manifest import load_manifest, save_manifest
+from analytic_tools.scanning import DirectoryNode, scan_directory
+from analytic_tools.utilities import get_diagnostics
+
+# Gasses changed by the shards of an incremental restructuring, combined by merge_changes for the plot stage
+CHANGES_NAME = "changes.json"
+
+
+def shard_of(key: str, count: int) -> int:
+    """Return the shard, between 0 and count - 1, that key belongs to. The same key always gives the same shard."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % count
+
+
+class Shard:
+    """One of count shards of the work.
+
+    Attributes:
+        - index (int) : Number of the shard, from 0 to count - 1
+        - count (int) : Total number of shards
+    """
+
+    __slots__ = ("index", "count")
+
+    def __init__(self, index: int, count: int) -> None:
+        if not isinstance(index, int) or not isinstance(count, int):
+            raise TypeError("Invalid type for shard. Expected type int")
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}, expected 0 <= index < count")
+        self.index = index
+        self.count = count
+
+    @classmethod
+    def parse(cls, text: str) -> "Shard":
+        """Parse a shard written as index/count, e.g. 0/4."""
+        try:
+            index, count = (int(part) for part in text.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard {text!r}, expected index/count such as 0/4") from None
+        return cls(index, count)
+
+    def __repr__(self) -> str:
+        return f"Shard({self.index}, {self.count})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Shard) and (self.index, self.count) == (other.index, other.count)
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    def owns(self, key: str) -> bool:
+        """Return whether key, a source directory name or a gas formula, belongs to this shard."""
+        return shard_of(key, self.count) == self.index
+
+
+def scan_shard(pollution_dir: str or Path, shard: Shard) -> DirectoryNode:
+    """Read the part of the pollution_data tree that belongs to shard, as scan_directory would read the whole tree.
+        Only the src_[name] directories of by_src owned by the shard are read. Everything outside by_src belongs to
+        the first shard, the other shards only get the pollution_data and by_src nodes leading to their sources.
+
+    Parameters:
+        - pollution_dir (str or pathlib.Path) : Absolute path to the pollution_data directory
+        - shard (Shard) : The shard to read
+
+    Returns:
+        - (DirectoryNode) : The root node of the shard's part of the tree
+    """
+    pollution_dir = Path(pollution_dir)
+    if not pollution_dir.is_dir():
+        raise NotADirectoryError(f"'{pollution_dir}' is not a directiory...")
+
+    root = DirectoryNode(str(pollution_dir))
+    by_src = None
+    with os.scandir(pollution_dir) as entries:
+        for entry in entries:
+            if entry.name == "by_src" and entry.is_dir(follow_symlinks=False):
+                by_src = DirectoryNode(entry.path)
+                root.subdirs.append(by_src)
+            elif shard.index == 0:
+                if entry.is_dir(follow_symlinks=False):
+                    root.subdirs.append(scan_directory(entry.path))
+                elif entry.is_file():
+                    root.files.append(entry.name)
+
+    if by_src is None:
+        return root
+
+    with os.scandir(by_src.path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if shard.owns(entry.name):
+                    by_src.subdirs.append(scan_directory(entry.path))
+            elif shard.index == 0 and entry.is_file():
+                by_src.files.append(entry.name)
+    return root
+
+
+def shard_diagnostics(pollution_dir: str or Path, index: DirectoryNode, shard: Shard) -> Dict[str, int]:
+    """Return the diagnostics of the part of the tree read by scan_shard. Added up over all the shards they give the
+        diagnostics of the whole tree, the by_src directory only being counted by the first shard.
+    """
+    res = get_diagnostics(pollution_dir, index)
+    if shard.index != 0 and index.find("by_src") is not None:
+        res["subdirectories"] -= 1
+    return res
+
+
+def shard_manifest_path(restructured_dir: str or Path, shard: Shard) -> Path:
+    """Return the path to the manifest of shard in pollution_data_restructured."""
+    return Path(restructured_dir) / f"manifest.{shard.name}.json"
+
+
+def shard_diagnostics_path(restructured_dir: str or Path, shard: Shard) -> Path:
+    """Return the path to the diagnostics of shard in pollution_data_restructured."""
+    return Path(restructured_dir) / f"diagnostics.{shard.name}.json"
+
+
+def shard_changes_path(restructured_dir: str or Path, shard: Shard) -> Path:
+    """Return the path to the gasses changed by shard in pollution_data_restructured."""
+    return Path(restructured_dir) / f"changes.{shard.name}.json"
+
+
+def save_diagnostics(path: str or Path, diagnostics: Dict[str, int]) -> None:
+    """Write the diagnostics of a shard to path, replacing the file atomically."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(diagnostics, f)
+    os.replace(tmp_path, path)
+
+
+def merge_diagnostics(paths: Iterable[str or Path]) -> Dict[str, int]:
+    """Add up the diagnostics written by save_diagnostics for each shard, keeping the order of the keys."""
+    merged = {}
+    for path in paths:
+        with open(path) as f:
+            for key, value in json.load(f).items():
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def merge_manifests(paths: Iterable[str or Path], dest: str or Path) -> int:
+    """Combine the manifests of the shards into the manifest dest. The shards own disjoint sources, so their entries
+        never collide.
+
+    Parameters:
+        - paths (Iterable[str or pathlib.Path]) : Absolute paths to the manifests of the shards, missing ones are skipped
+        - dest (str or pathlib.Path) : Absolute path to the combined manifest
+
+    Returns:
+        - (int) : Number of entries in the combined manifest
+    """
+    entries = {}
+    for path in paths:
+        entries.update(load_manifest(path))
+    save_manifest(dest, entries)
+    return len(entries)
+
+
+def save_changes(path: str or Path, gases: Iterable[str]) -> None:
+    """Write the gas formulas changed by a shard to path, replacing the file atomically."""
+    save_diagnostics(path, sorted(gases))
+
+
+def load_changes(path: str or Path) -> Set[str] or None:
+    """Return the gas formulas written by save_changes, or None if path does not exist, i.e. every gas may have changed."""
+    try:
+        with open(path) as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def merge_changes(paths: Iterable[str or Path], dest: str or Path) -> Set[str]:
+    """Combine the gas formulas changed by the shards into dest. The shard files are deleted once combined.
+
+    Parameters:
+        - paths (Iterable[str or pathlib.Path]) : Absolute paths to the changes of the shards, missing ones are skipped
+        - dest (str or pathlib.Path) : Absolute path to the combined changes
+
+    Returns:
+        - (Set[str]) : The gas formulas changed by any of the shards
+    """
+    paths = [Path(path) for path in paths if Path(path).exists()]
+    changed = set()
+    for path in paths:
+        changed |= load_changes(path)
+    save_changes(dest, changed)
+    for path in paths:
+        path.unlink()
+    return changed
@@ -0,0 +1,150 @@
+"""Module containing the emission statistics computed over all the (gas, source) series of a GasDataset.
+
+The series are aligned on the union of their years in one 2-D array, one row per series and one column per year,
+with NaN where a series has no value. Every statistic is then computed for all the series at once with NumPy
+operations on this array, without Python loops over the series or the years.
+
+The files in pollution_data are already in 1000 tonnes of CO2 equivalents, so co2_equivalent adds the gases up as they
+are by default. GWP_AR5 holds the factors to use for series given in tonnes of gas, and GWP_AR5_H2 adds one for H2.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from analytic_tools.dataset import GasDataset
+
+# 100 year global warming potentials of the IPCC Fifth Assessment Report (AR5)
+GWP_AR5 = {"CO2": 1.0, "CH4": 28.0, "N2O": 265.0, "SF6": 23500.0}
+
+# GWP_AR5 extended with H2, which AR5 gives no value for since it only warms indirectly, through the methane and ozone
+# it leads to. Its indirect 100 year potential of 11 is the estimate of Warwick et al., Atmospheric implications of
+# increased hydrogen use (2022)
+GWP_AR5_H2 = {**GWP_AR5, "H2": 11.0}
+
+
+class EmissionsTable:
+    """All the series of a dataset aligned on a common year axis.
+
+    Attributes:
+        - keys (List[Tuple[str, str]]) : The (gas, source) pair of each row
+        - gases (List[str]) : The gas formulas, in the order of the rows of the per gas statistics
+        - gas_index (np.ndarray) : Index in gases of the gas of each row
+        - years (np.ndarray) : The sorted years of the columns
+        - values (np.ndarray) : Emissions of shape (series, years), NaN where a series has no value for a year
+    """
+
+    def __init__(self, keys: List[Tuple[str, str]], years: np.ndarray, values: np.ndarray) -> None:
+        self.keys = list(keys)
+        self.years = years
+        self.values = values
+        self.gases = list(dict.fromkeys(gas for gas, _ in self.keys))
+        lookup = {gas: i for i, gas in enumerate(self.gases)}
+        self.gas_index = np.array([lookup[gas] for gas, _ in self.keys], dtype=np.intp)
+
+    @classmethod
+    def from_dataset(cls, dataset: GasDataset) -> "EmissionsTable":
+        """Align the series of dataset on the sorted union of their years."""
+        years, columns = np.unique(dataset.years, return_inverse=True)
+        rows = np.repeat(np.arange(len(dataset)), np.diff(dataset.offsets))
+        values = np.full((len(dataset), len(years)), np.nan)
+        values[rows, columns] = dataset.values
+        return cls(dataset.keys, years.astype(np.int64), values)
+
+    def _sum_by_gas(self, values: np.ndarray) -> np.ndarray:
+        """Sum the rows of values, of shape (series, n), per gas. The result is NaN where no series of a gas has a value."""
+        present = ~np.isnan(values)
+        sums = np.zeros((len(self.gases), values.shape[1]))
+        counts = np.zeros((len(self.gases), values.shape[1]), dtype=np.int64)
+        np.add.at(sums, self.gas_index, np.where(present, values, 0.0))
+        np.add.at(counts, self.gas_index, present)
+        sums[counts == 0] = np.nan
+        return sums
+
+    def totals(self) -> np.ndarray:
+        """Return the total emissions of each gas per year, of shape (gases, years)."""
+        return self._sum_by_gas(self.values)
+
+    def shares(self) -> np.ndarray:
+        """Return the share of the total emissions of its gas of each series per year, of shape (series, years)."""
+        totals = self.totals()[self.gas_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.values / totals
+
+    def year_over_year(self, relative: bool = True) -> np.ndarray:
+        """Return the change of each series from one year to the next, of shape (series, years - 1).
+
+        Parameters:
+            - relative (bool) : Return the change as a fraction of the previous year, the absolute change otherwise
+
+        Returns:
+            - (np.ndarray) : Column i is the change from years[i] to years[i + 1], NaN where a value is missing
+        """
+        change = np.diff(self.values, axis=1)
+        if not relative:
+            return change
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return change / self.values[:, :-1]
+
+    def trend_slopes(self) -> np.ndarray:
+        """Return the least squares slope of the emissions of each series against the year, in emission per year.
+            Missing values are left out, and the slope is NaN for a series with less than two values.
+        """
+        present = ~np.isnan(self.values)
+        counts = present.sum(axis=1)
+        x = np.where(present, self.years.astype(float), 0.0)
+        y = np.where(present, self.values, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_mean = x.sum(axis=1) / counts
+            y_mean = y.sum(axis=1) / counts
+            dx = np.where(present, x - x_mean[:, None], 0.0)
+            dy = np.where(present, y - y_mean[:, None], 0.0)
+            slopes = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        slopes[counts < 2] = np.nan
+        return slopes
+
+    def co2_equivalent(self, gwp: Dict[str, float] = None) -> np.ndarray:
+        """Return the emissions of all the gases added up per year, of shape (years,), NaN where no series has a value.
+
+        Parameters:
+            - gwp (Dict[str, float]) : Global warming potential of each gas, e.g. GWP_AR5 or GWP_AR5_H2. If not given,
+                                       the series are taken to be in CO2 equivalents already, as the files in
+                                       pollution_data are
+
+        Returns:
+            - (np.ndarray) : The CO2 equivalent emissions per year
+        """
+        totals = self.totals()
+        if gwp is not None:
+            missing = [gas for gas in self.gases if gas not in gwp]
+            if missing:
+                raise KeyError(
+                    f"No global warming potential for {', '.join(missing)}, supply one in gwp, e.g. GWP_AR5_H2 for H2"
+                )
+            totals = totals * np.array([gwp[gas] for gas in self.gases])[:, None]
+        result = np.nansum(totals, axis=0)
+        result[np.isnan(totals).all(axis=0)] = np.nan
+        return result
+
+
+def summarize(dataset: GasDataset, gwp: Dict[str, float] = None) -> Dict[str, np.ndarray]:
+    """Compute all the statistics of the series of dataset in one call.
+
+    Parameters:
+        - dataset (GasDataset) : The series to analyze
+        - gwp (Dict[str, float]) : Global warming potentials for co2_equivalent, the series are taken to be in CO2
+                                   equivalents already if not given
+
+    Returns:
+        - (Dict[str, np.ndarray]) : The years, the totals per gas, the shares, the relative year over year changes
+                                    and the trend slopes per series, and the CO2 equivalent emissions per year,
+                                    with the keys years, totals, shares, year_over_year, trend_slopes and co2_equivalent
+    """
+    table = EmissionsTable.from_dataset(dataset)
+    return {
+        "years": table.years,
+        "totals": table.totals(),
+        "shares": table.shares(),
+        "year_over_year": table.year_over_year(),
+        "trend_slopes": table.trend_slopes(),
+        "co2_equivalent": table.co2_equivalent(gwp),
+    }
@@ -0,0 +1,189 @@
+"""Module containing the instrumentation of the pipeline: timing spans, counters and optional profiling.
+
+The instrumented functions take a tracer, default to NULL_TRACER whose methods do nothing, so a run without tracing
+pays one method call per stage. Spans per file are only recorded when tracer.enabled is true.
+A Tracer keeps the spans and counters of a run, and exports them in the Chrome trace event format,
+which can be opened in chrome://tracing or https://ui.perfetto.dev:
+
+    with Tracer(profile=True) as tracer:
+        analyze_pollution_data(work_dir, tracer=tracer)
+    tracer.save("trace.json")
+    tracer.save_profile("run.prof")
+"""
+import contextlib
+import cProfile
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterator, List
+
+
+class Span:
+    """One timed section of a run.
+
+    Attributes:
+        - name (str) : Name of the stage or the operation, e.g. scan or copy
+        - category (str) : stage for the stages of the pipeline, file for the operations on single files
+        - start_ns (int) : Start time from time.perf_counter_ns
+        - duration_ns (int) : Duration in nanoseconds
+        - thread (int) : Identifier of the thread it ran in
+        - args (dict) : Details of the span, e.g. the path of the file
+    """
+
+    __slots__ = ("name", "category", "start_ns", "duration_ns", "thread", "args")
+
+    def __init__(self, name: str, category: str, start_ns: int, duration_ns: int, thread: int, args: dict) -> None:
+        self.name = name
+        self.category = category
+        self.start_ns = start_ns
+        self.duration_ns = duration_ns
+        self.thread = thread
+        self.args = args
+
+
+class Tracer:
+    """Recorder of the spans and counters of a run. Safe to use from several threads.
+        Entering the tracer as a context manager starts the optional cProfile and tracemalloc capture.
+
+    Attributes:
+        - spans (List[Span]) : The recorded spans, in the order they ended
+        - counters (Dict[str, int]) : Counters such as files scanned, bytes copied, rows parsed and figures written
+        - profile (cProfile.Profile) : The profiler if profile was requested, None otherwise
+        - memory_peak (int) : Peak traced memory in bytes if memory was requested, known once the tracer is stopped
+    """
+
+    enabled = True
+
+    def __init__(self, profile: bool = False, memory: bool = False) -> None:
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = {}
+        self.profile = cProfile.Profile() if profile else None
+        self.memory = memory
+        self.memory_peak = None
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the profiling and memory capture that were requested."""
+        if self.memory:
+            tracemalloc.start()
+        if self.profile is not None:
+            self.profile.enable()
+
+    def stop(self) -> None:
+        """Stop the profiling and memory capture that were requested."""
+        if self.profile is not None:
+            self.profile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def __enter__(self) -> "Tracer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "stage", **args) -> Iterator[None]:
+        """Time the body of the with statement as a span called name."""
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start_ns, time.perf_counter_ns() - start_ns, category, **args)
+
+    def record(self, name: str, start_ns: int, duration_ns: int, category: str = "stage", **args) -> None:
+        """Record a span timed elsewhere, e.g. in a worker process, from its start time and duration."""
+        span = Span(name, category, start_ns, duration_ns, threading.get_ident(), args)
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add n to the counter called name."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def totals(self, category: str = "stage") -> Dict[str, float]:
+        """Return the total seconds spent in the spans of each name of category, default to the stages.
+            The file spans overlap the stage running them, and each other when several workers run, so their
+            totals are the time added up over the workers and are not comparable with the stage timings.
+        """
+        totals = {}
+        for span in self.spans:
+            if span.category == category:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ns / 1e9
+        return totals
+
+    def chrome_trace(self) -> dict:
+        """Return the spans as complete events and the counters as counter events of the Chrome trace event format."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start_ns - self._origin_ns) / 1e3,
+                "dur": span.duration_ns / 1e3,
+                "pid": pid,
+                "tid": span.thread,
+                "args": span.args,
+            }
+            for span in self.spans
+        ]
+        end = max(((span.start_ns + span.duration_ns - self._origin_ns) / 1e3 for span in self.spans), default=0)
+        events.extend(
+            {"name": name, "ph": "C", "ts": end, "pid": pid, "args": {name: value}}
+            for name, value in self.counters.items()
+        )
+        other = {"counters": dict(self.counters)}
+        if self.memory_peak is not None:
+            other["memory_peak"] = self.memory_peak
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": other}
+
+    def save(self, path: str or Path) -> None:
+        """Write the Chrome trace of the run as JSON to path."""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def save_profile(self, path: str or Path) -> None:
+        """Write the cProfile statistics to path, to read with pstats or snakeviz."""
+        if self.profile is None:
+            raise ValueError("The tracer was created without profile=True")
+        self.profile.dump_stats(str(path))
+
+
+class NullTracer:
+    """Tracer recording nothing, used when the instrumentation is disabled."""
+
+    enabled = False
+
+    _span = contextlib.nullcontext()
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def __enter__(self) -> "NullTracer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def span(self, name: str, category: str = "stage", **args) -> contextlib.nullcontext:
+        return self._span
+
+    def record(self, name: str, start_ns: int, duration_ns: int, category: str = "stage", **args) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+
+NULL_TRACER = NullTracer()
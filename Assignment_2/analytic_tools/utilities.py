@@ -1,14 +1,27 @@
 from pathlib import Path
+import json
 import os
+from collections import Counter
 from typing import Dict, List
 
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier, name_suffix, series_gas
+from analytic_tools.deletion import DeletionReport, ask, remove_paths
+from analytic_tools.scanning import DirectoryNode, iter_tree, scan_directory, walk_parallel
 
-def get_diagnostics(dir: str or Path) -> Dict[str, int]:
+
+def get_diagnostics(
+    dir: str or Path, index: DirectoryNode = None, classifier: Classifier = None, workers: int = 1
+) -> Dict[str, int]:
     """Get diagnostics for the directory tree, with root directory pointed to by dir.
        Counts up all the files, subdirectories, and specifically .csv, .txt, .npy, .md and other files in the whole directory tree.
 
     Parameters:
         dir (str or pathlib.Path) : Absolute path to the directory of interest
+        index (DirectoryNode) : Tree of dir already read by scan_directory, the directory is scanned if not given
+        classifier (Classifier) : Classifies the files by the suffix of their name, default to the .csv, .txt, .npy and .md buckets
+        workers (int) : Number of threads reading the directories when index is not given, default to one. With more than one,
+                        the tree is read by analytic_tools.scanning.walk_parallel, each thread counting in its own counters,
+                        which hides the latency of network filesystems
 
     Returns:
         res (Dict[str, int]) : a dictionary of the findings with following keys: files, subdirectories, .csv files, .txt files, .npy files, .md files, other files.
@@ -36,22 +49,33 @@ def get_diagnostics(dir: str or Path) -> Dict[str, int]:
         raise NotADirectoryError(f"'{dir}' doesn't exist...")
     
 
-    for paths in path.rglob('*'):  
-        if paths.is_file(): 
-            res['files'] += 1
-            pathname = str(paths)
-            if '.csv' in pathname:
-                res['.csv files'] += 1
-            elif '.txt' in pathname :
-                res['.txt files'] += 1
-            elif '.npy' in pathname:
-                res['.npy files'] += 1
-            elif '.md' in pathname :
-                res['.md files'] += 1
-            else:
-                res['other files'] += 1
-        elif path.is_dir():
-            res['subdirectories'] += 1
+    if not isinstance(workers, int) or workers < 1:
+        raise ValueError("workers should be a positive int")
+
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+
+    if index is None and workers > 1:
+        def visit(counts: Counter, dir_path: str, dirs: List[str], files: List[str]) -> None:
+            counts["subdirectories"] += len(dirs)
+            counts["files"] += len(files)
+            counts.update(map(classifier.bucket, files))
+
+        totals = sum(walk_parallel(path, Counter, visit, workers), Counter())
+        res.update(dict.fromkeys(classifier.bucket_names(), 0))
+        res.update(totals)
+        return res
+
+    if index is None:
+        index = scan_directory(path)
+
+    names = []
+    for node in index.walk():
+        res['subdirectories'] += len(node.subdirs)
+        names.extend(node.files)
+
+    res['files'] = len(names)
+    res.update(classifier.count(names))
 
     return res
 
@@ -100,14 +124,27 @@ def display_diagnostics(dir: str or Path, contents: Dict[str, int]) -> None:
     for fileType, number in contents.items():
         print(f"{fileType}: {number}")
 
-def display_directory_tree(dir: str or Path, maxfiles: int = 3) -> None:
+def display_directory_tree(
+    dir: str or Path,
+    maxfiles: int = 3,
+    index: DirectoryNode = None,
+    max_depth: int = None,
+    maxdirs: int = None,
+    fmt: str = "text",
+) -> None:
     """Display a directory tree, with root directory pointed to by dir.
-       Limit the number of files to be displayed for convenience to maxfiles.
+       Limit the number of files to be displayed for convenience to maxfiles, the other files are only counted.
+       The tree is streamed by analytic_tools.scanning.iter_tree, so it is printed as it is read and the memory used
+       does not grow with the number of files in a directory.
        This tree is built with inspiration from the code written by "Flimm" at https://stackoverflow.com/questions/6639394/what-is-the-python-way-to-walk-a-directory-tree
 
     Parameters:
         dir (str or pathlib.Path) : Absolute path to the directory of interest
         maxfiles (int) : Maximum number of files to be displayed at each level in the tree, default to three.
+        index (DirectoryNode) : Tree of dir already read by scan_directory, the directory is read while displayed if not given
+        max_depth (int) : Depth of the deepest directories displayed, the root being at depth 0, unlimited if not given
+        maxdirs (int) : Maximum number of subdirectories displayed at each level in the tree, unlimited if not given
+        fmt (str) : text for an indented tree, json for one JSON object per directory nested in the subdirs of its parent
 
     Returns:
         None
@@ -129,29 +166,91 @@ def display_directory_tree(dir: str or Path, maxfiles: int = 3) -> None:
     
     if maxfiles < 1:
         raise ValueError("Maxfiles should have more that 1 file:/")
-    
+
+    if max_depth is not None and max_depth < 0:
+        raise ValueError("max_depth should not be negative")
+
+    if maxdirs is not None and maxdirs < 1:
+        raise ValueError("maxdirs should be at least 1")
+
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Invalid format: {fmt}, expected text or json")
+
+    levels = iter_tree(path, maxfiles, max_depth, maxdirs, index)
+
+    if fmt == "json":
+        # The open directories from the root to the last one read
+        stack = []
+        for level in levels:
+            entry = {
+                "name": level.name,
+                "files": level.files,
+                "more_files": level.more_files,
+                "subdirs": [],
+                "more_subdirs": level.more_subdirs,
+            }
+            del stack[level.depth:]
+            if stack:
+                stack[-1]["subdirs"].append(entry)
+            stack.append(entry)
+        print(json.dumps(stack[0], indent=1))
+        return
+
+    for level in levels:
+        if level.depth == 0:
+            print(f'Root: {path.name} /')
+        _print_level(level)
+
+
+def display_sources_tree(pollution_dir: str or Path, maxfiles: int = 3, index: DirectoryNode = None) -> None:
+    """Display the source directories below by_src of the pollution_data directory pointed to by pollution_dir,
+       in the layout the analysis has always printed: the pollution_data root, then each directory below by_src with
+       its first maxfiles files. The files next to by_src, and those directly in it, are not displayed.
+
+    Parameters:
+        pollution_dir (str or pathlib.Path) : Absolute path to the pollution_data directory
+        maxfiles (int) : Maximum number of files to be displayed for each directory, default to three.
+        index (DirectoryNode) : Tree of pollution_dir already read by scan_directory, by_src is read if not given
+
+    Returns:
+        None
+    """
+    if not isinstance(pollution_dir, (str,Path)):
+        raise TypeError("Invalid type for directiory. Expected a path...")
+
+    path = Path(pollution_dir)
+    by_src = path / "by_src"
+
+    if not by_src.is_dir():
+        raise NotADirectoryError(f"'{by_src}' is not a directiory...")
 
     print(f'Root: {path.name} /')
-    path = path / "by_src"
-    for paths in path.rglob('*'):
-        if paths.is_dir():
-            print(f'-  {paths.name}')
-            subdir = list(paths.glob('*'))
-            for items in subdir[:maxfiles]: 
-                if items.is_dir(): 
-                    print(f'   - {items.name}')
-                elif items.is_file(): 
-                    print(f'   - {items.name}')
-            if len(subdir) > maxfiles:
-                print(f'   - ({len(subdir) - maxfiles} more)')
+    for level in iter_tree(by_src, maxfiles, index=index.find("by_src") if index is not None else None):
+        if level.depth > 0:
+            _print_level(level)
+
+
+def _print_level(level) -> None:
+    """Print a directory of a tree preview, its files indented one level below it."""
+    indent = "   " * max(level.depth, 1)
+    if level.depth > 0:
+        print(f'{indent[3:]}-  {level.name}')
+    for name in level.files:
+        print(f'{indent}- {name}')
+    if level.more_files:
+        print(f'{indent}- ({level.more_files} more)')
+    if level.more_subdirs:
+        print(f'{indent}- ({level.more_subdirs} more directories)')
+
                
-def is_gas_csv(path: str or Path) -> bool:
+def is_gas_csv(path: str or Path, classifier: Classifier = None) -> bool:
     """Checks if a csv file pointed to by path is an original gas statistics file.
         An original file must be called '[gas_formula].csv' where [gas_formula] is
-        in ['CO2', 'CH4', 'N2O', 'SF6', 'H2'].
+        one of the gases of classifier, by default in ['CO2', 'CH4', 'N2O', 'SF6', 'H2'].
 
     Parameters:
          - path (str of pathlib.Path) : Absolute path to .csv file that will be checked
+         - classifier (Classifier) : Holds the gas formulas of the original files, default to the five gases above
 
     Returns
          - (bool) : Truth value of whether the file is an original gas file
@@ -160,31 +259,29 @@ def is_gas_csv(path: str or Path) -> bool:
     if not isinstance(path, (str,Path)):
         raise TypeError("Invalid type for directiory. Expected a path...")
     
-    path = Path(path)
+    name = Path(path).name
 
-    if path.suffix.lower() != '.csv':
+    if name_suffix(name) != '.csv':
         raise ValueError("File is not a .csv")
-    
-    gasses = ["CO2", "CH4", "N2O", "SF6", "H2"]
 
-    filename = path.stem
-    
-    if filename in gasses: 
-        return True
-    
-    return False
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+
+    return classifier.is_gas_csv(name)
 
 
-def get_dest_dir_from_csv_file(dest_parent: str or Path, file_path: str or Path) -> Path:
+def get_dest_dir_from_csv_file(dest_parent: str or Path, file_path: str or Path, classifier: Classifier = None) -> Path:
     """Given a file pointed to by file_path, derive the correct gas_[gas_formula] directory name.
         Checks if a directory "gas_[gas_formula]", exists and if not, it creates one as a subdirectory under dest_parent.
 
         The file pointed to by file_path must be a valid file. A valid file must be called '[gas_formula].csv' where [gas_formula]
-        is in ['CO2', 'CH4', 'N2O', 'SF6', 'H2'].
+        is one of the gases of classifier, by default in ['CO2', 'CH4', 'N2O', 'SF6', 'H2'], or '[gas_formula]_[number].npy'
+        if the classifier is binary.
 
     Parameters:
         - dest_parent (str or pathlib.Path) : Absolute path to parent directory where gas_[gas_formula] should/will exist
         - file_path (str or pathlib.Path) : Absolute path to file that gas_[gas_formula] directory will be derived from
+        - classifier (Classifier) : Holds the gas formulas of the original files, default to the five gases above
 
     Returns:
         - (pathlib.Path) : Absolute path to the derived directory
@@ -199,20 +296,21 @@ def get_dest_dir_from_csv_file(dest_parent: str or Path, file_path: str or Path)
     if not dest_parent.is_dir(): 
         raise NotADirectoryError(f'{dest_parent} is not a directory')
     
-    gas_formula = dest_path.stem
-    
-    valid = ['CO2', 'CH4', 'N2O', 'SF6', 'H2']
+    gas_formula = series_gas(dest_path.name)
+
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
 
-    if gas_formula not in valid: 
+    if gas_formula not in classifier.gases:
         raise ValueError(f'Invalid gas: {gas_formula}')
     
-    if dest_path.suffix.lower() != '.csv' : 
-        raise ValueError(f'{dest_path} is not a .csv file')
+    if classifier.gas_of(dest_path.name) is None: 
+        raise ValueError(f'{dest_path} is not an original gas file')
     
     dest_dir = dest_parent / f"gas_{gas_formula}"
 
-    if not dest_dir.exists():
-        dest_dir.mkdir(parents=True)
+    # Several shards of a sharded restructuring may create the same directory at once
+    dest_dir.mkdir(parents=True, exist_ok=True)
     
     return dest_dir
     
@@ -245,38 +343,27 @@ def merge_parent_and_basename(path: str or Path) -> str:
     return new_base
 
 
-def delete_directories(path_list: List[str or Path]) -> None:
-    """Prompt the user for permission and delete the objects pointed to by the paths in path_list if
-       permission is given. If the object is a directory, its whole directory tree is removed.
+def delete_directories(
+    path_list: List[str or Path], confirm: bool = True, dry_run: bool = False, workers: int = 1
+) -> DeletionReport:
+    """Prompt the user for permission once for the whole batch and delete the objects pointed to by the paths in
+       path_list if permission is given. If the object is a directory, its whole directory tree is removed.
+       The trees are removed by analytic_tools.deletion.remove_paths, an object that cannot be removed is reported
+       and the others are still removed.
 
     Parameters:
         - path_list (List[str | Path]) : a list of absolute paths to all the objects to be removed.
-
+        - confirm (bool) : Ask for permission before removing anything, set to false in non-interactive use
+        - dry_run (bool) : Only report what would be removed, without asking or removing anything
+        - workers (int) : Number of threads removing the files of a tree, default to one
 
     Returns:
-    None
+        - (DeletionReport) : The number of files and directories removed, the bytes freed and the errors
     """
-    #Tror ikke denne fungerer helt riktig men det må jo være noe sånt
-    for path in path_list: 
-        path = Path(path)
-        if not path.exists():
-            print(f'Path {path} doesnt exist')
-            continue
-       
-        if path.is_file():
-            os.remove(path)
-            print(f"Deleted file: {path}")
-  
-        elif path.is_dir(): 
-            input = input(f'Do yoy want to deliete the file: {path} ? (yes/no)').strip().lower()
-            if input == "yes": 
-                try: 
-                    os.rmdir(path)
-                    print(f"Dir: {path} has been delieted")
-                except OSError as e: 
-                    print("An error has ocurred while trying to deliete directory")
-                    print(f'{e}')
-        else : 
-            print(f'This ios neither a file nor a directory')
+    report = remove_paths(path_list, workers, dry_run, ask if confirm else None)
+    for path, error in report.errors:
+        print(f"Could not remove {path}: {error}")
+    print(report)
+    return report
 
 
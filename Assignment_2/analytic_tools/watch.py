@@ -0,0 +1,264 @@
+"""Module containing the watchers reporting the files changed below a directory, used by the watch mode.
+
+On Linux the kernel reports the changes through inotify, called with ctypes, so an idle watcher sleeps in select and
+costs nothing. Elsewhere, or when inotify is not available, the tree is compared with a snapshot at a fixed interval.
+Both watchers return the paths of the files created, changed, moved or deleted, and the paths of the directories
+created or deleted, since the last call.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+from pathlib import Path
+import select
+import struct
+import time
+from typing import Dict, Iterable, Set, Tuple
+
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier
+
+# Event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+def _walk_files(root: str) -> Iterable[os.DirEntry]:
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+        except FileNotFoundError:
+            # Removed while being read, its deletion is reported separately
+            continue
+
+
+class InotifyWatcher:
+    """Watcher of the tree with root directory root using inotify. New subdirectories are watched as they appear.
+
+    Attributes:
+        - root (pathlib.Path) : Absolute path to the watched directory
+    """
+
+    def __init__(self, root: str or Path) -> None:
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"'{root}' is not a directiory...")
+
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._dirs: Dict[int, str] = {}
+        try:
+            self._add_tree(str(self.root))
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(error, os.strerror(error), path)
+        self._dirs[wd] = path
+
+    def _add_tree(self, path: str, files: Set[Path] = None) -> None:
+        """Watch path and every directory below it, and add the files already inside to files if given.
+            A directory is watched before it is listed, so no file created meanwhile is missed.
+        """
+        stack = [path]
+        while stack:
+            dir = stack.pop()
+            self._add_watch(dir)
+            try:
+                with os.scandir(dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif files is not None and entry.is_file():
+                            files.add(Path(entry.path))
+            except FileNotFoundError:
+                continue
+
+    def changes(self, timeout: float) -> Set[Path]:
+        """Wait at most timeout seconds for changes and return the changed paths, empty if there were none."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT.unpack_from(buffer, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, report every file so that the caller resynchronizes
+                    changed.update(Path(entry.path) for entry in _walk_files(str(self.root)))
+                    continue
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                dir = self._dirs.get(wd)
+                if dir is None or not name:
+                    continue
+                path = os.path.join(dir, name)
+                if mask & IN_ISDIR:
+                    changed.add(Path(path))
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path, changed)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                    changed.add(Path(path))
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self) -> "InotifyWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PollingWatcher:
+    """Watcher of the tree with root directory root comparing the size and modification time of every file with a
+        snapshot every interval seconds.
+
+    Attributes:
+        - root (pathlib.Path) : Absolute path to the watched directory
+        - interval (float) : Number of seconds between two scans of the tree
+    """
+
+    def __init__(self, root: str or Path, interval: float = 1.0) -> None:
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise NotADirectoryError(f"'{root}' is not a directiory...")
+        if interval <= 0:
+            raise ValueError("interval should be positive")
+
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for entry in _walk_files(str(self.root)):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: float) -> Set[Path]:
+        """Wait at most timeout seconds for changes and return the changed paths, empty if there were none."""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self._next_scan > deadline:
+                time.sleep(max(deadline - now, 0))
+                return set()
+            time.sleep(max(self._next_scan - now, 0))
+            self._next_scan = time.monotonic() + self.interval
+
+            snapshot = self._scan()
+            changed = {
+                Path(path)
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PollingWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_watcher(root: str or Path, polling_interval: float = None) -> InotifyWatcher or PollingWatcher:
+    """Return an InotifyWatcher of root, or a PollingWatcher if inotify is not available or polling_interval is given.
+
+    Parameters:
+        - root (str or pathlib.Path) : Absolute path to the directory to watch
+        - polling_interval (float) : Number of seconds between two scans of the tree, forces polling if given
+
+    Returns:
+        - (InotifyWatcher or PollingWatcher) : The watcher
+    """
+    if polling_interval is None:
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError, TypeError):
+            # No libc exposing inotify on this platform
+            polling_interval = 1.0
+    return PollingWatcher(root, polling_interval)
+
+
+def affected_sources(
+    by_src_dir: str or Path, paths: Iterable[Path], classifier: Classifier = None
+) -> Set[Tuple[str, str]]:
+    """Map changed paths below pollution_data/by_src to the (source, gas) pairs of the original gas .csv files
+        they affect. A changed source directory affects all the gases of the classifier.
+
+    Parameters:
+        - by_src_dir (str or pathlib.Path) : Absolute path to the watched by_src directory
+        - paths (Iterable[pathlib.Path]) : Changed paths reported by a watcher
+        - classifier (Classifier) : Holds the gas formulas of the original files, default to the five known gases
+
+    Returns:
+        - (Set[Tuple[str, str]]) : The source directory name and gas formula of each affected file
+    """
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+
+    by_src_dir = Path(by_src_dir)
+    affected = set()
+    for path in paths:
+        try:
+            parts = Path(path).relative_to(by_src_dir).parts
+        except ValueError:
+            continue
+        if len(parts) == 1:
+            affected.update((parts[0], gas) for gas in classifier.gases)
+        elif len(parts) == 2:
+            gas = classifier.gas_of(parts[1])
+            if gas is not None:
+                affected.add((parts[0], gas))
+    return affected
@@ -2,23 +2,81 @@
 """
 
 # Import necessary packages here
+import functools
 from pathlib import Path
-import shutil
+import sys
 import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Set, Tuple
 from analytic_tools.utilities import (
-    get_dest_dir_from_csv_file,
     get_diagnostics,
     display_diagnostics,
-    display_directory_tree,
-    is_gas_csv,
+    display_sources_tree,
     merge_parent_and_basename,
     delete_directories
 )
-from analytic_tools.plotting import(
-    plot_pollution_data
+from analytic_tools.classification import DEFAULT_CLASSIFIER, Classifier
+from analytic_tools.dedup import MODES
+from analytic_tools.manifest import MANIFEST_NAME
+from analytic_tools.materialize import STRATEGIES, check_strategy, materialize_file, materialize_tree
+from analytic_tools.restructuring import RestructurePlan, copy_files, gas_view
+from analytic_tools.scanning import DirectoryNode, scan_directory
+from analytic_tools.sharding import (
+    CHANGES_NAME,
+    Shard,
+    load_changes,
+    merge_changes,
+    merge_diagnostics,
+    merge_manifests,
+    save_changes,
+    save_diagnostics,
+    scan_shard,
+    shard_changes_path,
+    shard_diagnostics,
+    shard_diagnostics_path,
+    shard_manifest_path,
 )
+from analytic_tools.tracing import NULL_TRACER
+from analytic_tools.watch import affected_sources, open_watcher
 
-def restructure_pollution_data(pollution_dir: str or Path, dest_dir: str or Path) -> None:
+# The modules using numpy and matplotlib are imported inside the functions that parse or plot data,
+# and asyncio inside the async front ends, so that scanning and restructuring start without loading them
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from analytic_tools.cache import ParseCache
+
+STAGES = ("diagnose", "restructure", "plot", "export")
+
+# Default bound of the total size of the binary cache of parsed files, the least recently used entries are deleted
+# beyond it. Every change of a file adds an entry, so an unbounded cache grows with every run
+CACHE_MAX_BYTES = 256 * 2**20
+
+# Seconds before the watch mode tries again the changes it could not process
+RETRY_DELAY = 1.0
+
+
+def _shard_conflicts(stages: Set[str]) -> List[str]:
+    """Return the stages a shard cannot run among stages, in the order of STAGES. A shard runs the diagnose and
+        restructure stages, or the plot stage once every shard is merged, and never the export, which is not sharded.
+    """
+    both = {"restructure", "plot"} <= stages
+    return [stage for stage in STAGES if stage in stages and (stage == "export" or both and stage in ("restructure", "plot"))]
+
+
+def restructure_pollution_data(
+    pollution_dir: str or Path,
+    dest_dir: str or Path,
+    index: DirectoryNode = None,
+    workers: int = 1,
+    manifest: str or Path = None,
+    strategy: str = "copy",
+    tracer=NULL_TRACER,
+    shard: Shard = None,
+    classifier: Classifier = None,
+    dedup: str = None,
+) -> Set[str]:
     """This function searches the tree of pollution_data directory pointed to by pollution_dir for .csv files
         that satisfy the criteria described in the assignment. It then moves a renamed copy of these files to gas-specific
         sub-directories in dest_dir, which will be created based on the gasses present in pollution_data directory.
@@ -27,40 +85,77 @@ def restructure_pollution_data(pollution_dir: str or Path, dest_dir: str or Path
         - pollution_dir (str or pathlib.Path) : The absolute path to pollution_data directory
         - dest_dir (str or pathlib.Path) : The absolute path to new directory where gas-specific subdirectories will
                                      be created, which must be pollution_data_restructured/by_gas
+        - index (DirectoryNode) : Tree of pollution_dir already read by scan_directory, the directory is scanned if not given
+        - workers (int) : Number of threads copying files, default to one
+        - manifest (str or pathlib.Path) : Absolute path to the manifest of the previous run. If given, only new or changed
+                                     files are copied, copies of removed files are deleted and the manifest is updated
+        - strategy (str) : How the files are materialized in dest_dir, one of analytic_tools.materialize.STRATEGIES,
+                           default to copy. With the virtual strategy only the gas directories are created
+        - tracer (Tracer) : Records the scan and copy stages and a span per copied file, disabled by default
+        - shard (Shard) : Only restructure the src_[name] directories owned by this shard, see analytic_tools.sharding.
+                          Used when index is not given
+        - classifier (Classifier) : Recognizes the original gas files, default to the [gas_formula].csv files of the five
+                                    known gasses. Classifier(binary=True) also restructures the [gas_formula]_[number].npy series
+        - dedup (str) : What to do with the files byte-identical to an earlier file, one of analytic_tools.dedup.MODES.
+                        skip leaves them out of dest_dir, link makes them hard links to the copy of the earlier file.
+                        The files sharing a size are hashed by workers threads. The duplicate files, files hashed and
+                        bytes saved are displayed and counted by tracer. All files are copied if not given
 
     Returns:
-    None
+        - changed (Set[str]) : The gas formulas whose gas_[gas_formula] directory has been changed
 
     Pseudocode:
-    1. Iterate through the contents of `pollution_dir`
-    2. Find valid .csv files for gasses ([`[gas_formula].csv` files of correct gas types).
-    3. Create/assign new directory to store them under `dest_dir` using `get_dest_dir_from_csv_file`
-    4. Assign a new name using `merge_parent_and_basename` and copy the file to the new destination.
+    1. Stream the valid .csv files for gasses ([`[gas_formula].csv` files of correct gas types) found in `pollution_dir`
+    2. Create/assign new directory to store them under `dest_dir` using `get_dest_dir_from_csv_file`, once per gas
+    3. Assign a new name using `merge_parent_and_basename` and let the copy stage copy the file to the new destination.
        If the file happens already to exist there, it should be overwritten.
+    4. In incremental mode, skip the files recorded as unchanged in the manifest and delete the copies of removed files
     """
 
     if not isinstance(pollution_dir,(str,Path)) or not isinstance(dest_dir,(str,Path)): 
         raise TypeError("Object is not path-like")
 
     pollution_dir = Path(pollution_dir)
-    print(pollution_dir)
     dest_dir = Path(dest_dir)
-    print(dest_dir)
 
     if not dest_dir.exists() or not pollution_dir.exists():
         raise NotADirectoryError(f'{dest_dir} {pollution_dir} Directory doesnt exist')
 
-    for path in pollution_dir.rglob('*'):
-        try: 
-            if is_gas_csv(path): 
-                dest_gas_dir = get_dest_dir_from_csv_file(dest_dir, path)
-                new_name = merge_parent_and_basename(path)
-                dest_path = dest_gas_dir / new_name
-                shutil.copy(path, dest_path)
-        except ValueError as e: 
-            print(e)
-
-def analyze_pollution_data(work_dir: str or Path) -> None:
+    if dedup is not None and strategy == "virtual":
+        raise ValueError("Nothing is copied with the virtual strategy, dedup needs another strategy")
+
+    if index is None:
+        with tracer.span("scan"):
+            index = scan_directory(pollution_dir) if shard is None else scan_shard(pollution_dir, shard)
+
+    plan = RestructurePlan(pollution_dir, dest_dir, index, manifest, classifier, dedup, workers, strategy)
+    with tracer.span("copy"):
+        copy_files(plan.jobs(), workers, strategy, tracer)
+    if plan.report is not None:
+        print(f"Deduplication: {plan.report}")
+        tracer.count("duplicate files", len(plan.report.duplicates))
+        tracer.count("files hashed", plan.report.hashed)
+        tracer.count("bytes saved", plan.report.bytes_saved)
+    with tracer.span("manifest"):
+        return plan.finish()
+
+def analyze_pollution_data(
+    work_dir: str or Path,
+    workers: int = 1,
+    incremental: bool = False,
+    strategy: str = "copy",
+    cache_dir: str or Path = None,
+    plot_workers: int = 1,
+    tracer=NULL_TRACER,
+    export: bool = False,
+    stages: Iterable[str] = None,
+    shard: Shard = None,
+    classifier: Classifier = None,
+    dedup: str = None,
+    cache_max_bytes: int = CACHE_MAX_BYTES,
+    catalog: str or Path = None,
+    stream: bool = False,
+) -> None:
     """Do the restructuring of the pollution_data and plot
        the statistics showing emissions of each gas as function of all the corresponding
        sources. The new structure and the plots are saved in a separate directory under work_dir
@@ -68,6 +163,36 @@ def analyze_pollution_data(work_dir: str or Path) -> None:
     Parameters:
         - work_dir (str or pathlib.Path) : Absolute path to the working directory that
                                     contains the pollution_data directory and where the new directories will be created
+        - workers (int) : Number of threads copying files during the restructuring, default to one
+        - incremental (bool) : Reuse the pollution_data_restructured of a previous run, and only copy the changed files
+                               and plot the gasses whose files changed. The manifest is kept in pollution_data_restructured
+        - strategy (str) : How the files are materialized in by_gas, one of analytic_tools.materialize.STRATEGIES, default to copy.
+                           With the virtual strategy the plots are made directly from the files in pollution_data
+        - cache_dir (str or pathlib.Path) : Absolute path to a binary cache of the parsed .csv files, shared between runs.
+                                    The files are parsed directly if not given
+        - plot_workers (int) : Number of processes rendering the figures, default to one
+        - tracer (Tracer) : Records a span per stage and per file and the counters of the run, disabled by default
+        - export (bool) : Also write all the by_gas series into the single memory-mappable file
+                          pollution_data_restructured/by_gas.gds, see analytic_tools.export
+        - stages (Iterable[str]) : The stages to run among STAGES, default to diagnose, restructure and plot, and export
+                                   if export is true. Without the restructure stage the existing by_gas directory is used.
+                                   The default of a shard is diagnose and restructure
+        - shard (Shard) : Only do the part of the work owned by this shard, see analytic_tools.sharding. The diagnose and
+                          restructure stages handle the shard's sources and save its diagnostics and manifest in
+                          pollution_data_restructured, to be combined by merge_shards. The plot stage draws the shard's
+                          gasses, and must run once every shard is restructured
+        - classifier (Classifier) : Recognizes the original gas files, see restructure_pollution_data
+        - dedup (str) : Skip or link the duplicate files during the restructuring, see restructure_pollution_data
+        - cache_max_bytes (int) : Total size of the cache entries above which the least recently used are deleted,
+                                  default to CACHE_MAX_BYTES, unbounded if None
+        - catalog (str or pathlib.Path) : Absolute path to the SQLite catalog of pollution_data, see analytic_tools.catalog,
+                                    created if missing. The catalog is refreshed, which only lists the directories changed
+                                    since the last run, and the diagnostics and the tree of the stages are read from it
+                                    instead of walking pollution_data. pollution_data is walked if not given
+        - stream (bool) : Run the restructure and plot stages together as the streaming pipeline of
+                          analytic_tools.pipeline, which draws the figures while the files are still being found and
+                          copied. It needs both stages, does a full run, and draws in one thread, so plot_workers,
+                          incremental, shard and dedup cannot be used with it
 
     Returns:
     None
@@ -87,27 +212,263 @@ def analyze_pollution_data(work_dir: str or Path) -> None:
 
     if not work_dir.is_dir(): 
         raise NotADirectoryError(f'{work_dir} is not directory or doesnt exist')
+
+    check_strategy(strategy)
+
+    if stages is None:
+        stages = ["diagnose", "restructure"] if shard is not None else ["diagnose", "restructure", "plot"]
+        stages += ["export"] if export else []
+    stages = set(stages)
+    unknown = stages - set(STAGES)
+    if unknown:
+        raise ValueError(f"Invalid stages: {', '.join(sorted(unknown))}, expected some of {', '.join(STAGES)}")
+    conflicting = _shard_conflicts(stages) if shard is not None else []
+    if conflicting:
+        raise ValueError(
+            "A shard runs either the diagnose and restructure stages or the plot stage, "
+            f"it cannot run the stages {', '.join(conflicting)}"
+        )
+    if stream and (
+        not {"restructure", "plot"} <= stages or incremental or shard is not None or dedup is not None or plot_workers > 1
+    ):
+        raise ValueError(
+            "The streaming pipeline runs both the restructure and plot stages in full, in one process, "
+            "without incremental, shard, dedup or plot_workers"
+        )
+    if shard is not None and catalog is not None:
+        raise ValueError("A shard only reads its own sources, it cannot use the catalog of the whole tree")
+    if dedup is not None and strategy == "virtual":
+        raise ValueError("Nothing is copied with the virtual strategy, dedup needs another strategy")
+
+    # The modules parsing the files load numpy, they are only imported by the stages reading the series
+    cache = None
+    if cache_dir is not None and stages & {"export", "plot"}:
+        from analytic_tools.cache import ParseCache
+
+        cache = ParseCache(cache_dir, cache_max_bytes)
                   
     pollution_dir = work_dir / "pollution_data"
+    # A run without the restructure stage works on the by_gas directory of an earlier run,
+    # and the shards share pollution_data_restructured
+    reuse = incremental or "restructure" not in stages or shard is not None
     
     restructured_dir = work_dir / "pollution_data_restructured"
-    restructured_dir.mkdir(parents=True)
+    restructured_dir.mkdir(parents=True, exist_ok=reuse)
+
+    index = None
+    content = None
+    if shard is not None and stages & {"diagnose", "restructure"}:
+        with tracer.span("scan"):
+            index = scan_shard(pollution_dir, shard)
+    elif catalog is not None and (stages & {"diagnose", "restructure"} or strategy == "virtual"):
+        from analytic_tools.catalog import Catalog
 
-    content = get_diagnostics(pollution_dir)
-    display_diagnostics(pollution_dir,content)
-    display_directory_tree(pollution_dir,3)
+        with tracer.span("scan"), Catalog(catalog, pollution_dir, classifier) as tree_catalog:
+            tracer.count("directories listed", tree_catalog.refresh())
+            index = tree_catalog.index()
+            content = tree_catalog.diagnostics()
+    elif stages & {"diagnose", "restructure"} or strategy == "virtual":
+        with tracer.span("scan"):
+            index = scan_directory(pollution_dir)
+
+    if "diagnose" in stages:
+        with tracer.span("diagnostics"):
+            if shard is not None:
+                content = shard_diagnostics(pollution_dir, index, shard)
+                save_diagnostics(shard_diagnostics_path(restructured_dir, shard), content)
+            else:
+                if content is None:
+                    content = get_diagnostics(pollution_dir, index, classifier)
+                display_diagnostics(pollution_dir,content)
+                display_sources_tree(pollution_dir, 3, index)
+        tracer.count("files scanned", content["files"])
 
     by_gas_dir = restructured_dir / "by_gas"
-    by_gas_dir.mkdir(parents=True)
-    
-    restructure_pollution_data(pollution_dir,by_gas_dir)
+    by_gas_dir.mkdir(parents=True, exist_ok=reuse)
+
+    # Gas formulas to plot, all of them if None
+    changed = None
+    if "restructure" in stages and not stream:
+        manifest = restructured_dir / MANIFEST_NAME if incremental else None
+        if shard is not None:
+            # Every shard of an incremental run keeps a manifest and its changed gasses for merge_shards. A full run
+            # hashes nothing and drops those of an earlier run, so that merge_shards does not merge stale ones
+            manifest = shard_manifest_path(restructured_dir, shard) if incremental else None
+            if not incremental:
+                shard_manifest_path(restructured_dir, shard).unlink(missing_ok=True)
+                shard_changes_path(restructured_dir, shard).unlink(missing_ok=True)
+        with tracer.span("restructure"):
+            changed = restructure_pollution_data(
+                pollution_dir, by_gas_dir, index, workers, manifest, strategy, tracer, classifier=classifier, dedup=dedup
+            )
+        if not incremental:
+            changed = None
+        elif shard is not None:
+            save_changes(shard_changes_path(restructured_dir, shard), changed)
+    elif "plot" in stages and shard is not None and incremental:
+        # The gasses changed by all the shards, combined by merge_shards
+        changed = load_changes(restructured_dir / CHANGES_NAME)
+    view = gas_view(index, classifier) if strategy == "virtual" else None
 
     figures_dir = restructured_dir / "figures"
-    figures_dir.mkdir(parents=True)
+    figures_dir.mkdir(parents=True, exist_ok=reuse)
+
+    if stream:
+        from analytic_tools.pipeline import stream_pollution_data
+
+        with tracer.span("stream"):
+            figures = stream_pollution_data(pollution_dir, restructured_dir, strategy, cache, classifier=classifier)
+            tracer.count("figures written", len(set(figures)))
+
+    dataset = None
+    if "export" in stages:
+        from analytic_tools.dataset import GasDataset
+        from analytic_tools.export import EXPORT_NAME, export_dataset
+
+        # Parse every file once for both the export and the figures
+        with tracer.span("parse"):
+            if view is not None:
+                dataset = GasDataset.from_view(view, cache)
+            else:
+                dataset = GasDataset.from_by_gas_dir(by_gas_dir, cache=cache)
+        with tracer.span("export"):
+            export_dataset(dataset, restructured_dir / EXPORT_NAME)
+
+    if "plot" in stages and not stream:
+        from analytic_tools.plotting import plot_pollution_data
+
+        with tracer.span("plot"):
+            if changed is not None:
+                for gas in changed:
+                    figure = figures_dir / f"gas_{gas}.png"
+                    if not (by_gas_dir / f"gas_{gas}").exists() and figure.exists():
+                        figure.unlink()
+                if dataset is not None:
+                    dataset = dataset.subset(changed)
+            plot_pollution_data(
+                by_gas_dir, figures_dir, changed, view, dataset, cache, plot_workers, tracer=tracer, shard=shard
+            )
+
+
+def merge_shards(work_dir: str or Path, count: int) -> dict:
+    """Combine the manifests and diagnostics saved by the count shards of a sharded restructuring of work_dir.
+        The manifest of the incremental mode is replaced by the union of the shard manifests, as are the gasses changed
+        by the shards, and the diagnostics of the whole pollution_data directory are displayed.
+
+    Parameters:
+        - work_dir (str or pathlib.Path) : Absolute path to the working directory that contains the pollution_data directory
+        - count (int) : Number of shards the work was split into
+
+    Returns:
+        - content (dict) : The diagnostics of pollution_data added up over the shards, empty if no shard ran the diagnose stage
+    """
+    if not isinstance(work_dir, (str,Path)):
+        raise TypeError(f'{work_dir} is not a Path-like object')
+
+    restructured_dir = Path(work_dir) / "pollution_data_restructured"
+    if not restructured_dir.is_dir():
+        raise NotADirectoryError(f'{restructured_dir} is not directory or doesnt exist')
 
-    plot_pollution_data(by_gas_dir, figures_dir)
+    shards = [Shard(i, count) for i in range(count)]
+    manifests = [shard_manifest_path(restructured_dir, shard) for shard in shards]
+    # Without any shard manifest, e.g. after a diagnose-only run, the manifest of an earlier run is kept
+    if any(path.exists() for path in manifests):
+        merge_manifests(manifests, restructured_dir / MANIFEST_NAME)
+    # The plot stage of an incremental run only draws the changed gasses, and all of them after a full run
+    changes = [shard_changes_path(restructured_dir, shard) for shard in shards]
+    if any(path.exists() for path in changes):
+        merge_changes(changes, restructured_dir / CHANGES_NAME)
+    else:
+        (restructured_dir / CHANGES_NAME).unlink(missing_ok=True)
 
-def analyze_pollution_data_tmp(work_dir: str or Path) -> None:
+    paths = [shard_diagnostics_path(restructured_dir, shard) for shard in shards]
+    content = merge_diagnostics(path for path in paths if path.exists())
+    if content:
+        display_diagnostics(Path(work_dir) / "pollution_data", content)
+    return content
+
+
+def analyze_pollution_data_sharded(
+    work_dir: str or Path,
+    shards: int,
+    workers: int = 1,
+    incremental: bool = False,
+    strategy: str = "copy",
+    cache_dir: str or Path = None,
+    classifier: Classifier = None,
+    plot_workers: int = 1,
+    stages: Iterable[str] = None,
+    dedup: str = None,
+    cache_max_bytes: int = CACHE_MAX_BYTES,
+) -> dict:
+    """Run analyze_pollution_data split into shards, each in its own process, as independent workers on separate hosts
+        sharing the filesystem would. Every shard first restructures its sources, the shards are then merged, and every
+        shard finally plots its gasses. The export, which is not sharded, is then done by the calling process.
+
+    Parameters:
+        - work_dir (str or pathlib.Path) : Absolute path to the working directory that contains the pollution_data directory
+        - shards (int) : Number of shards and of processes
+        - workers (int) : Number of threads copying files in each shard, default to one
+        - incremental (bool) : Only copy the files changed since the previous run with the same number of shards, and
+                               only plot the gasses they changed. A full run hashes no file and writes no manifest
+        - strategy (str) : How the files are materialized in by_gas, default to copy
+        - cache_dir (str or pathlib.Path) : Absolute path to a binary cache of the parsed .csv files
+        - classifier (Classifier) : Recognizes the original gas files, see restructure_pollution_data
+        - plot_workers (int) : Number of processes rendering the figures in each shard, default to one
+        - stages (Iterable[str]) : The stages to run among STAGES, default to diagnose, restructure and plot
+        - dedup (str) : Skip or link the duplicate files found within each shard, see restructure_pollution_data
+        - cache_max_bytes (int) : Bound of the total size of the cache, see analyze_pollution_data
+
+    Returns:
+        - content (dict) : The diagnostics of pollution_data, see merge_shards
+    """
+    if not isinstance(shards, int) or shards < 1:
+        raise ValueError("shards should be a positive int")
+
+    stages = set(["diagnose", "restructure", "plot"] if stages is None else stages)
+    unknown = stages - set(STAGES)
+    if unknown:
+        raise ValueError(f"Invalid stages: {', '.join(sorted(unknown))}, expected some of {', '.join(STAGES)}")
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    run = functools.partial(
+        analyze_pollution_data,
+        work_dir,
+        workers,
+        incremental,
+        strategy,
+        cache_dir,
+        plot_workers,
+        classifier=classifier,
+        dedup=dedup,
+        cache_max_bytes=cache_max_bytes,
+    )
+    content = {}
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        first = [stage for stage in STAGES if stage in stages & {"diagnose", "restructure"}]
+        if first:
+            futures = [pool.submit(run, stages=first, shard=Shard(i, shards)) for i in range(shards)]
+            for future in futures:
+                future.result()
+            content = merge_shards(work_dir, shards)
+        if "plot" in stages:
+            futures = [pool.submit(run, stages=["plot"], shard=Shard(i, shards)) for i in range(shards)]
+            for future in futures:
+                future.result()
+    if "export" in stages:
+        analyze_pollution_data(
+            work_dir,
+            incremental=True,
+            strategy=strategy,
+            cache_dir=cache_dir,
+            stages=["export"],
+            classifier=classifier,
+            cache_max_bytes=cache_max_bytes,
+        )
+    return content
+
+def analyze_pollution_data_tmp(work_dir: str or Path, workers: int = 1, strategy: str = "copy") -> None:
     """Do the restructuring of the pollution_data in a temporary directory and create the figures
        showing emissions of each gas as function of all the corresponding
        sources. The new figures are saved in a real directory under work_dir.
@@ -115,12 +476,17 @@ def analyze_pollution_data_tmp(work_dir: str or Path) -> None:
     Parameters:
         - work_dir (str or pathlib.Path) : Absolute path to the working directory that
                                     contains the pollution_data directory and where the figures will be saved
+        - workers (int) : Number of threads copying files during the restructuring, default to one
+        - strategy (str) : How pollution_data and by_gas are materialized in the temporary directory, one of
+                           analytic_tools.materialize.STRATEGIES, default to copy. For hardlink and reflink the temporary
+                           directory is made under work_dir, so that it is on the same filesystem as pollution_data.
+                           With the virtual strategy pollution_data is read in place
 
     Returns:
     None
 
     Pseudocode:
-    - Create a temporary directory and copy pollution_data directory to it
+    - Create a temporary directory and materialize pollution_data directory in it
     - Perform the same operations as in analyze_pollution_data
     - Copy (or directly save) the figures to a directory named `figures` under the original working directory pointed to by `work_dir`
     """
@@ -133,32 +499,585 @@ def analyze_pollution_data_tmp(work_dir: str or Path) -> None:
     if not work_dir.is_dir(): 
         raise NotADirectoryError(f'{work_dir} is not directory or doesnt exist')
 
-    with tempfile.TemporaryDirectory() as temp_dir:
+    check_strategy(strategy)
+
+    same_filesystem = strategy in ("hardlink", "reflink")
+    with tempfile.TemporaryDirectory(dir=work_dir if same_filesystem else None) as temp_dir:
         temp_dir = Path(temp_dir)
 
-        shutil.copytree(work_dir / "pollution_data", temp_dir / "pollution_data")
-    
-        pollution_dir = temp_dir / "pollution_data"
+        pollution_dir = materialize_tree(work_dir / "pollution_data", temp_dir / "pollution_data", strategy)
     
         restructured_dir = temp_dir / "pollution_data_restructured"
         restructured_dir.mkdir(parents=True)
 
-        content = get_diagnostics(pollution_dir)
+        index = scan_directory(pollution_dir)
+        content = get_diagnostics(pollution_dir, index)
         display_diagnostics(pollution_dir,content)
-        display_directory_tree(pollution_dir,3)
+        display_sources_tree(pollution_dir, 3, index)
 
         by_gas_dir = restructured_dir / "by_gas"
         by_gas_dir.mkdir(parents=True)
         
-        restructure_pollution_data(pollution_dir,by_gas_dir)
+        restructure_pollution_data(pollution_dir,by_gas_dir, index, workers, strategy=strategy)
+        view = gas_view(index) if strategy == "virtual" else None
 
         figures_dir = work_dir / "figures"
         figures_dir.mkdir(parents=True)
 
-        plot_pollution_data(by_gas_dir, figures_dir)
+        from analytic_tools.plotting import plot_pollution_data
+
+        plot_pollution_data(by_gas_dir, figures_dir, view=view)
+
+
+async def _run_blocking(executor: "Executor", func: Callable, *args, **kwargs):
+    """Run the blocking call func(*args, **kwargs) in executor (the loop's default executor if None) and await it."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def restructure_pollution_data_async(
+    pollution_dir: str or Path,
+    dest_dir: str or Path,
+    index: DirectoryNode = None,
+    limit: int = 8,
+    manifest: str or Path = None,
+    strategy: str = "copy",
+    progress: Callable[[str, int], None] = None,
+    executor: "Executor" = None,
+) -> Set[str]:
+    """Asynchronous variant of restructure_pollution_data that never blocks the event loop.
+        All filesystem work runs in executor, with at most limit files being materialized at a time.
+        Cancelling the task stops it before the next file, the files already copied are kept.
+
+    Parameters:
+        - pollution_dir (str or pathlib.Path) : The absolute path to pollution_data directory
+        - dest_dir (str or pathlib.Path) : The absolute path to the pollution_data_restructured/by_gas directory
+        - index (DirectoryNode) : Tree of pollution_dir already read by scan_directory, the directory is scanned if not given
+        - limit (int) : Maximum number of files materialized concurrently, default to 8
+        - manifest (str or pathlib.Path) : Absolute path to the manifest of the previous run, see restructure_pollution_data
+        - strategy (str) : How the files are materialized in dest_dir, default to copy
+        - progress (Callable[[str, int], None]) : Called in the event loop with the stage name "restructure" and the
+                                                number of files materialized so far, after each file
+        - executor (concurrent.futures.Executor) : Executor running the blocking calls, default to the loop's default executor
+
+    Returns:
+        - changed (Set[str]) : The gas formulas whose gas_[gas_formula] directory has been changed
+    """
+    if not isinstance(pollution_dir,(str,Path)) or not isinstance(dest_dir,(str,Path)):
+        raise TypeError("Object is not path-like")
+
+    if not isinstance(limit, int) or limit < 1:
+        raise ValueError("limit should be a positive int")
+
+    import asyncio
+
+    check_strategy(strategy)
+
+    pollution_dir = Path(pollution_dir)
+    dest_dir = Path(dest_dir)
+
+    def prepare() -> RestructurePlan:
+        if not dest_dir.exists() or not pollution_dir.exists():
+            raise NotADirectoryError(f'{dest_dir} {pollution_dir} Directory doesnt exist')
+        tree = index if index is not None else scan_directory(pollution_dir)
+        return RestructurePlan(pollution_dir, dest_dir, tree, manifest, strategy=strategy)
+
+    plan = await _run_blocking(executor, prepare)
+    jobs = plan.jobs()
+    # The jobs generator is advanced by one worker at a time
+    jobs_lock = asyncio.Lock()
+    done = 0
+
+    async def worker() -> None:
+        nonlocal done
+        while True:
+            async with jobs_lock:
+                job = await _run_blocking(executor, next, jobs, None)
+            if job is None:
+                return
+            await _run_blocking(executor, materialize_file, *job, strategy)
+            done += 1
+            if progress is not None:
+                progress("restructure", done)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    return await _run_blocking(executor, plan.finish)
+
+
+async def analyze_pollution_data_async(
+    work_dir: str or Path,
+    limit: int = 8,
+    incremental: bool = False,
+    strategy: str = "copy",
+    cache_dir: str or Path = None,
+    plot_workers: int = 1,
+    progress: Callable[[str, int], None] = None,
+    executor: "Executor" = None,
+    cache_max_bytes: int = CACHE_MAX_BYTES,
+) -> None:
+    """Asynchronous variant of analyze_pollution_data that never blocks the event loop, so that one process can
+        serve many work directories concurrently. The scan, the diagnostics and the plotting run in executor,
+        and the restructuring is done by restructure_pollution_data_async.
+
+    Parameters:
+        - work_dir (str or pathlib.Path) : Absolute path to the working directory that contains the pollution_data directory
+        - limit (int) : Maximum number of files materialized concurrently, default to 8
+        - incremental (bool) : Reuse the pollution_data_restructured of a previous run, see analyze_pollution_data
+        - strategy (str) : How the files are materialized in by_gas, default to copy
+        - cache_dir (str or pathlib.Path) : Absolute path to a binary cache of the parsed .csv files
+        - plot_workers (int) : Number of processes rendering the figures, default to one
+        - progress (Callable[[str, int], None]) : Called in the event loop with a stage name and the number of items
+                                                done in that stage: "scan" (files found), "restructure" (files
+                                                materialized) and "plot" (figures written)
+        - executor (concurrent.futures.Executor) : Executor running the blocking calls, default to the loop's default executor
+        - cache_max_bytes (int) : Bound of the total size of the cache, see analyze_pollution_data
+
+    Returns:
+    None
+    """
+    if not isinstance(work_dir, (str,Path)):
+        raise TypeError(f'{work_dir} is not a Path-like object')
+
+    check_strategy(strategy)
+    work_dir = Path(work_dir)
+    restructured_dir = work_dir / "pollution_data_restructured"
+    pollution_dir = work_dir / "pollution_data"
+    by_gas_dir = restructured_dir / "by_gas"
+    figures_dir = restructured_dir / "figures"
+
+    def prepare() -> Tuple[DirectoryNode, int]:
+        if not work_dir.is_dir():
+            raise NotADirectoryError(f'{work_dir} is not directory or doesnt exist')
+        restructured_dir.mkdir(parents=True, exist_ok=incremental)
+        by_gas_dir.mkdir(parents=True, exist_ok=incremental)
+        figures_dir.mkdir(parents=True, exist_ok=incremental)
+        index = scan_directory(pollution_dir)
+        content = get_diagnostics(pollution_dir, index)
+        display_diagnostics(pollution_dir, content)
+        display_sources_tree(pollution_dir, 3, index)
+        return index, content["files"]
+
+    index, files = await _run_blocking(executor, prepare)
+    if progress is not None:
+        progress("scan", files)
+
+    manifest = restructured_dir / MANIFEST_NAME if incremental else None
+    changed = await restructure_pollution_data_async(
+        pollution_dir, by_gas_dir, index, limit, manifest, strategy, progress, executor
+    )
+
+    def plot() -> int:
+        from analytic_tools.cache import ParseCache
+        from analytic_tools.plotting import plot_pollution_data
+
+        cache = ParseCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+        view = gas_view(index) if strategy == "virtual" else None
+        gases = None
+        if incremental:
+            for gas in changed:
+                figure = figures_dir / f"gas_{gas}.png"
+                if not (by_gas_dir / f"gas_{gas}").exists() and figure.exists():
+                    figure.unlink()
+            gases = changed
+        return len(plot_pollution_data(by_gas_dir, figures_dir, gases, view, cache=cache, workers=plot_workers))
+
+    figures = await _run_blocking(executor, plot)
+    if progress is not None:
+        progress("plot", figures)
+
+
+def _update_gas_files(
+    pollution_dir: Path,
+    by_gas_dir: Path,
+    figures_dir: Path,
+    affected: Set[Tuple[str, str]],
+    strategy: str = "copy",
+    cache: "ParseCache" = None,
+    classifier: Classifier = None,
+) -> Tuple[Set[str], Dict[Tuple[str, str], Exception]]:
+    """Bring the by_gas copies and the figures of the affected (source, gas) pairs up to date, and return the
+        gas formulas whose figure was drawn again or removed, and the pairs that could not be updated with the error.
+        The files of a pair are the original gas files of the source recognized by classifier, e.g. its
+        [gas_formula].csv file and, with Classifier(binary=True), its [gas_formula]_[number].npy series.
+        An error on one gas, such as a file read while it was being written, does not stop the other gases.
+    """
+    from analytic_tools.plotting import create_plot
+
+    if classifier is None:
+        classifier = DEFAULT_CLASSIFIER
+
+    by_src_dir = pollution_dir / "by_src"
+    gases = set()
+    failed = {}
+    for source, gas in affected:
+        source_dir = by_src_dir / source
+        gas_dir = by_gas_dir / f"gas_{gas}"
+        prefix = f"{source}_"
+        try:
+            try:
+                srcs = [path for path in source_dir.iterdir() if classifier.gas_of(path.name) == gas and path.is_file()]
+            except (FileNotFoundError, NotADirectoryError):
+                # The source directory is gone
+                srcs = []
+            for src in srcs:
+                gas_dir.mkdir(exist_ok=True)
+                materialize_file(src, gas_dir / merge_parent_and_basename(src), strategy)
+            # The copies of the pair's files removed from the source directory
+            names = {merge_parent_and_basename(src) for src in srcs}
+            stale = [
+                dest
+                for dest in (gas_dir.iterdir() if gas_dir.is_dir() else [])
+                if dest.name.startswith(prefix)
+                and classifier.gas_of(dest.name[len(prefix):]) == gas
+                and dest.name not in names
+            ]
+            for dest in stale:
+                dest.unlink()
+            if not srcs and not stale and strategy != "virtual":
+                continue
+        except OSError as error:
+            failed[(source, gas)] = error
+            continue
+        gases.add(gas)
+
+    # The virtual view of the whole tree, the figures of the virtual strategy are drawn from the files in pollution_data
+    view = gas_view(scan_directory(pollution_dir), classifier) if gases and strategy == "virtual" else None
+    for gas in list(gases):
+        gas_dir = by_gas_dir / f"gas_{gas}"
+        try:
+            files = view.get(gas) if view is not None else None
+            if files or (files is None and gas_dir.is_dir() and any(gas_dir.iterdir())):
+                create_plot(gas_dir, figures_dir, files, cache=cache)
+                continue
+            # The last file of the gas is gone
+            figure = figures_dir / f"gas_{gas}.png"
+            if figure.exists():
+                figure.unlink()
+            if gas_dir.is_dir() and not any(gas_dir.iterdir()):
+                gas_dir.rmdir()
+        except Exception as error:
+            gases.discard(gas)
+            failed.update({pair: error for pair in affected if pair[1] == gas})
+    return gases, failed
+
+
+def watch_pollution_data(
+    work_dir: str or Path,
+    debounce: float = 0.5,
+    strategy: str = "copy",
+    cache_dir: str or Path = None,
+    polling_interval: float = None,
+    stop: threading.Event = None,
+    on_update: Callable[[Set[str]], None] = None,
+    cache_max_bytes: int = CACHE_MAX_BYTES,
+    classifier: Classifier = None,
+) -> None:
+    """Keep pollution_data_restructured up to date with pollution_data/by_src until stop is set.
+        The work directory is first analyzed incrementally. Then the changes below by_src are collected until none
+        has arrived for debounce seconds, and only the by_gas files and the figures of the affected gases are updated.
+        The changes are reported by inotify when available, by scanning by_src every polling_interval seconds otherwise.
+        The manifest of the incremental mode is not updated, so the next incremental run checks the watched files again.
+        A change that cannot be processed, e.g. a file read while it is being written, is reported and tried again
+        after RETRY_DELAY seconds, without stopping the watch.
+
+    Parameters:
+        - work_dir (str or pathlib.Path) : Absolute path to the working directory that contains the pollution_data directory
+        - debounce (float) : Number of seconds without new changes before they are processed, default to 0.5
+        - strategy (str) : How the files are materialized in by_gas, default to copy
+        - cache_dir (str or pathlib.Path) : Absolute path to a binary cache of the parsed .csv files
+        - polling_interval (float) : Number of seconds between two scans of by_src, forces polling instead of inotify if given
+        - stop (threading.Event) : Event ending the watch when set, the watch runs until interrupted if not given
+        - on_update (Callable[[Set[str]], None]) : Called with the gas formulas whose figures were updated
+        - cache_max_bytes (int) : Bound of the total size of the cache, see analyze_pollution_data
+        - classifier (Classifier) : Recognizes the original gas files, see restructure_pollution_data. The changed files
+                                    it does not recognize are ignored
+
+    Returns:
+    None
+    """
+    if not isinstance(work_dir, (str,Path)):
+        raise TypeError(f'{work_dir} is not a Path-like object')
+
+    work_dir = Path(work_dir)
+    pollution_dir = work_dir / "pollution_data"
+    by_src_dir = pollution_dir / "by_src"
+
+    if not by_src_dir.is_dir():
+        raise NotADirectoryError(f'{by_src_dir} is not directory or doesnt exist')
+
+    if debounce < 0:
+        raise ValueError("debounce should not be negative")
+
+    check_strategy(strategy)
+
+    # The cache loads numpy, which the figures only need once a change arrives
+    cache = None
+    if cache_dir is not None:
+        from analytic_tools.cache import ParseCache
+
+        cache = ParseCache(cache_dir, cache_max_bytes)
+    restructured_dir = work_dir / "pollution_data_restructured"
+
+    # Watch before the first analysis so that no file landing meanwhile is missed
+    with open_watcher(by_src_dir, polling_interval) as watcher:
+        analyze_pollution_data(
+            work_dir,
+            incremental=True,
+            strategy=strategy,
+            cache_dir=cache_dir,
+            classifier=classifier,
+            cache_max_bytes=cache_max_bytes,
+        )
+
+        pending = set()
+        # The (source, gas) pairs whose update failed, tried again with the next batch
+        retry = set()
+        deadline = None
+        while stop is None or not stop.is_set():
+            timeout = 1.0 if deadline is None else max(deadline - time.monotonic(), 0)
+            changed = watcher.changes(timeout)
+            if changed:
+                pending |= changed
+                deadline = time.monotonic() + debounce
+            elif deadline is not None and time.monotonic() >= deadline:
+                try:
+                    gases, failed = _update_gas_files(
+                        pollution_dir,
+                        restructured_dir / "by_gas",
+                        restructured_dir / "figures",
+                        affected_sources(by_src_dir, pending, classifier) | retry,
+                        strategy,
+                        cache,
+                        classifier,
+                    )
+                except Exception as error:
+                    print(f"Could not update the changes below {by_src_dir}: {error}")
+                    gases, failed = set(), None
+                deadline = None
+                if failed is not None:
+                    pending = set()
+                    for (source, gas), error in sorted(failed.items()):
+                        print(f"Could not update the {gas} files of {by_src_dir / source}: {error}")
+                    retry = set(failed)
+                if failed is None or failed:
+                    # Tried again after a pause, or as soon as new changes have settled
+                    deadline = time.monotonic() + max(debounce, RETRY_DELAY)
+                if gases and on_update is not None:
+                    on_update(gases)
+
+
+def _print_plan(
+    work_dir: Path, stages: Set[str], strategy: str, incremental: bool, classifier: Classifier = None
+) -> None:
+    """Print what a run of the stages would do, without writing anything."""
+    pollution_dir = work_dir / "pollution_data"
+    restructured_dir = work_dir / "pollution_data_restructured"
+    index = scan_directory(pollution_dir)
+    view = gas_view(index, classifier)
+
+    print(f"Work directory: {work_dir}")
+    print(f"Stages: {', '.join(stage for stage in STAGES if stage in stages)}")
+    if "diagnose" in stages:
+        print(f"diagnose: {get_diagnostics(pollution_dir, index, classifier)['files']} files in {pollution_dir}")
+    if "restructure" in stages:
+        mode = "new or changed files of " if incremental else ""
+        for gas, files in sorted(view.items()):
+            print(f"restructure: {strategy} {mode}{len(files)} files to {restructured_dir / 'by_gas' / f'gas_{gas}'}")
+    if "export" in stages:
+        from analytic_tools.export import EXPORT_NAME
+
+        print(f"export: {sum(map(len, view.values()))} series to {restructured_dir / EXPORT_NAME}")
+    if "plot" in stages:
+        for gas in sorted(view):
+            print(f"plot: {restructured_dir / 'figures' / f'gas_{gas}.png'}")
+
+
+def _positive_int(text: str) -> int:
+    """Parse the number of workers or shards given on the command line, which must be at least 1."""
+    import argparse
+
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"should be at least 1, got {value}")
+    return value
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point, installed as pollution-analyze. Run with --help for the options."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="pollution-analyze",
+        description="Restructure the pollution_data directory of a work directory by gas and plot the emissions.",
+    )
+    parser.add_argument("work_dir", type=Path, help="directory containing pollution_data")
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES,
+        help="stages to run, default to diagnose restructure plot, and to diagnose restructure with --shard",
+    )
+    parser.add_argument("--workers", type=_positive_int, default=1, help="threads copying files")
+    parser.add_argument("--plot-workers", type=_positive_int, default=1, help="processes rendering figures")
+    parser.add_argument(
+        "--strategy", choices=STRATEGIES, default="copy", help="how the files are materialized in by_gas"
+    )
+    parser.add_argument("--cache-dir", type=Path, help="directory of the binary cache of the parsed .csv files")
+    parser.add_argument(
+        "--cache-max-bytes", type=int, default=CACHE_MAX_BYTES,
+        help=f"total size of the cache above which the least recently used entries are deleted, default to {CACHE_MAX_BYTES}",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", help="only process the files changed since the previous run"
+    )
+    parser.add_argument(
+        "--catalog", type=Path, help="SQLite catalog of pollution_data, refreshed and read instead of walking the tree"
+    )
+    parser.add_argument(
+        "--npy", action="store_true", help="also restructure and plot the [gas_formula]_[number].npy series"
+    )
+    parser.add_argument(
+        "--dedup", choices=MODES, help="skip or hard link the files identical to another file, and report the bytes saved"
+    )
+    parser.add_argument(
+        "--clean", action="store_true", help="delete the pollution_data_restructured of an earlier run first"
+    )
+    parser.add_argument("--yes", action="store_true", help="do not ask for confirmation before deleting")
+    parser.add_argument(
+        "--stream", action="store_true", help="restructure and plot as one streaming pipeline, drawing while copying"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="print what would be done without writing anything")
+    parser.add_argument("--profile", action="store_true", help="print the time spent in each stage and the counters")
+    parser.add_argument("--trace", type=Path, help="write a Chrome trace of the run to this file")
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument(
+        "--shard", type=Shard.parse, metavar="I/N",
+        help="only run shard I of N, either the diagnose and restructure stages or, once every shard is merged, --stages plot",
+    )
+    sharding.add_argument(
+        "--merge-shards", type=_positive_int, metavar="N", help="combine the manifests and diagnostics of N restructured shards"
+    )
+    sharding.add_argument("--shards", type=_positive_int, metavar="N", help="run the stages split into N shards in N processes")
+    args = parser.parse_args(argv)
+    if args.stages is None:
+        args.stages = ["diagnose", "restructure"] if args.shard is not None else ["diagnose", "restructure", "plot"]
+    if args.shard is not None and _shard_conflicts(set(args.stages)):
+        parser.error(
+            "--shard runs either --stages diagnose restructure or --stages plot, "
+            f"it cannot run the stages {', '.join(_shard_conflicts(set(args.stages)))}"
+        )
+    if args.cache_max_bytes < 0:
+        parser.error("--cache-max-bytes should not be negative")
+    if args.shards is not None and (args.profile or args.trace is not None):
+        parser.error("--profile and --trace record a single process and cannot be used with --shards")
+    if args.catalog is not None and (args.shard is not None or args.shards is not None):
+        parser.error("--catalog covers the whole tree and cannot be used with --shard or --shards")
+    if args.dedup is not None and args.strategy == "virtual":
+        parser.error("--dedup needs files to be copied and cannot be used with --strategy virtual")
+    if args.stream:
+        if not {"restructure", "plot"} <= set(args.stages):
+            parser.error("--stream runs the restructure and plot stages together, --stages should include both")
+        conflicting = [
+            option
+            for option, used in [
+                ("--incremental", args.incremental),
+                ("--shard", args.shard is not None),
+                ("--shards", args.shards is not None),
+                ("--dedup", args.dedup is not None),
+                ("--plot-workers", args.plot_workers > 1),
+            ]
+            if used
+        ]
+        if conflicting:
+            parser.error(f"--stream does a full run in one process and cannot be used with {', '.join(conflicting)}")
+    if not (args.work_dir / "pollution_data").is_dir():
+        parser.error(f"{args.work_dir} has no pollution_data directory")
+    classifier = Classifier(binary=True) if args.npy else None
+
+    restructured_dir = args.work_dir / "pollution_data_restructured"
+    if args.clean and restructured_dir.exists():
+        delete_directories([restructured_dir], not args.yes, args.dry_run, args.workers)
+        if restructured_dir.exists() and not args.dry_run:
+            return 1
+
+    if args.dry_run:
+        _print_plan(args.work_dir, set(args.stages), args.strategy, args.incremental, classifier)
+        return 0
+
+    if args.merge_shards is not None:
+        merge_shards(args.work_dir, args.merge_shards)
+        return 0
+
+    if args.shards is not None:
+        analyze_pollution_data_sharded(
+            args.work_dir,
+            args.shards,
+            args.workers,
+            args.incremental,
+            args.strategy,
+            args.cache_dir,
+            classifier,
+            plot_workers=args.plot_workers,
+            stages=args.stages,
+            dedup=args.dedup,
+            cache_max_bytes=args.cache_max_bytes,
+        )
+        return 0
+
+    tracer = NULL_TRACER
+    if args.profile or args.trace is not None:
+        from analytic_tools.tracing import Tracer
+
+        tracer = Tracer()
+
+    try:
+        with tracer:
+            analyze_pollution_data(
+                args.work_dir,
+                workers=args.workers,
+                incremental=args.incremental,
+                strategy=args.strategy,
+                cache_dir=args.cache_dir,
+                plot_workers=args.plot_workers,
+                tracer=tracer,
+                stages=args.stages,
+                shard=args.shard,
+                classifier=classifier,
+                dedup=args.dedup,
+                cache_max_bytes=args.cache_max_bytes,
+                catalog=args.catalog,
+                stream=args.stream,
+            )
+    except FileExistsError as error:
+        # A plain run does not overwrite the outputs of an earlier run
+        print(
+            f"{error.filename} already exists, run with --incremental to update it or --clean to delete it first",
+            file=sys.stderr,
+        )
+        return 1
+
+    if args.profile:
+        print("Stage timings:")
+        for name, seconds in sorted(tracer.totals().items(), key=lambda item: -item[1]):
+            print(f"  {name:12} {seconds:10.4f} s")
+        print("File operations, added up over the workers:")
+        for name, seconds in sorted(tracer.totals("file").items(), key=lambda item: -item[1]):
+            print(f"  {name:12} {seconds:10.4f} s")
+        for name, value in tracer.counters.items():
+            print(f"  {name:20} {value}")
+    if args.trace is not None:
+        tracer.save(args.trace)
+    return 0
 
 
 if __name__ == "__main__":
-    work_dir =  '/Users/tonjesandanger/Desktop/IN4110/IN3110-tonjevs/assignment2'
-    analyze_pollution_data(work_dir)
-    
+    sys.exit(main())
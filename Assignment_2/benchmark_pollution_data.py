@@ -0,0 +1,221 @@
+"""This is the script timing the restructuring, diagnostics and plotting of synthetic pollution_data directories.
+
+Each scale generates a pollution_data tree with a number of sources, gases, noise files per source and rows per file,
+and times get_diagnostics, display_directory_tree, restructure_pollution_data, create_plot and analyze_pollution_data on it.
+The results are written as JSON and can be compared with a baseline written by an earlier run:
+
+    python benchmark_pollution_data.py --scales small medium --output results.json --baseline baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+from pathlib import Path
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from analytic_tools.plotting import create_plot
+from analytic_tools.utilities import display_directory_tree, get_diagnostics
+from analyze_pollution_data import analyze_pollution_data, restructure_pollution_data
+
+SCALES = {
+    "small": {"sources": 5, "gases": 3, "noise_files": 10, "rows": 33},
+    "medium": {"sources": 100, "gases": 5, "noise_files": 50, "rows": 100},
+    "large": {"sources": 1000, "gases": 5, "noise_files": 100, "rows": 1000},
+}
+
+GASES = ["CO2", "CH4", "N2O", "SF6", "H2"]
+
+STEPS = [
+    "get_diagnostics",
+    "display_directory_tree",
+    "restructure_pollution_data",
+    "create_plot",
+    "analyze_pollution_data",
+]
+
+
+def generate_pollution_data(
+    work_dir: str or Path, sources: int = 5, gases: int = 3, noise_files: int = 10, rows: int = 33, seed: int = 0
+) -> Path:
+    """Generate a synthetic pollution_data directory in work_dir, laid out like the real one.
+        Every source directory holds one [gas_formula].csv file per gas with rows year,emission rows,
+        and noise_files empty files that are not original gas files: .npy files, gas .csv files with a suffix and .txt files.
+
+    Parameters:
+        - work_dir (str or pathlib.Path) : Absolute path to the directory to create pollution_data in
+        - sources (int) : Number of src_[name] directories
+        - gases (int) : Number of gases, taken from the start of ['CO2', 'CH4', 'N2O', 'SF6', 'H2']
+        - noise_files (int) : Number of noise files in each source directory
+        - rows (int) : Number of data rows in each gas .csv file
+        - seed (int) : Seed of the random emissions and noise file names
+
+    Returns:
+        - (pathlib.Path) : Absolute path to the generated pollution_data directory
+    """
+    if not 1 <= gases <= len(GASES):
+        raise ValueError(f"gases should be between 1 and {len(GASES)}")
+
+    rng = random.Random(seed)
+    pollution_dir = Path(work_dir) / "pollution_data"
+    by_src_dir = pollution_dir / "by_src"
+    by_src_dir.mkdir(parents=True)
+    (pollution_dir / "README.md").write_text("Synthetic pollution data\n")
+    (pollution_dir / "LICENCE.txt").touch()
+
+    years = range(1990, 1990 + rows)
+    for i in range(sources):
+        src_dir = by_src_dir / f"src_{i:04d}"
+        src_dir.mkdir()
+        for gas in GASES[:gases]:
+            lines = [f"{year},{rng.randint(0, 20000)}" for year in years]
+            (src_dir / f"{gas}.csv").write_text("aar,value\n" + "\n".join(lines) + "\n")
+        for j in range(noise_files):
+            gas = GASES[j % gases]
+            kind = j % 3
+            if kind == 0:
+                name = f"{gas}_{rng.randint(0, 999)}_{j}.npy"
+            elif kind == 1:
+                name = f"{gas}_{j:04d}.csv"
+            else:
+                name = f"{rng.randint(0, 99999):05d}_{j}.txt"
+            (src_dir / name).touch()
+
+    return pollution_dir
+
+
+def _best_time(func: Callable[[], None], repeat: int, setup: Callable[[], None] = None) -> float:
+    """Return the shortest of repeat timings of func, calling setup before each run outside of the timing."""
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_scale(work_dir: Path, repeat: int = 3, **params) -> Dict[str, float]:
+    """Time every step of STEPS on a pollution_data tree generated in work_dir with params.
+
+    Parameters:
+        - work_dir (pathlib.Path) : Absolute path to an empty directory
+        - repeat (int) : Number of runs of each step, the shortest is kept
+        - params : Parameters of generate_pollution_data
+
+    Returns:
+        - (Dict[str, float]) : The shortest time in seconds of each step
+    """
+    pollution_dir = generate_pollution_data(work_dir, **params)
+    restructured_dir = work_dir / "pollution_data_restructured"
+    by_gas_dir = restructured_dir / "by_gas"
+    figures_dir = restructured_dir / "figures"
+
+    def clean() -> None:
+        if restructured_dir.exists():
+            shutil.rmtree(restructured_dir)
+
+    def clean_by_gas() -> None:
+        clean()
+        by_gas_dir.mkdir(parents=True)
+
+    results = {}
+    results["get_diagnostics"] = _best_time(lambda: get_diagnostics(pollution_dir), repeat)
+    results["display_directory_tree"] = _best_time(lambda: display_directory_tree(pollution_dir), repeat)
+    results["restructure_pollution_data"] = _best_time(
+        lambda: restructure_pollution_data(pollution_dir, by_gas_dir), repeat, clean_by_gas
+    )
+    figures_dir.mkdir(exist_ok=True)
+    results["create_plot"] = _best_time(lambda: create_plot(by_gas_dir / "gas_CO2", figures_dir), repeat)
+    results["analyze_pollution_data"] = _best_time(lambda: analyze_pollution_data(work_dir), repeat, clean)
+    return results
+
+
+def run_benchmarks(scales: Dict[str, dict] = None, repeat: int = 3) -> dict:
+    """Time every step of STEPS at every scale, each in a fresh temporary directory.
+
+    Parameters:
+        - scales (Dict[str, dict]) : Scale names mapped to parameters of generate_pollution_data, default to SCALES
+        - repeat (int) : Number of runs of each step, the shortest is kept
+
+    Returns:
+        - (dict) : The results, with the environment, the parameters and the timings of each scale
+    """
+    if scales is None:
+        scales = SCALES
+
+    results = {
+        "version": 1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scales": {},
+    }
+    for name, params in scales.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            timings = benchmark_scale(Path(tmp), repeat, **params)
+        results["scales"][name] = {"params": params, "timings": timings}
+    return results
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = 0.2, min_seconds: float = 0.005) -> List[str]:
+    """Compare results with a baseline written by an earlier run.
+
+    Parameters:
+        - results (dict) : Results of run_benchmarks
+        - baseline (dict) : Results of an earlier run_benchmarks
+        - tolerance (float) : Allowed relative slowdown, default to 20 %
+        - min_seconds (float) : Slowdowns smaller than this number of seconds are ignored as noise
+
+    Returns:
+        - (List[str]) : A description of every step slower than the baseline beyond tolerance, empty if there is none
+    """
+    regressions = []
+    for name, scale in results["scales"].items():
+        base_scale = baseline.get("scales", {}).get(name)
+        if base_scale is None or base_scale["params"] != scale["params"]:
+            continue
+        for step, seconds in scale["timings"].items():
+            base = base_scale["timings"].get(step)
+            if base is None:
+                continue
+            if seconds > base * (1 + tolerance) and seconds - base > min_seconds:
+                regressions.append(f"{name}/{step}: {seconds:.4f} s, baseline {base:.4f} s (+{(seconds / base - 1) * 100:.0f} %)")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=sorted(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each step, the shortest is kept")
+    parser.add_argument("--output", type=Path, help="file to write the results to as JSON")
+    parser.add_argument("--baseline", type=Path, help="results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks({name: SCALES[name] for name in args.scales}, args.repeat)
+    for name, scale in results["scales"].items():
+        for step, seconds in scale["timings"].items():
+            print(f"{name:8} {step:28} {seconds:10.4f} s")
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline is not None:
+        regressions = compare_results(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
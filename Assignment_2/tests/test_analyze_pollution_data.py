@@ -1,11 +1,27 @@
+import asyncio
+import json
+import os
 from pathlib import Path
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
 
 import pytest
 
+from analytic_tools.classification import Classifier
+from analytic_tools.sharding import Shard
 from analyze_pollution_data import (
     analyze_pollution_data,
+    analyze_pollution_data_async,
+    analyze_pollution_data_sharded,
     analyze_pollution_data_tmp,
+    main,
     restructure_pollution_data,
+    restructure_pollution_data_async,
+    watch_pollution_data,
 )
 
 
@@ -145,3 +161,798 @@ def test_analyze_pollution_data_tmp(tmp_workdir: Path):
     for p in actual_figures:
         # Figures must only contain correctly named directories
         assert p in possible_files, f"{p} is an invalid file in figures"
+
+
+def test_restructure_pollution_data_parallel(tmp_workdir: Path):
+    """Test that restructuring with a thread pool gives the same files as restructuring serially
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    serial = tmp_workdir / "serial"
+    parallel = tmp_workdir / "parallel"
+    serial.mkdir()
+    parallel.mkdir()
+
+    restructure_pollution_data(pollution_data, serial)
+    restructure_pollution_data(pollution_data, parallel, workers=4)
+
+    serial_files = sorted(p.relative_to(serial) for p in serial.rglob("*.csv"))
+    parallel_files = sorted(p.relative_to(parallel) for p in parallel.rglob("*.csv"))
+    assert serial_files
+    assert serial_files == parallel_files
+    for rel in serial_files:
+        assert (serial / rel).read_bytes() == (parallel / rel).read_bytes()
+
+
+def test_restructure_pollution_data_incremental(tmp_workdir: Path):
+    """Test that an incremental restructuring only copies new or changed files and removes copies of deleted files
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    by_gas = tmp_workdir / "pollution_data_restructured" / "by_gas"
+    by_gas.mkdir(parents=True)
+    manifest = tmp_workdir / "pollution_data_restructured" / "manifest.json"
+
+    assert restructure_pollution_data(pollution_data, by_gas, manifest=manifest) == {"CO2", "CH4", "N2O"}
+    assert manifest.exists()
+    assert restructure_pollution_data(pollution_data, by_gas, manifest=manifest) == set()
+
+    # Touching a file without changing its content does not copy it again
+    source = pollution_data / "by_src" / "src_industry" / "CH4.csv"
+    source.write_bytes(source.read_bytes())
+    assert restructure_pollution_data(pollution_data, by_gas, manifest=manifest) == set()
+
+    with open(source, "a") as f:
+        f.write("2023,1\n")
+    assert restructure_pollution_data(pollution_data, by_gas, manifest=manifest) == {"CH4"}
+    assert (by_gas / "gas_CH4" / "src_industry_CH4.csv").read_bytes() == source.read_bytes()
+
+    (pollution_data / "by_src" / "src_industry" / "N2O.csv").unlink()
+    assert restructure_pollution_data(pollution_data, by_gas, manifest=manifest) == {"N2O"}
+    assert not (by_gas / "gas_N2O" / "src_industry_N2O.csv").exists()
+
+
+def test_restructure_pollution_data_incremental_virtual(tmp_workdir: Path):
+    """Test that an incremental restructuring with the virtual strategy finds no change in an unchanged tree
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    by_gas = tmp_workdir / "pollution_data_restructured" / "by_gas"
+    by_gas.mkdir(parents=True)
+    manifest = tmp_workdir / "pollution_data_restructured" / "manifest.json"
+
+    run = lambda: restructure_pollution_data(pollution_data, by_gas, manifest=manifest, strategy="virtual")
+    assert run() == {"CO2", "CH4", "N2O"}
+    assert run() == set()
+
+    with open(pollution_data / "by_src" / "src_industry" / "CH4.csv", "a") as f:
+        f.write("2023,1\n")
+    assert run() == {"CH4"}
+
+
+def test_analyze_pollution_data_incremental(tmp_workdir: Path):
+    """Test that analyze_pollution_data can be run again on an existing pollution_data_restructured in incremental mode
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    analyze_pollution_data(tmp_workdir, incremental=True)
+    figure = tmp_workdir / "pollution_data_restructured" / "figures" / "gas_CO2.png"
+    assert figure.exists()
+    mtime = figure.stat().st_mtime_ns
+
+    analyze_pollution_data(tmp_workdir, incremental=True)
+    assert figure.stat().st_mtime_ns == mtime
+
+
+@pytest.mark.parametrize("strategy", ["hardlink", "symlink", "reflink", "virtual"])
+def test_restructure_pollution_data_strategies(tmp_workdir: Path, strategy: str):
+    """Test that every materialization strategy makes the same data available as copying
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - strategy (str): materialization strategy to test
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    by_gas = tmp_workdir / "by_gas"
+    by_gas.mkdir()
+
+    restructure_pollution_data(pollution_data, by_gas, strategy=strategy)
+
+    source = pollution_data / "by_src" / "src_agriculture" / "CO2.csv"
+    dest = by_gas / "gas_CO2" / "src_agriculture_CO2.csv"
+    if strategy == "virtual":
+        assert (by_gas / "gas_CO2").is_dir()
+        assert not dest.exists()
+    else:
+        assert dest.read_bytes() == source.read_bytes()
+    if strategy == "symlink":
+        assert dest.is_symlink()
+
+
+@pytest.mark.parametrize("strategy", ["hardlink", "virtual"])
+def test_analyze_pollution_data_tmp_strategies(tmp_workdir: Path, strategy: str):
+    """Test analyze_pollution_data_tmp without copying pollution_data
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - strategy (str): materialization strategy to test
+    Returns:
+        - None
+    """
+    analyze_pollution_data_tmp(tmp_workdir, strategy=strategy)
+
+    figures = sorted(p.name for p in (tmp_workdir / "figures").iterdir())
+    assert figures == ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert sorted(p.name for p in tmp_workdir.iterdir()) == ["figures", "pollution_data"]
+
+
+def test_restructure_pollution_data_async(tmp_workdir: Path):
+    """Test that the async restructuring gives the same files as the serial one and reports its progress
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    serial = tmp_workdir / "serial"
+    concurrent = tmp_workdir / "concurrent"
+    serial.mkdir()
+    concurrent.mkdir()
+
+    restructure_pollution_data(pollution_data, serial)
+    progress = []
+    changed = asyncio.run(
+        restructure_pollution_data_async(
+            pollution_data, concurrent, limit=3, progress=lambda stage, done: progress.append((stage, done))
+        )
+    )
+
+    serial_files = sorted(p.relative_to(serial) for p in serial.rglob("*.csv"))
+    concurrent_files = sorted(p.relative_to(concurrent) for p in concurrent.rglob("*.csv"))
+    assert serial_files == concurrent_files
+    for rel in serial_files:
+        assert (serial / rel).read_bytes() == (concurrent / rel).read_bytes()
+    assert changed == {"CO2", "CH4", "N2O"}
+    assert progress == [("restructure", i) for i in range(1, len(serial_files) + 1)]
+
+
+def test_restructure_pollution_data_async_cancel(tmp_workdir: Path):
+    """Test that cancelling the async restructuring stops it before all files are copied
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    pollution_data = tmp_workdir / "pollution_data"
+    by_gas = tmp_workdir / "by_gas"
+    by_gas.mkdir()
+
+    async def run_and_cancel() -> None:
+        task = None
+
+        def cancel_after_first(stage: str, done: int) -> None:
+            task.cancel()
+
+        task = asyncio.ensure_future(
+            restructure_pollution_data_async(pollution_data, by_gas, limit=1, progress=cancel_after_first)
+        )
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_and_cancel())
+    assert len(list(by_gas.rglob("*.csv"))) == 1
+
+
+def test_analyze_pollution_data_async(tmp_workdir: Path, tmp_path: Path):
+    """Test that several work directories can be analyzed concurrently in one event loop
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - tmp_path (pathlib.Path): path to another temporary directory
+    Returns:
+        - None
+    """
+    other_workdir = tmp_path / "other"
+    shutil.copytree(tmp_workdir / "pollution_data", other_workdir / "pollution_data")
+    progress = []
+
+    async def analyze_both() -> None:
+        await asyncio.gather(
+            analyze_pollution_data_async(tmp_workdir, progress=lambda stage, done: progress.append(stage)),
+            analyze_pollution_data_async(other_workdir, limit=2),
+        )
+
+    asyncio.run(analyze_both())
+
+    for work_dir in (tmp_workdir, other_workdir):
+        figures = sorted(p.name for p in (work_dir / "pollution_data_restructured" / "figures").iterdir())
+        assert figures == ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert progress[0] == "scan" and progress[-1] == "plot"
+    assert "restructure" in progress
+
+
+def test_analyze_pollution_data_sharded(tmp_workdir: Path, tmp_path: Path, capsys):
+    """Test that a run split into shards in several processes gives the same output as a run in one process
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - tmp_path (pathlib.Path): path to another temporary directory
+    Returns:
+        - None
+    """
+    other_workdir = tmp_path / "other"
+    shutil.copytree(tmp_workdir / "pollution_data", other_workdir / "pollution_data")
+    analyze_pollution_data(other_workdir, incremental=True)
+    expected = other_workdir / "pollution_data_restructured"
+
+    content = analyze_pollution_data_sharded(tmp_workdir, 3)
+    restructured = tmp_workdir / "pollution_data_restructured"
+
+    def names(dir: Path) -> list:
+        return sorted(p.relative_to(dir).as_posix() for p in dir.rglob("*"))
+
+    assert names(restructured / "by_gas") == names(expected / "by_gas")
+    assert names(restructured / "figures") == names(expected / "figures")
+    assert content["files"] == len([p for p in (tmp_workdir / "pollution_data").rglob("*") if p.is_file()])
+    # A full run hashes no file for a manifest
+    assert not list(restructured.glob("manifest*.json"))
+
+    # The merged manifest is the one of an incremental run
+    analyze_pollution_data_sharded(tmp_workdir, 3, incremental=True)
+    manifest = json.loads((restructured / "manifest.json").read_text())["files"]
+    assert manifest.keys() == json.loads((expected / "manifest.json").read_text())["files"].keys()
+
+    # The shards only plot the gasses changed by any of them
+    figures = {figure.name: figure.stat().st_mtime_ns for figure in (restructured / "figures").iterdir()}
+    with open(tmp_workdir / "pollution_data" / "by_src" / "src_industry" / "CH4.csv", "a") as f:
+        f.write("2023,1\n")
+    analyze_pollution_data_sharded(tmp_workdir, 3, incremental=True)
+    replotted = {name for name, mtime in figures.items() if (restructured / "figures" / name).stat().st_mtime_ns != mtime}
+    assert replotted == {"gas_CH4.png"}
+    manifest = json.loads((restructured / "manifest.json").read_text())["files"]
+
+    # A shard cannot plot before every shard is restructured, the error names the conflicting stages
+    with pytest.raises(SystemExit):
+        main([str(tmp_workdir), "--shard", "0/2", "--stages", "restructure", "plot"])
+    assert "restructure, plot" in capsys.readouterr().err
+    with pytest.raises(ValueError, match="export"):
+        analyze_pollution_data(tmp_workdir, stages=["diagnose", "export"], shard=Shard(0, 2))
+
+    # A shard diagnoses and restructures by default
+    assert main([str(tmp_workdir), "--shard", "1/2", "--incremental"]) == 0
+    assert main([str(tmp_workdir), "--shard", "0/2", "--stages", "diagnose", "restructure", "--incremental"]) == 0
+    assert main([str(tmp_workdir), "--merge-shards", "2"]) == 0
+    merged = json.loads((restructured / "manifest.json").read_text())["files"]
+    assert merged == manifest
+
+    # The command line passes the stages to the shards
+    shutil.rmtree(restructured)
+    assert main([str(tmp_workdir), "--shards", "2", "--stages", "diagnose"]) == 0
+    assert not any((restructured / "by_gas").iterdir())
+    assert not any((restructured / "figures").iterdir())
+    with pytest.raises(SystemExit):
+        main([str(tmp_workdir), "--shards", "2", "--profile"])
+
+
+def test_analyze_pollution_data_sharded_export_npy(tmp_workdir: Path, tmp_path: Path):
+    """Test that the export of a sharded run holds the same series as the export of a run in one process
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - tmp_path (pathlib.Path): path to another temporary directory
+    Returns:
+        - None
+    """
+    from analytic_tools.export import EXPORT_NAME, load_dataset
+
+    other_workdir = tmp_path / "other"
+    shutil.copytree(tmp_workdir / "pollution_data", other_workdir / "pollution_data")
+    stages = ["diagnose", "restructure", "export"]
+    classifier = Classifier(binary=True)
+    analyze_pollution_data(other_workdir, strategy="virtual", stages=stages, classifier=classifier)
+    analyze_pollution_data_sharded(tmp_workdir, 2, strategy="virtual", classifier=classifier, stages=stages)
+
+    expected = load_dataset(other_workdir / "pollution_data_restructured" / EXPORT_NAME)
+    dataset = load_dataset(tmp_workdir / "pollution_data_restructured" / EXPORT_NAME)
+    npy_files = list((tmp_workdir / "pollution_data" / "by_src").glob("*/*.npy"))
+    assert len(dataset) == len(expected) == 15 + len(npy_files)
+
+
+def _start_watch(work_dir: Path, updates: queue.Queue, stop: threading.Event, **kwargs) -> threading.Thread:
+    """Start watch_pollution_data on work_dir in a thread, and return once its initial analysis has drawn every figure"""
+    figures = work_dir / "pollution_data_restructured" / "figures"
+    thread = threading.Thread(
+        target=watch_pollution_data,
+        args=(work_dir,),
+        kwargs=dict(debounce=0.2, polling_interval=0.1, stop=stop, on_update=updates.put, **kwargs),
+    )
+    thread.start()
+    # The figures are drawn by the initial analysis, which may be slow on a loaded machine
+    deadline = time.monotonic() + 60
+    while len(list(figures.glob("*.png"))) < 3 and thread.is_alive() and time.monotonic() < deadline:
+        stop.wait(0.1)
+    assert len(list(figures.glob("*.png"))) == 3
+    return thread
+
+
+def test_watch_pollution_data(tmp_workdir: Path):
+    """Test that the watch mode updates the copies and the figures of the gases whose source files change
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    by_src = tmp_workdir / "pollution_data" / "by_src"
+    by_gas = tmp_workdir / "pollution_data_restructured" / "by_gas"
+    figures = tmp_workdir / "pollution_data_restructured" / "figures"
+    updates = queue.Queue()
+    stop = threading.Event()
+
+    thread = _start_watch(tmp_workdir, updates, stop)
+    try:
+        new_source = by_src / "src_shipping"
+        new_source.mkdir()
+        shutil.copy(by_src / "src_industry" / "CO2.csv", new_source / "CO2.csv")
+        assert updates.get(timeout=30) == {"CO2"}
+        assert (by_gas / "gas_CO2" / "src_shipping_CO2.csv").exists()
+
+        for source in by_src.iterdir():
+            if source.is_dir():
+                (source / "N2O.csv").unlink(missing_ok=True)
+        gases = set()
+        while "N2O" not in gases:
+            gases |= updates.get(timeout=30)
+        assert not (figures / "gas_N2O.png").exists()
+        assert not (by_gas / "gas_N2O").exists()
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+    assert not thread.is_alive()
+
+
+def test_watch_pollution_data_malformed(tmp_workdir: Path, capsys):
+    """Test that the watch mode survives a file it cannot read, and processes it once it is valid
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - capsys: pytest fixture capturing the printed errors
+    Returns:
+        - None
+    """
+    by_src = tmp_workdir / "pollution_data" / "by_src"
+    updates = queue.Queue()
+    stop = threading.Event()
+
+    thread = _start_watch(tmp_workdir, updates, stop)
+    try:
+        new_source = by_src / "src_shipping"
+        new_source.mkdir()
+        # A half-written file
+        (new_source / "CO2.csv").write_text("aar,utslipp\n1990,12\n1991,")
+        output = ""
+        deadline = time.monotonic() + 30
+        while "Could not update" not in output and time.monotonic() < deadline:
+            stop.wait(0.1)
+            output += capsys.readouterr().out
+        assert f"Could not update the CO2 files of {new_source}" in output
+        assert thread.is_alive()
+        assert updates.empty()
+
+        shutil.copy(by_src / "src_industry" / "CO2.csv", new_source / "CO2.csv")
+        assert updates.get(timeout=30) == {"CO2"}
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+    assert not thread.is_alive()
+
+
+def test_watch_pollution_data_npy(tmp_workdir: Path):
+    """Test that the watch mode finds the changed .npy series through the classifier
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    by_src = tmp_workdir / "pollution_data" / "by_src"
+    copy = tmp_workdir / "pollution_data_restructured" / "by_gas" / "gas_CH4" / "src_shipping_CH4_7.npy"
+    updates = queue.Queue()
+    stop = threading.Event()
+
+    thread = _start_watch(tmp_workdir, updates, stop, classifier=Classifier(binary=True))
+    try:
+        new_source = by_src / "src_shipping"
+        new_source.mkdir()
+        shutil.copy(by_src / "src_agriculture" / "CH4_198.npy", new_source / "CH4_7.npy")
+        assert updates.get(timeout=30) == {"CH4"}
+        assert copy.exists()
+
+        (new_source / "CH4_7.npy").unlink()
+        assert updates.get(timeout=30) == {"CH4"}
+        assert not copy.exists()
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+    assert not thread.is_alive()
+
+
+def test_restructuring_does_not_import_numpy_or_matplotlib(tmp_workdir: Path):
+    """Test that scanning and restructuring run without loading numpy and matplotlib, through the functions,
+    analyze_pollution_data and the command line
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    runs = [
+        f"get_diagnostics({str(tmp_workdir / 'pollution_data')!r})\n"
+        f"restructure_pollution_data({str(tmp_workdir / 'pollution_data')!r}, {str(tmp_workdir)!r})\n",
+        f"analyze_pollution_data({str(tmp_workdir)!r}, stages=['diagnose', 'restructure'])\n",
+        f"main([{str(tmp_workdir)!r}, '--stages', 'diagnose', 'restructure', '--cache-dir', {str(tmp_workdir / 'cache')!r}])\n",
+    ]
+    for run in runs:
+        script = (
+            "import sys\n"
+            "from analyze_pollution_data import analyze_pollution_data, get_diagnostics, main, restructure_pollution_data\n"
+            + run
+            + "print(sorted(m for m in ('numpy', 'matplotlib', 'asyncio') if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=Path(__file__).parents[1],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert result.stdout.strip().splitlines()[-1] == "[]"
+        shutil.rmtree(tmp_workdir / "pollution_data_restructured", ignore_errors=True)
+
+
+def test_main_dry_run(tmp_workdir: Path, capsys):
+    """Test that the command line dry run prints the plan without writing anything
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    assert main([str(tmp_workdir), "--dry-run"]) == 0
+
+    out = capsys.readouterr().out
+    assert "restructure: copy 5 files to" in out
+    assert "gas_CO2.png" in out
+    assert not (tmp_workdir / "pollution_data_restructured").exists()
+
+
+def test_main_dry_run_npy(tmp_workdir: Path, monkeypatch, capsys):
+    """Test that the dry run counts the files with the classifier of the run
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    import analyze_pollution_data
+
+    classifiers = []
+    get_diagnostics = analyze_pollution_data.get_diagnostics
+
+    def recording_get_diagnostics(dir, index=None, classifier=None, *args):
+        classifiers.append(classifier)
+        return get_diagnostics(dir, index, classifier, *args)
+
+    monkeypatch.setattr(analyze_pollution_data, "get_diagnostics", recording_get_diagnostics)
+    assert main([str(tmp_workdir), "--dry-run", "--npy"]) == 0
+
+    npy_files = list((tmp_workdir / "pollution_data" / "by_src").glob("*/CH4_*.npy"))
+    assert f"restructure: copy {5 + len(npy_files)} files to" in capsys.readouterr().out
+    assert len(classifiers) == 1 and classifiers[0].binary
+
+
+def test_main_stages(tmp_workdir: Path, capsys):
+    """Test running the stages separately from the command line, with the stage timings and a trace
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    restructured = tmp_workdir / "pollution_data_restructured"
+    assert main([str(tmp_workdir), "--stages", "restructure", "--workers", "2"]) == 0
+    assert len(list((restructured / "by_gas").rglob("*.csv"))) == 15
+    assert not list((restructured / "figures").iterdir())
+
+    trace = tmp_workdir / "trace.json"
+    capsys.readouterr()
+    assert main([str(tmp_workdir), "--stages", "plot", "export", "--profile", "--trace", str(trace)]) == 0
+    out = capsys.readouterr().out
+    assert "Stage timings:" in out
+    assert "figures written" in out
+    assert sorted(p.name for p in (restructured / "figures").iterdir()) == ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert (restructured / "by_gas.gds").exists()
+    assert trace.exists()
+
+    with pytest.raises(ValueError):
+        analyze_pollution_data(tmp_workdir, stages=["tull"])
+
+
+def test_analyze_pollution_data_tree(tmp_workdir: Path, capsys):
+    """Test that the diagnose stage displays the by_src directory tree, not the files next to it
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    analyze_pollution_data(tmp_workdir, stages=["diagnose"])
+    lines = capsys.readouterr().out.splitlines()
+    # The layout printed before the tree could be displayed from any root
+    tree = lines[lines.index("Root: pollution_data /") + 1:]
+    assert "-  src_agriculture" in tree
+    assert all(line.startswith("-  src_") or line.startswith("   - ") and line[5] != " " for line in tree)
+    assert not any(".DS_Store" in line for line in lines)
+    assert not any("LICENCE.txt" in line or "README.md" in line for line in lines)
+
+
+def test_main_catalog(tmp_workdir: Path, monkeypatch, capsys):
+    """Test that the analysis reads the tree from the catalog instead of walking pollution_data
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    import analyze_pollution_data
+
+    catalog = tmp_workdir / "catalog.sqlite"
+    assert main([str(tmp_workdir), "--stages", "diagnose"]) == 0
+    walked = capsys.readouterr().out
+
+    def no_walk(dir):
+        raise AssertionError(f"{dir} was walked")
+
+    monkeypatch.setattr(analyze_pollution_data, "scan_directory", no_walk)
+    assert main([str(tmp_workdir), "--catalog", str(catalog), "--stages", "diagnose", "restructure", "--incremental"]) == 0
+    # The same diagnostics, the tree may be listed in another order
+    out = capsys.readouterr().out
+    assert out.splitlines()[:8] == walked.splitlines()[:8]
+    assert len(list((tmp_workdir / "pollution_data_restructured" / "by_gas").rglob("*.csv"))) == 15
+    assert catalog.exists()
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_workdir), "--catalog", str(catalog), "--shards", "2"])
+
+
+def test_main_stream(tmp_workdir: Path):
+    """Test that the command line runs the restructure and plot stages as the streaming pipeline
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    restructured = tmp_workdir / "pollution_data_restructured"
+    assert main([str(tmp_workdir), "--stream", "--stages", "diagnose", "restructure", "plot", "export"]) == 0
+    assert sorted(p.name for p in (restructured / "figures").iterdir()) == ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert len(list((restructured / "by_gas").rglob("*.csv"))) == 15
+    assert (restructured / "by_gas.gds").exists()
+
+    for kwargs in [{"incremental": True}, {"stages": ["restructure"]}, {"plot_workers": 2}]:
+        with pytest.raises(ValueError):
+            analyze_pollution_data(tmp_workdir, stream=True, **kwargs)
+
+
+def test_main_existing_outputs(tmp_workdir: Path, capsys):
+    """Test that a second plain run stops with a message instead of a traceback
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    assert main([str(tmp_workdir), "--stages", "restructure"]) == 0
+    assert main([str(tmp_workdir), "--stages", "restructure"]) == 1
+    err = capsys.readouterr().err
+    assert "already exists" in err and "--incremental" in err and "--clean" in err
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--stream", "--incremental"],
+        ["--stream", "--stages", "restructure"],
+        ["--dedup", "skip", "--strategy", "virtual"],
+        ["--workers", "0"],
+        ["--plot-workers", "0"],
+        ["--shards", "0"],
+    ],
+)
+def test_main_invalid_options(tmp_workdir: Path, options: list, capsys):
+    """Test that invalid combinations of options end in a command line error, before anything is written
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - options (list): the invalid options
+    Returns:
+        - None
+    """
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_workdir)] + options)
+    assert exit_info.value.code == 2
+    assert "Traceback" not in capsys.readouterr().err
+    assert not (tmp_workdir / "pollution_data_restructured").exists()
+
+
+@pytest.mark.parametrize("options", [[], ["--dry-run"]])
+def test_main_missing_pollution_data(tmp_path: Path, options: list, capsys):
+    """Test that a work directory without pollution_data ends in a command line error, before anything is written
+
+    Parameters:
+        - tmp_path (pathlib.Path): path to an empty temporary directory
+        - options (list): the options of the run
+    Returns:
+        - None
+    """
+    for work_dir in [tmp_path, tmp_path / "missing"]:
+        with pytest.raises(SystemExit) as exit_info:
+            main([str(work_dir)] + options)
+        assert exit_info.value.code == 2
+        assert "has no pollution_data directory" in capsys.readouterr().err
+    assert not any(tmp_path.iterdir())
+
+
+def test_main_cache_max_bytes(tmp_workdir: Path):
+    """Test that the command line bounds the size of the cache of parsed files
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    cache_dir = tmp_workdir / "cache"
+    assert main([str(tmp_workdir), "--cache-dir", str(cache_dir), "--cache-max-bytes", "1000"]) == 0
+    sizes = [p.stat().st_size for p in cache_dir.glob("*.npy")]
+    assert sizes and sum(sizes) <= 1000
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_workdir), "--cache-dir", str(cache_dir), "--cache-max-bytes", "-1"])
+
+
+def test_main_npy(tmp_workdir: Path):
+    """Test that the .npy series are restructured and plotted along with the .csv files
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    assert main([str(tmp_workdir), "--npy", "--stages", "restructure", "plot", "export"]) == 0
+    restructured = tmp_workdir / "pollution_data_restructured"
+    npy_files = list((tmp_workdir / "pollution_data" / "by_src").glob("*/*.npy"))
+    assert len(list((restructured / "by_gas").rglob("*.csv"))) == 15
+    assert len(list((restructured / "by_gas").rglob("*.npy"))) == len(npy_files)
+    assert (restructured / "by_gas" / "gas_CH4" / "src_agriculture_CH4_198.npy").exists()
+    assert sorted(p.name for p in (restructured / "figures").iterdir()) == ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+
+    from analytic_tools.export import load_dataset
+
+    dataset = load_dataset(restructured / "by_gas.gds")
+    assert len(dataset) == 15 + len(npy_files)
+    assert ("CH4", "src_agriculture_198") in dataset
+
+
+@pytest.mark.parametrize("mode", ["skip", "link"])
+def test_restructure_pollution_data_dedup(tmp_workdir: Path, mode: str, capsys):
+    """Test that the files identical to an earlier file are skipped or hard linked instead of copied
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+        - mode (str): dedup mode
+        - capsys: pytest fixture capturing the displayed report
+    Returns:
+        - None
+    """
+    from analytic_tools.classification import Classifier
+    from analytic_tools.tracing import Tracer
+
+    pollution_dir = tmp_workdir / "pollution_data"
+    by_gas = tmp_workdir / "by_gas"
+    by_gas.mkdir()
+    npy_files = list((pollution_dir / "by_src").glob("*/*.npy"))
+    tracer = Tracer()
+    restructure_pollution_data(
+        pollution_dir, by_gas, workers=2, tracer=tracer, classifier=Classifier(binary=True), dedup=mode
+    )
+
+    copies = [p for p in by_gas.rglob("*") if p.is_file()]
+    inodes = {os.stat(p).st_ino for p in copies}
+    duplicates = tracer.counters["duplicate files"]
+    # The .npy series of the archive come in groups of identical files
+    assert duplicates == len(npy_files) - len({p.read_bytes() for p in npy_files}) > 0
+    assert tracer.counters["bytes saved"] == sum(p.stat().st_size for p in npy_files[:duplicates])
+    assert len(inodes) == 15 + len(npy_files) - duplicates
+    assert len(copies) == 15 + len(npy_files) - (duplicates if mode == "skip" else 0)
+
+    # The report is displayed without tracing
+    (tmp_workdir / "other").mkdir()
+    restructure_pollution_data(pollution_dir, tmp_workdir / "other", classifier=Classifier(binary=True), dedup=mode)
+    assert f"Deduplication: {duplicates} duplicate files, {tracer.counters['bytes saved']} bytes saved" in capsys.readouterr().out
+
+    with pytest.raises(ValueError):
+        restructure_pollution_data(pollution_dir, by_gas, strategy="virtual", dedup=mode)
+
+
+def test_analyze_pollution_data_dedup_virtual(tmp_workdir: Path):
+    """Test that a dedup run with the virtual strategy fails before creating any output
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    with pytest.raises(ValueError):
+        analyze_pollution_data(tmp_workdir, strategy="virtual", dedup="skip")
+    assert not (tmp_workdir / "pollution_data_restructured").exists()
+
+
+def test_main_dedup(tmp_workdir: Path, capsys):
+    """Test that the command line reports the bytes saved by the deduplication
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    assert main([str(tmp_workdir), "--stages", "restructure", "--dedup", "link", "--incremental"]) == 0
+    assert "Deduplication: 0 duplicate files, 0 bytes saved" in capsys.readouterr().out
+    assert main([str(tmp_workdir), "--stages", "restructure", "--npy", "--dedup", "link", "--incremental"]) == 0
+    assert "Deduplication: 0 duplicate files" not in capsys.readouterr().out
+    # A second incremental run keeps the links
+    assert main([str(tmp_workdir), "--stages", "restructure", "plot", "--npy", "--dedup", "link", "--incremental"]) == 0
+    by_gas = tmp_workdir / "pollution_data_restructured" / "by_gas"
+    assert len({p.stat().st_ino for p in by_gas.rglob("*.npy")}) < len(list(by_gas.rglob("*.npy")))
+
+
+def test_main_clean(tmp_workdir: Path, monkeypatch, capsys):
+    """Test that the restructured directory of an earlier run is deleted before the stages run again
+
+    Parameters:
+        - tmp_workdir (pathlib.Path): path to temporary directory with pollution_data in it
+    Returns:
+        - None
+    """
+    restructured = tmp_workdir / "pollution_data_restructured"
+    assert main([str(tmp_workdir), "--stages", "restructure"]) == 0
+    (restructured / "by_gas" / "gas_CO2" / "stale.csv").touch()
+
+    # Declining the confirmation keeps everything and stops the run
+    monkeypatch.setattr("builtins.input", lambda question: "no")
+    assert main([str(tmp_workdir), "--stages", "restructure", "--clean"]) == 1
+    assert (restructured / "by_gas" / "gas_CO2" / "stale.csv").exists()
+
+    capsys.readouterr()
+    assert main([str(tmp_workdir), "--stages", "restructure", "--clean", "--yes", "--workers", "2"]) == 0
+    assert "Removed 16 files and 6 directories" in capsys.readouterr().out
+    assert not (restructured / "by_gas" / "gas_CO2" / "stale.csv").exists()
+    assert len(list((restructured / "by_gas").rglob("*.csv"))) == 15
@@ -0,0 +1,55 @@
+""" Test script executing the unit tests for the functions in benchmark_pollution_data.py
+"""
+import json
+from pathlib import Path
+
+from analytic_tools.utilities import get_diagnostics
+from benchmark_pollution_data import STEPS, compare_results, generate_pollution_data, main, run_benchmarks
+import pytest
+
+TINY = {"sources": 2, "gases": 2, "noise_files": 3, "rows": 5}
+
+
+def test_generate_pollution_data(tmp_path: Path):
+    pollution_dir = generate_pollution_data(tmp_path, **TINY)
+
+    res = get_diagnostics(pollution_dir)
+    assert res["files"] == 2 + 2 * (2 + 3)
+    assert res[".csv files"] == 2 * (2 + 1)
+    assert (pollution_dir / "by_src" / "src_0001" / "CH4.csv").read_text().count("\n") == 1 + 5
+
+    with pytest.raises(ValueError):
+        generate_pollution_data(tmp_path / "other", gases=6)
+
+
+def test_run_benchmarks():
+    results = run_benchmarks({"tiny": TINY}, repeat=1)
+
+    timings = results["scales"]["tiny"]["timings"]
+    assert list(timings) == STEPS
+    assert all(seconds > 0 for seconds in timings.values())
+    assert compare_results(results, results) == []
+
+
+def test_compare_results():
+    baseline = {"scales": {"tiny": {"params": TINY, "timings": {"create_plot": 0.1, "get_diagnostics": 0.001}}}}
+    results = {"scales": {"tiny": {"params": TINY, "timings": {"create_plot": 0.2, "get_diagnostics": 0.002}}}}
+
+    regressions = compare_results(results, baseline)
+    # The diagnostics slowdown is below min_seconds
+    assert len(regressions) == 1
+    assert regressions[0].startswith("tiny/create_plot")
+    assert compare_results(results, baseline, tolerance=1.5) == []
+
+    other_params = {"scales": {"tiny": {"params": {**TINY, "rows": 6}, "timings": {"create_plot": 0.1}}}}
+    assert compare_results(results, other_params) == []
+
+
+def test_main(tmp_path: Path):
+    unrelated = {"version": 1, "scales": {"small": {"params": {}, "timings": {}}}}
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(unrelated))
+    output = tmp_path / "results.json"
+
+    assert main(["--scales", "small", "--repeat", "1", "--output", str(output), "--baseline", str(baseline)]) == 0
+    assert set(json.loads(output.read_text())["scales"]["small"]["timings"]) == set(STEPS)
@@ -0,0 +1,60 @@
+""" Test script executing the unit tests for the analytic_tools/cache.py module
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytic_tools.cache import ParseCache
+from analytic_tools.readers import read_csv_series
+
+by_src = Path(__file__).parents[1].resolve() / "pollution_data" / "by_src"
+
+
+def test_parse_cache(tmp_path):
+    source = tmp_path / "CO2.csv"
+    source.write_bytes((by_src / "src_industry" / "CO2.csv").read_bytes())
+    cache = ParseCache(tmp_path / "cache")
+
+    first = cache.load(source)
+    second = cache.load(source)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(second, np.memmap)
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(second, read_csv_series(source))
+
+    # A new cache on the same directory reuses the entries on disk
+    assert ParseCache(tmp_path / "cache").load(source).shape == first.shape
+
+    # A changed file gets a new entry
+    with open(source, "a") as f:
+        f.write("2023,1\n")
+    os.utime(source, ns=(0, 0))
+    assert cache.load(source).shape == (first.shape[0] + 1, 2)
+    assert cache.misses == 2
+
+
+def test_parse_cache_eviction(tmp_path):
+    sources = sorted(by_src.glob("src_industry/[CN]*[24O].csv"))
+    cache = ParseCache(tmp_path / "cache")
+    cache.load(sources[0])
+    entry_size = cache.total_bytes
+
+    cache = ParseCache(tmp_path / "cache", max_bytes=2 * entry_size)
+    for source in sources:
+        cache.load(source)
+    assert cache.total_bytes <= 2 * entry_size
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 2
+
+    # The most recently used entry is still cached
+    hits = cache.hits
+    cache.load(sources[-1])
+    assert cache.hits == hits + 1
+
+
+def test_parse_cache_exceptions(tmp_path):
+    with pytest.raises(TypeError):
+        ParseCache(123)
+    with pytest.raises(ValueError):
+        ParseCache(tmp_path, max_bytes=-1)
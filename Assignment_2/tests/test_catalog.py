@@ -0,0 +1,91 @@
+""" Test script executing the unit tests for the functions in analytic_tools/catalog.py module
+    which is a part of the analytic_tools package
+"""
+import os
+import shutil
+
+from analytic_tools.catalog import Catalog
+from analytic_tools.utilities import get_diagnostics
+import pytest
+
+
+def test_catalog_diagnostics(example_config):
+    root = example_config / "pollution_data"
+    with Catalog(example_config / "catalog.sqlite", root) as catalog:
+        assert catalog.refresh() == 5
+        assert catalog.diagnostics() == get_diagnostics(root)
+        assert catalog.gases() == ["CH4", "CO2", "H2"]
+        assert catalog.gas_files("CO2") == [
+            root / "by_src" / "src_airtraffic" / "CO2.csv",
+            root / "by_src" / "src_oil_and_gass" / "CO2.csv",
+        ]
+
+        index = catalog.index()
+        assert sorted(p.name for p in index.iter_files()) == sorted(p.name for p in root.rglob("*") if p.is_file())
+
+
+def test_catalog_refresh_incremental(tmp_workdir):
+    root = tmp_workdir / "pollution_data"
+    db_path = tmp_workdir / "catalog.sqlite"
+    with Catalog(db_path, root) as catalog:
+        catalog.refresh()
+        source = root / "by_src" / "src_industry" / "CH4.csv"
+        assert catalog.rows(source) == 33
+
+    # A new catalog object reuses the database, and nothing has changed
+    with Catalog(db_path, root) as catalog:
+        assert catalog.refresh() == 0
+
+        new_file = root / "by_src" / "src_industry" / "H2.csv"
+        new_file.write_text("year,value\n1990,1\n")
+        # Make the change visible even on filesystems with coarse modification times
+        os.utime(new_file.parent, ns=(0, 0))
+        assert catalog.refresh() == 1
+        assert catalog.gas_files("H2") == [new_file]
+        assert catalog.rows(new_file) == 1
+
+        shutil.rmtree(root / "by_src" / "src_industry")
+        os.utime(root / "by_src", ns=(0, 0))
+        catalog.refresh()
+        assert catalog.diagnostics() == get_diagnostics(root)
+        assert catalog.gases() == ["CH4", "CO2", "N2O"]
+        assert catalog.rows(source) is None
+
+        # Rewriting a file in place is only seen by a full refresh
+        with open(root / "by_src" / "src_agriculture" / "CO2.csv", "a") as f:
+            f.write("2023,1\n")
+        catalog.refresh()
+        assert catalog.rows(root / "by_src" / "src_agriculture" / "CO2.csv") == 33
+        assert catalog.refresh(full=True) == catalog.diagnostics()["subdirectories"] + 1
+        assert catalog.rows(root / "by_src" / "src_agriculture" / "CO2.csv") == 34
+
+
+@pytest.mark.parametrize(
+    "exception, db_path, root",
+    [(TypeError, None, "pollution_data"), (TypeError, "catalog.sqlite", 123)],
+)
+def test_catalog_exceptions(tmp_path, exception, db_path, root):
+    with pytest.raises(exception):
+        Catalog(db_path, root)
+
+
+def test_catalog_refresh_missing_root(tmp_path):
+    with Catalog(tmp_path / "catalog.sqlite", tmp_path / "missing") as catalog:
+        with pytest.raises(NotADirectoryError):
+            catalog.refresh()
+
+
+def test_catalog_refresh_directory_removed(example_config, monkeypatch):
+    root = example_config / "pollution_data"
+    scandir = os.scandir
+
+    def removed_scandir(path):
+        # src_airtraffic is removed between its stat call and its listing
+        if os.path.basename(path) == "src_airtraffic":
+            raise FileNotFoundError(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", removed_scandir)
+    with Catalog(example_config / "catalog.sqlite", root) as catalog:
+        catalog.refresh()
+        assert "src_airtraffic" not in [node.name for node in catalog.index().find("by_src").subdirs]
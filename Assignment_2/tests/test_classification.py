@@ -0,0 +1,71 @@
+""" Test script executing the unit tests for the functions in analytic_tools/classification.py module
+    which is a part of the analytic_tools package
+"""
+from pathlib import Path
+
+from analytic_tools.classification import Classifier, name_suffix, series_gas
+from analytic_tools.utilities import get_diagnostics, get_dest_dir_from_csv_file, is_gas_csv
+import pytest
+
+
+@pytest.mark.parametrize(
+    "name, suffix",
+    [("CO2.csv", ".csv"), ("CH4.CSV", ".csv"), ("notes.tar.md", ".md"), (".DS_Store", ""), ("README", "")],
+)
+def test_name_suffix(name, suffix):
+    assert name_suffix(name) == suffix
+
+
+def test_classifier_buckets():
+    classifier = Classifier()
+    names = ["CO2.csv", "data.CSV", "x.csv.bak", "a.txt", "b.npy", "README.md", ".DS_Store", "md"]
+
+    assert [classifier.bucket(name) for name in names[:3]] == [".csv files", ".csv files", "other files"]
+    assert classifier.count(names) == {
+        ".csv files": 2,
+        ".txt files": 1,
+        ".npy files": 1,
+        ".md files": 1,
+        "other files": 3,
+    }
+    assert list(classifier.gas_csvs(names)) == ["CO2.csv"]
+
+
+def test_classifier_custom_gases(tmp_path):
+    classifier = Classifier(gases=["NH3"])
+
+    assert classifier.gas_of("NH3.csv") == "NH3"
+    assert classifier.gas_of("CO2.csv") is None
+    assert is_gas_csv("NH3.csv", classifier) is True
+    assert is_gas_csv("NH3.csv") is False
+    assert get_dest_dir_from_csv_file(tmp_path, "NH3.csv", classifier) == tmp_path / "gas_NH3"
+    with pytest.raises(TypeError):
+        Classifier(gases="CO2")
+
+
+def test_classifier_binary(tmp_path):
+    names = ["CO2.csv", "CH4_198.npy", "N2O_12a.npy", "H2O_3.npy", "CO2_GHk.csv", "CO2.npy"]
+    assert list(Classifier().gas_csvs(names)) == ["CO2.csv"]
+    assert list(Classifier(binary=True).gas_csvs(names)) == ["CO2.csv"]
+    assert list(Classifier().gas_series(names)) == ["CO2.csv"]
+    assert list(Classifier(binary=True).gas_series(names)) == ["CO2.csv", "CH4_198.npy"]
+    assert Classifier(binary=True).is_gas_series("CH4_198.npy") is True
+    assert Classifier(binary=True).is_gas_csv("CH4_198.npy") is False
+    assert [series_gas(name) for name in names[:3]] == ["CO2", "CH4", "N2O"]
+
+    assert get_dest_dir_from_csv_file(tmp_path, "CH4_198.npy", Classifier(binary=True)) == tmp_path / "gas_CH4"
+    with pytest.raises(ValueError):
+        get_dest_dir_from_csv_file(tmp_path, "CH4_198.npy")
+
+
+def test_get_diagnostics_classifies_by_file_name(tmp_path):
+    # Files below a directory whose name looks like a file are classified by their own name
+    notes = Path(tmp_path) / "notes.md"
+    notes.mkdir()
+    (notes / "CO2.csv").touch()
+    (notes / "data").touch()
+
+    res = get_diagnostics(tmp_path)
+    assert res[".csv files"] == 1
+    assert res[".md files"] == 0
+    assert res["other files"] == 1
@@ -0,0 +1,71 @@
+""" Test script executing the unit tests for the analytic_tools/dataset.py module
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytic_tools.dataset import GasDataset, source_from_name
+from analytic_tools.readers import read_csv_series
+
+by_src = Path(__file__).parents[1].resolve() / "pollution_data" / "by_src"
+
+
+def test_read_csv_series():
+    for path in by_src.glob("*/*.csv"):
+        if path.stat().st_size == 0:
+            assert read_csv_series(path).shape == (0, 2)
+            continue
+        expected = np.loadtxt(path, delimiter=",", skiprows=1)
+        np.testing.assert_array_equal(read_csv_series(path), expected)
+
+
+def test_read_csv_series_malformed(tmp_path):
+    path = tmp_path / "CO2.csv"
+    path.write_text("aar,utslipp\n1990,12\n1991,tull\n")
+    with pytest.raises(ValueError):
+        read_csv_series(path)
+
+
+def test_read_csv_series_irregular(tmp_path):
+    path = tmp_path / "CO2.csv"
+    path.write_text("aar,utslipp\n1990,12\n\n1991,13\n")
+    np.testing.assert_array_equal(read_csv_series(path), [[1990, 12], [1991, 13]])
+
+    # Only the first two columns are the series
+    path.write_text("aar,utslipp,kilde\n1,2,3\n4,5,6\n")
+    np.testing.assert_array_equal(read_csv_series(path), [[1, 2], [4, 5]])
+
+    path.write_text("aar\n1990\n1991\n")
+    with pytest.raises(ValueError):
+        read_csv_series(path)
+
+
+def test_source_from_name():
+    assert source_from_name("src_oil_and_gass_CH4.csv", "CH4") == "src_oil_and_gass"
+    assert source_from_name("other.csv", "CH4") == "other"
+    assert source_from_name("src_agriculture_CH4_198.npy", "CH4") == "src_agriculture_198"
+    assert source_from_name("src_agriculture_CH4.npy", "CH4") == "src_agriculture"
+
+
+def test_gas_dataset(tmp_path):
+    files = [
+        ("CO2", "src_agriculture", by_src / "src_agriculture" / "CO2.csv"),
+        ("CO2", "src_industry", by_src / "src_industry" / "CO2.csv"),
+        ("CH4", "src_industry", by_src / "src_industry" / "CH4.csv"),
+    ]
+    dataset = GasDataset.from_files(files)
+
+    assert len(dataset) == 3
+    assert dataset.gases() == ["CO2", "CH4"]
+    assert dataset.sources("CO2") == ["src_agriculture", "src_industry"]
+    assert ("CH4", "src_agriculture") not in dataset
+    assert dataset.offsets[-1] == dataset.years.size == dataset.values.size
+
+    years, values = dataset.series("CH4", "src_industry")
+    expected = np.loadtxt(by_src / "src_industry" / "CH4.csv", delimiter=",", skiprows=1)
+    np.testing.assert_array_equal(years, expected[:, 0])
+    np.testing.assert_array_equal(values, expected[:, 1])
+
+    with pytest.raises(KeyError):
+        dataset.series("SF6", "src_industry")
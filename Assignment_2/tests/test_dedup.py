@@ -0,0 +1,32 @@
+""" Test script executing the unit tests for the functions in analytic_tools/dedup.py module
+    which is a part of the analytic_tools package
+"""
+from analytic_tools.dedup import check_mode, find_duplicates
+import pytest
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_find_duplicates(tmp_path, workers):
+    contents = {"a": b"1990,1\n", "b": b"1990,2\n", "c": b"1990,1\n", "d": b"1990,10\n", "e": b"1990,1\n"}
+    paths = []
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths.append(path)
+
+    report = find_duplicates(paths, workers)
+    assert report.duplicates == {tmp_path / "c": tmp_path / "a", tmp_path / "e": tmp_path / "a"}
+    assert report.files == 5
+    # d has a size of its own and is never read
+    assert report.hashed == 4
+    assert report.bytes_saved == 2 * len(b"1990,1\n")
+
+
+def test_find_duplicates_exceptions(tmp_path):
+    assert find_duplicates([]).duplicates == {}
+    with pytest.raises(ValueError):
+        find_duplicates([], 0)
+    with pytest.raises(ValueError):
+        check_mode("delete")
+    with pytest.raises(TypeError):
+        check_mode(None)
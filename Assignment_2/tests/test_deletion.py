@@ -0,0 +1,101 @@
+""" Test script executing the unit tests for the functions in analytic_tools/deletion.py module
+    which is a part of the analytic_tools package
+"""
+import os
+from pathlib import Path
+
+from analytic_tools.deletion import remove_paths
+import pytest
+
+
+def _make_tree(root: Path, depth: int = 3, width: int = 3) -> int:
+    """Create a tree where every directory holds width subdirectories and two files of 10 bytes, return the files."""
+    root.mkdir()
+    (root / "a.csv").write_bytes(b"0123456789")
+    (root / "b.npy").write_bytes(b"0123456789")
+    files = 2
+    if depth:
+        for i in range(width):
+            files += _make_tree(root / f"d{i}", depth - 1, width)
+    return files
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_remove_paths(tmp_path, workers):
+    files = _make_tree(tmp_path / "tree")
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "keep.txt").touch()
+    # Links are removed, never followed
+    (tmp_path / "tree" / "d0" / "link").symlink_to(outside)
+    (tmp_path / "single.txt").write_text("abc")
+
+    dry = remove_paths([tmp_path / "tree", tmp_path / "single.txt"], workers, dry_run=True)
+    assert (dry.files, dry.dirs, dry.bytes_freed) == (files + 2, 40, 10 * files + 3)
+    assert (tmp_path / "tree" / "d0" / "d0" / "d0" / "a.csv").exists()
+
+    report = remove_paths([tmp_path / "tree", tmp_path / "single.txt", tmp_path / "missing"], workers)
+    assert (report.files, report.dirs, report.bytes_freed) == (dry.files, dry.dirs, dry.bytes_freed)
+    assert [path for path, _ in report.errors] == [tmp_path / "missing"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["outside"]
+    assert (outside / "keep.txt").exists()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_remove_paths_hard_links(tmp_path, workers):
+    _make_tree(tmp_path / "tree", 1, 2)
+    # Linked from outside the tree, removing the file frees nothing
+    os.link(tmp_path / "tree" / "a.csv", tmp_path / "kept.csv")
+    # Both links are in the tree, the file is freed once
+    os.link(tmp_path / "tree" / "d0" / "a.csv", tmp_path / "tree" / "d1" / "c.csv")
+
+    dry = remove_paths([tmp_path / "tree"], workers, dry_run=True)
+    report = remove_paths([tmp_path / "tree"], workers)
+    assert (dry.files, dry.bytes_freed) == (report.files, report.bytes_freed) == (7, 50)
+    assert (tmp_path / "kept.csv").read_bytes() == b"0123456789"
+
+
+def test_remove_paths_continues_past_errors(tmp_path, monkeypatch):
+    _make_tree(tmp_path / "tree", 1, 2)
+    unlink = os.unlink
+
+    def failing_unlink(path, *args, **kwargs):
+        if Path(path) == tmp_path / "tree" / "d1" / "a.csv":
+            raise PermissionError(path)
+        unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "unlink", failing_unlink)
+    report = remove_paths([tmp_path / "tree"], workers=2)
+    assert report.files == 5
+    # The file and the directories above it are left
+    assert sorted(path.name for path, _ in report.errors) == ["a.csv", "d1", "tree"]
+    assert sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*")) == [
+        "tree",
+        "tree/d1",
+        "tree/d1/a.csv",
+    ]
+
+
+def test_remove_paths_confirm(tmp_path):
+    _make_tree(tmp_path / "tree", 1, 1)
+    questions = []
+
+    def decline(question):
+        questions.append(question)
+        return False
+
+    report = remove_paths([tmp_path / "tree", tmp_path / "tree" / "a.csv"], confirm=decline)
+    assert report.files == 0
+    assert questions == [f"Remove 1 files and 1 directory trees ({tmp_path / 'tree'}, {tmp_path / 'tree' / 'a.csv'})?"]
+    assert (tmp_path / "tree" / "a.csv").exists()
+
+
+def test_remove_paths_exceptions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for path in [tmp_path, tmp_path.parent, Path(tmp_path.anchor)]:
+        with pytest.raises(ValueError):
+            remove_paths([path])
+    with pytest.raises(TypeError):
+        remove_paths([123])
+    with pytest.raises(ValueError):
+        remove_paths([], workers=0)
@@ -0,0 +1,78 @@
+""" Test script executing the unit tests for the analytic_tools/export.py module
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytic_tools.dataset import GasDataset
+from analytic_tools.export import EXPORT_NAME, export_by_gas, export_dataset, load_dataset
+from analyze_pollution_data import analyze_pollution_data
+
+
+def _assert_same(dataset: GasDataset, loaded: GasDataset):
+    assert loaded.keys == dataset.keys
+    for key in dataset.keys:
+        for expected, actual in zip(dataset.series(*key), loaded.series(*key)):
+            np.testing.assert_array_equal(expected, actual)
+
+
+@pytest.mark.parametrize("name", ["data.gds", "data.npz"])
+def test_export_dataset(tmp_path: Path, name: str):
+    keys = [("CO2", "src_a"), ("CO2", "src_b"), ("CH4", "src_a")]
+    arrays = [np.array([[2000, 1.0], [2001, 2.0]]), np.empty((0, 2)), np.array([[2000, 10.0]])]
+    dataset = GasDataset(keys, arrays)
+
+    path = export_dataset(dataset, tmp_path / name)
+    loaded = load_dataset(path)
+
+    _assert_same(dataset, loaded)
+    if name.endswith(".gds"):
+        assert isinstance(loaded.values, np.memmap)
+
+
+def test_export_dataset_memory_mapped(tmp_path: Path):
+    keys = []
+    for i in range(3):
+        np.save(tmp_path / f"CO2_{i}.npy", np.array([[2000, i], [2001, i + 1.0]]))
+        keys.append(("CO2", f"src_{i}"))
+    dataset = GasDataset.from_files((gas, source, tmp_path / f"CO2_{i}.npy") for i, (gas, source) in enumerate(keys))
+
+    # The series stay views into the memory-mapped files through the plot and export paths
+    years, _ = dataset.subset(["CO2"]).series("CO2", "src_1")
+    assert isinstance(years.base, np.memmap)
+    loaded = load_dataset(export_dataset(dataset, tmp_path / "data.gds"))
+    assert dataset._years is None
+    _assert_same(dataset, loaded)
+    np.testing.assert_array_equal(dataset.values, [0, 1, 1, 2, 2, 3])
+
+
+def test_export_parquet(tmp_path: Path):
+    pytest.importorskip("pyarrow")
+    dataset = GasDataset([("CO2", "src_a"), ("CH4", "src_a")], [np.array([[2000, 1.0]]), np.array([[2000, 2.0]])])
+    _assert_same(dataset, load_dataset(export_dataset(dataset, tmp_path / "data.parquet")))
+
+
+def test_export_exceptions(tmp_path: Path):
+    dataset = GasDataset([], [])
+    with pytest.raises(ValueError):
+        export_dataset(dataset, tmp_path / "data.csv")
+    with pytest.raises(TypeError):
+        load_dataset(None)
+    (tmp_path / "other.gds").write_bytes(b"not a dataset")
+    with pytest.raises(ValueError):
+        load_dataset(tmp_path / "other.gds")
+
+    _assert_same(dataset, load_dataset(export_dataset(dataset, tmp_path / "empty.gds")))
+
+
+def test_analyze_pollution_data_export(tmp_workdir: Path):
+    analyze_pollution_data(tmp_workdir, export=True)
+
+    restructured = tmp_workdir / "pollution_data_restructured"
+    loaded = load_dataset(restructured / EXPORT_NAME)
+    _assert_same(GasDataset.from_by_gas_dir(restructured / "by_gas"), loaded)
+    assert len(loaded) == 15
+
+    other = export_by_gas(restructured / "by_gas", tmp_workdir / "by_gas.npz")
+    _assert_same(loaded, load_dataset(other))
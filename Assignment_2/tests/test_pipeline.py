@@ -0,0 +1,86 @@
+""" Test script executing the unit tests for the streaming pipeline in analytic_tools/pipeline.py module
+"""
+from pathlib import Path
+
+import pytest
+
+from analytic_tools.classification import Classifier
+from analytic_tools.pipeline import classify, discover, parse_stage, plot_stage, stream_pollution_data, threaded
+
+
+def test_threaded():
+    assert list(threaded(iter(range(100)), maxsize=2)) == list(range(100))
+
+    def failing():
+        yield 1
+        raise RuntimeError("stage failed")
+
+    with pytest.raises(RuntimeError):
+        list(threaded(failing()))
+
+    # The consumer may stop early without hanging
+    stream = threaded(iter(range(1000)), maxsize=1)
+    assert next(stream) == 0
+    stream.close()
+
+
+def test_discover(example_config):
+    names = sorted(entry.name for entry in discover(example_config))
+    assert len(names) == 10
+    assert names[0] == "CH4.csv"
+
+
+def test_classify(example_config):
+    names = sorted(path.name for path in classify(discover(example_config)))
+    assert names == ["CH4.csv", "CO2.csv", "CO2.csv", "H2.csv"]
+
+    names = sorted(path.name for path in classify(discover(example_config), Classifier(binary=True)))
+    assert names == ["CH4.csv", "CH4_327.npy", "CO2.csv", "CO2.csv", "H2.csv", "N2O_455.npy"]
+
+
+def test_stream_pollution_data(tmp_workdir: Path):
+    restructured = tmp_workdir / "pollution_data_restructured"
+    figures = list(stream_pollution_data(tmp_workdir / "pollution_data", restructured, queue_size=2))
+
+    expected = ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert sorted(set(p.name for p in figures)) == expected
+    assert sorted(p.name for p in (restructured / "figures").iterdir()) == expected
+    assert len(list((restructured / "by_gas" / "gas_CO2").iterdir())) == 5
+
+
+def test_stream_pollution_data_progressive(tmp_workdir: Path):
+    restructured = tmp_workdir / "pollution_data_restructured"
+    figures = list(
+        stream_pollution_data(tmp_workdir / "pollution_data", restructured, "virtual", refresh_interval=0, dpi=20)
+    )
+    # With no refresh interval every series triggers a drawing of its gas
+    assert len(figures) == 15
+    assert not any((restructured / "by_gas" / "gas_CO2").iterdir())
+
+
+def test_plot_stage_max_series(tmp_workdir: Path, monkeypatch):
+    import analytic_tools.pipeline
+
+    by_src = tmp_workdir / "pollution_data" / "by_src"
+    files = [("CO2", path.parent.name, path) for path in sorted(by_src.glob("*/CO2.csv"))]
+    reads = []
+    load_series = analytic_tools.pipeline.load_series
+
+    def counting_load_series(path, cache=None):
+        reads.append(path)
+        return load_series(path, cache)
+
+    monkeypatch.setattr(analytic_tools.pipeline, "load_series", counting_load_series)
+    figures = list(plot_stage(parse_stage(files), tmp_workdir, refresh_interval=60, dpi=20, max_series=2))
+    assert [p.name for p in figures] == ["gas_CO2.png", "gas_CO2.png"]
+    # Only 2 of the 5 series are kept, the 3 others are released and read again for the last drawing
+    assert len(reads) == 5 + 3
+    with pytest.raises(ValueError):
+        list(plot_stage(iter([]), tmp_workdir, max_series=0))
+
+
+def test_stream_pollution_data_exceptions(tmp_path):
+    with pytest.raises(NotADirectoryError):
+        stream_pollution_data(tmp_path / "pollution_data", tmp_path / "restructured")
+    with pytest.raises(TypeError):
+        stream_pollution_data(123, tmp_path)
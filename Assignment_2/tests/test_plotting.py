@@ -0,0 +1,82 @@
+""" Test script executing the unit tests for the functions in analytic_tools/plotting.py module
+"""
+from pathlib import Path
+import shutil
+
+import pytest
+
+from analytic_tools.plotting import FigureTemplate, create_plot, plot_pollution_data
+
+real_by_gas = Path(__file__).parents[1].resolve() / "pollution_data_restructured" / "by_gas"
+
+
+@pytest.fixture
+def by_gas(tmp_path):
+    """Copy of the gas_[gas_formula] directories of the hand-in pollution_data_restructured/by_gas"""
+    by_gas = tmp_path / "by_gas"
+    for gas_dir in real_by_gas.glob("gas_*"):
+        shutil.copytree(gas_dir, by_gas / gas_dir.name)
+    (tmp_path / "figures").mkdir()
+    return by_gas
+
+
+def test_create_plot(by_gas):
+    figures = by_gas.parent / "figures"
+    create_plot(by_gas / "gas_CO2", figures)
+    assert (figures / "gas_CO2.png").stat().st_size > 0
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_plot_pollution_data(by_gas, workers):
+    figures = by_gas.parent / "figures"
+    timings = plot_pollution_data(by_gas, figures, workers=workers)
+
+    expected = ["gas_CH4.png", "gas_CO2.png", "gas_N2O.png"]
+    assert sorted(timings) == expected
+    assert all(seconds > 0 for seconds in timings.values())
+    assert sorted(p.name for p in figures.iterdir()) == expected
+
+
+def test_plot_pollution_data_nothing_to_plot(by_gas, monkeypatch):
+    import analytic_tools.plotting
+
+    def no_template():
+        raise AssertionError("a figure template was built")
+
+    monkeypatch.setattr(analytic_tools.plotting, "FigureTemplate", no_template)
+    figures = by_gas.parent / "figures"
+    assert plot_pollution_data(by_gas, figures, gases=[]) == {}
+    assert not any(figures.iterdir())
+
+
+def test_plot_pollution_data_exceptions(by_gas):
+    figures = by_gas.parent / "figures"
+    with pytest.raises(ValueError):
+        plot_pollution_data(by_gas, figures, workers=0)
+    with pytest.raises(NotADirectoryError):
+        plot_pollution_data(figures / "by_gas", figures)
+
+
+@pytest.mark.parametrize("fmt", ["png", "svg", "pdf", "rgba"])
+def test_plot_pollution_data_formats(by_gas, fmt):
+    figures = by_gas.parent / "figures"
+    plot_pollution_data(by_gas, figures, fmt=fmt, dpi=50, compress_level=1)
+
+    expected = [f"gas_CH4.{fmt}", f"gas_CO2.{fmt}", f"gas_N2O.{fmt}"]
+    assert sorted(p.name for p in figures.iterdir()) == expected
+    if fmt == "rgba":
+        # 10x8 inches at 50 dpi, four bytes per pixel
+        assert (figures / "gas_CO2.rgba").stat().st_size == 500 * 400 * 4
+
+
+def test_figure_template_reuse(by_gas):
+    figures = by_gas.parent / "figures"
+    template = FigureTemplate()
+    create_plot(by_gas / "gas_CO2", figures, template=template)
+    lines = list(template.ax.get_lines())
+    create_plot(by_gas / "gas_CH4", figures, template=template)
+
+    assert template.ax.get_lines() == lines
+    assert "CH_4" in template.ax.get_title()
+    with pytest.raises(ValueError):
+        create_plot(by_gas / "gas_CH4", figures, fmt="jpeg")
@@ -0,0 +1,67 @@
+""" Test script executing the unit tests for the functions in analytic_tools/readers.py module
+    which is a part of the analytic_tools package
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytic_tools.cache import ParseCache
+from analytic_tools.readers import READERS, load_series, read_npy_series, read_series, register_reader
+
+by_src = Path(__file__).parents[1].resolve() / "pollution_data" / "by_src"
+
+
+def test_read_npy_series():
+    for path in by_src.glob("*/*.npy"):
+        array = read_npy_series(path)
+        # The series are mapped, not read into memory
+        assert isinstance(array, np.memmap)
+        assert array.shape == (33, 2)
+        np.testing.assert_array_equal(array, np.load(path))
+
+
+def test_read_npy_series_normalized(tmp_path):
+    path = tmp_path / "CO2_1.npy"
+    np.save(path, np.array([[1990, 12], [1991, 13]], dtype=np.int32))
+    array = read_series(path)
+    assert array.dtype == np.float64
+    np.testing.assert_array_equal(array, [[1990.0, 12.0], [1991.0, 13.0]])
+
+    np.save(path, np.empty((0, 2)))
+    assert read_series(path).shape == (0, 2)
+
+    np.save(path, np.arange(3.0))
+    with pytest.raises(ValueError):
+        read_series(path)
+
+
+def test_read_series_dispatch(tmp_path):
+    csv = by_src / "src_agriculture" / "CH4.csv"
+    npy = next((by_src / "src_agriculture").glob("CH4_*.npy"))
+    np.testing.assert_array_equal(read_series(csv), read_series(npy))
+
+    with pytest.raises(ValueError):
+        read_series(tmp_path / "CO2.txt")
+
+
+def test_register_reader(tmp_path):
+    path = tmp_path / "CO2.tsv"
+    path.write_text("1990\t12\n1991\t13\n")
+    register_reader(".tsv", lambda file: np.loadtxt(file, delimiter="\t", ndmin=2))
+    try:
+        assert read_series(path).shape == (2, 2)
+    finally:
+        del READERS[".tsv"]
+
+    with pytest.raises(ValueError):
+        register_reader("tsv", read_npy_series)
+
+
+def test_load_series_cache(tmp_path):
+    cache = ParseCache(tmp_path / "cache")
+    load_series(by_src / "src_agriculture" / "CH4.csv", cache)
+    npy = next((by_src / "src_agriculture").glob("CH4_*.npy"))
+    assert isinstance(load_series(npy, cache), np.memmap)
+    # Only the .csv file had to be parsed and cached
+    assert cache.misses == 1
@@ -0,0 +1,109 @@
+""" Test script executing the unit tests for the functions in analytic_tools/scanning.py module
+    which is a part of the analytic_tools package
+"""
+from pathlib import Path
+
+from analytic_tools.scanning import iter_tree, scan_directory, walk_parallel
+from analytic_tools.utilities import get_diagnostics
+import pytest
+
+
+def test_scan_directory(example_config):
+    index = scan_directory(example_config)
+
+    by_src = index.find("pollution_data").find("by_src")
+    assert sorted(node.name for node in by_src.subdirs) == [
+        "src_agriculture",
+        "src_airtraffic",
+        "src_oil_and_gass",
+    ]
+    files = sorted(path.name for path in index.iter_files())
+    assert len(files) == 10
+    assert "H2_mkL.csv" in files
+    assert all(path.is_file() for path in index.iter_files())
+
+
+def test_get_diagnostics_reuses_index(example_config):
+    index = scan_directory(example_config)
+    (Path(example_config) / "added_after_scan.txt").touch()
+
+    assert get_diagnostics(example_config, index)["files"] == 10
+    assert get_diagnostics(example_config)["files"] == 11
+
+
+@pytest.mark.parametrize(
+    "exception, dir",
+    [(TypeError, 123), (NotADirectoryError, "tullball123")],
+)
+def test_scan_directory_exceptions(exception, dir):
+    with pytest.raises(exception):
+        scan_directory(dir)
+
+
+def test_iter_tree(example_config):
+    levels = list(iter_tree(example_config, maxfiles=2))
+    assert [(level.name, level.depth) for level in levels][:2] == [(example_config.name, 0), ("pollution_data", 1)]
+    sources = {level.name: level for level in levels if level.depth == 3}
+    assert sorted(sources) == ["src_agriculture", "src_airtraffic", "src_oil_and_gass"]
+    assert len(sources["src_oil_and_gass"].files) == 2
+    assert sources["src_oil_and_gass"].more_files == 2
+
+    # Reading an index gives the same preview
+    from_index = list(iter_tree(example_config, 2, index=scan_directory(example_config)))
+    assert [(level.path, level.files, level.more_files) for level in from_index] == [
+        (level.path, level.files, level.more_files) for level in levels
+    ]
+
+    by_src = list(iter_tree(example_config, max_depth=2))[-1]
+    assert by_src.name == "by_src"
+    assert by_src.subdirs == by_src.more_subdirs == 3
+    assert len(list(iter_tree(example_config, maxdirs=1))) == 4
+
+
+def test_iter_tree_large_directory(tmp_path):
+    for i in range(5000):
+        (tmp_path / f"{i}.txt").touch()
+    (level,) = iter_tree(tmp_path, maxfiles=3)
+    assert len(level.files) == 3
+    assert level.more_files == 4997
+
+
+def _make_tree(root: Path, depth: int, width: int) -> None:
+    """Create a tree of the given depth where every directory holds width subdirectories and two files."""
+    (root / "a.csv").touch()
+    (root / "b.txt").touch()
+    if depth:
+        for i in range(width):
+            subdir = root / f"d{i}"
+            subdir.mkdir()
+            _make_tree(subdir, depth - 1, width)
+
+
+@pytest.mark.parametrize("workers, max_queue", [(1, 64), (4, 1), (8, 64)])
+def test_walk_parallel(tmp_path, workers, max_queue):
+    _make_tree(tmp_path, 4, 3)
+
+    def visit(seen, path, dirs, files):
+        seen.extend(Path(path, name) for name in files)
+
+    states = walk_parallel(tmp_path, list, visit, workers, max_queue)
+    assert len(states) == workers
+    assert sorted(path for seen in states for path in seen) == sorted(scan_directory(tmp_path).iter_files())
+    assert get_diagnostics(tmp_path, workers=workers) == get_diagnostics(tmp_path)
+
+
+def test_walk_parallel_exceptions(tmp_path):
+    _make_tree(tmp_path, 2, 2)
+
+    def visit(state, path, dirs, files):
+        if Path(path).name == "d1":
+            raise PermissionError(path)
+
+    with pytest.raises(PermissionError):
+        walk_parallel(tmp_path, dict, visit, workers=3)
+    with pytest.raises(NotADirectoryError):
+        walk_parallel(tmp_path / "a.csv", dict, visit)
+    with pytest.raises(ValueError):
+        walk_parallel(tmp_path, dict, visit, workers=0)
+    with pytest.raises(ValueError):
+        get_diagnostics(tmp_path, workers=0)
@@ -0,0 +1,80 @@
+""" Test script executing the unit tests for the functions in analytic_tools/sharding.py module
+    which is a part of the analytic_tools package
+"""
+from analytic_tools.manifest import load_manifest, save_manifest
+from analytic_tools.scanning import scan_directory
+from analytic_tools.sharding import (
+    Shard,
+    load_changes,
+    merge_changes,
+    merge_diagnostics,
+    merge_manifests,
+    save_changes,
+    save_diagnostics,
+    scan_shard,
+    shard_diagnostics,
+    shard_of,
+)
+from analytic_tools.utilities import get_diagnostics
+import pytest
+
+
+def test_shard_of():
+    # The shard depends on the key only, not on the process
+    assert shard_of("src_industry", 4) == shard_of("src_industry", 4)
+    assert {shard_of(f"src_{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+    assert shard_of("CO2", 1) == 0
+
+
+def test_shard_parse():
+    shard = Shard.parse("1/3")
+    assert shard == Shard(1, 3)
+    assert shard.name == "shard-1-of-3"
+    assert sum(Shard(i, 3).owns("CH4") for i in range(3)) == 1
+
+    for text in ["3/3", "-1/2", "1", "a/b", "0/0"]:
+        with pytest.raises(ValueError):
+            Shard.parse(text)
+    with pytest.raises(TypeError):
+        Shard(0.5, 2)
+
+
+@pytest.mark.parametrize("count", [1, 2, 5])
+def test_scan_shard(example_config, count):
+    root = example_config / "pollution_data"
+    (root / "README.md").touch()
+    full = scan_directory(root)
+    shards = [Shard(i, count) for i in range(count)]
+    indexes = [scan_shard(root, shard) for shard in shards]
+
+    # Every file is read by exactly one shard
+    files = sorted(path for index in indexes for path in index.iter_files())
+    assert files == sorted(full.iter_files())
+
+    # Added up, the diagnostics of the shards are those of the whole tree
+    paths = []
+    for shard, index in zip(shards, indexes):
+        path = example_config / f"{shard.name}.json"
+        save_diagnostics(path, shard_diagnostics(root, index, shard))
+        paths.append(path)
+    assert merge_diagnostics(paths) == get_diagnostics(root, full)
+
+
+def test_merge_manifests(tmp_path):
+    save_manifest(tmp_path / "a.json", {"by_src/src_a/CO2.csv": {"gas": "CO2"}})
+    save_manifest(tmp_path / "b.json", {"by_src/src_b/CO2.csv": {"gas": "CO2"}})
+
+    dest = tmp_path / "manifest.json"
+    assert merge_manifests([tmp_path / "a.json", tmp_path / "b.json", tmp_path / "missing.json"], dest) == 2
+    assert sorted(load_manifest(dest)) == ["by_src/src_a/CO2.csv", "by_src/src_b/CO2.csv"]
+
+
+def test_merge_changes(tmp_path):
+    save_changes(tmp_path / "a.json", {"CO2"})
+    save_changes(tmp_path / "b.json", {"CH4", "CO2"})
+
+    dest = tmp_path / "changes.json"
+    assert merge_changes([tmp_path / "a.json", tmp_path / "b.json", tmp_path / "missing.json"], dest) == {"CO2", "CH4"}
+    assert load_changes(dest) == {"CO2", "CH4"}
+    assert not (tmp_path / "a.json").exists()
+    assert load_changes(tmp_path / "a.json") is None
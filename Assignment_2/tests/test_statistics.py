@@ -0,0 +1,66 @@
+""" Test script executing the unit tests for the analytic_tools/statistics.py module
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from analytic_tools.classification import DEFAULT_CLASSIFIER
+from analytic_tools.dataset import GasDataset
+from analytic_tools.statistics import GWP_AR5, GWP_AR5_H2, EmissionsTable, summarize
+
+by_src = Path(__file__).parents[1].resolve() / "pollution_data" / "by_src"
+
+
+@pytest.fixture
+def dataset():
+    keys = [("CO2", "src_a"), ("CO2", "src_b"), ("CH4", "src_a")]
+    arrays = [
+        np.array([[2000, 1.0], [2001, 2.0], [2002, 3.0]]),
+        np.array([[2001, 4.0], [2002, 2.0]]),
+        np.array([[2000, 10.0], [2002, 30.0]]),
+    ]
+    return GasDataset(keys, arrays)
+
+
+def test_emissions_table(dataset):
+    table = EmissionsTable.from_dataset(dataset)
+
+    np.testing.assert_array_equal(table.years, [2000, 2001, 2002])
+    np.testing.assert_array_equal(table.values[1], [np.nan, 4.0, 2.0])
+    assert table.gases == ["CO2", "CH4"]
+    np.testing.assert_array_equal(table.totals(), [[1.0, 6.0, 5.0], [10.0, np.nan, 30.0]])
+    np.testing.assert_allclose(table.shares()[0], [1.0, 2 / 6, 3 / 5])
+    np.testing.assert_allclose(table.year_over_year()[0], [1.0, 0.5])
+    np.testing.assert_array_equal(table.year_over_year(relative=False)[2], [np.nan, np.nan])
+    np.testing.assert_allclose(table.trend_slopes(), [1.0, -2.0, 10.0])
+    np.testing.assert_array_equal(table.co2_equivalent(), [11.0, 6.0, 35.0])
+    np.testing.assert_array_equal(table.co2_equivalent(GWP_AR5), [1.0 + 280.0, 6.0, 5.0 + 840.0])
+    with pytest.raises(KeyError):
+        table.co2_equivalent({"CO2": 1.0})
+
+
+def test_gwp_ar5_default_gases():
+    # AR5 has no factor for H2, the extended table gives every gas recognized by default one
+    assert "H2" not in GWP_AR5
+    assert set(DEFAULT_CLASSIFIER.gases) <= set(GWP_AR5_H2)
+    table = EmissionsTable.from_dataset(
+        GasDataset([("H2", "src_a"), ("CO2", "src_a")], [np.array([[2000, 2.0]]), np.array([[2000, 3.0]])])
+    )
+    np.testing.assert_array_equal(table.co2_equivalent(GWP_AR5_H2), [22.0 + 3.0])
+    with pytest.raises(KeyError, match="H2"):
+        table.co2_equivalent(GWP_AR5)
+
+
+def test_summarize_pollution_data():
+    files = [(path.stem, path.parent.name, path) for path in sorted(by_src.glob("*/CO2.csv"))]
+    dataset = GasDataset.from_files(files)
+    summary = summarize(dataset)
+
+    np.testing.assert_array_equal(summary["years"], np.arange(1990, 2023))
+    assert summary["shares"].shape == (len(files), 33)
+    np.testing.assert_allclose(np.nansum(summary["shares"], axis=0), 1.0)
+    np.testing.assert_allclose(summary["co2_equivalent"], summary["totals"][0])
+    for i, (_, _, path) in enumerate(files):
+        data = np.loadtxt(path, delimiter=",", skiprows=1)
+        assert summary["trend_slopes"][i] == pytest.approx(np.polyfit(data[:, 0], data[:, 1], 1)[0])
@@ -0,0 +1,74 @@
+""" Test script executing the unit tests for the functions in analytic_tools/tracing.py module
+    which is a part of the analytic_tools package
+"""
+import json
+from pathlib import Path
+import pstats
+
+from analytic_tools.tracing import NULL_TRACER, Tracer
+from analyze_pollution_data import analyze_pollution_data, restructure_pollution_data
+import pytest
+
+
+def test_tracer_spans_and_counters(tmp_path: Path):
+    with Tracer(memory=True) as tracer:
+        with tracer.span("scan"):
+            data = [0] * 10000
+        tracer.count("files scanned", 3)
+        tracer.count("files scanned")
+        tracer.record("render", 0, 2_000_000, "file", figure="gas_CO2.png")
+
+    assert [span.name for span in tracer.spans] == ["scan", "render"]
+    assert tracer.counters == {"files scanned": 4}
+    assert tracer.totals("file")["render"] == pytest.approx(0.002)
+    assert "render" not in tracer.totals()
+    assert tracer.memory_peak >= len(data)
+
+    trace_path = tmp_path / "trace.json"
+    tracer.save(trace_path)
+    trace = json.loads(trace_path.read_text())
+    phases = [event["ph"] for event in trace["traceEvents"]]
+    assert phases == ["X", "X", "C"]
+    assert trace["otherData"]["counters"] == {"files scanned": 4}
+
+    with pytest.raises(ValueError):
+        tracer.save_profile(tmp_path / "run.prof")
+
+
+def test_null_tracer():
+    with NULL_TRACER:
+        with NULL_TRACER.span("scan", path="x"):
+            pass
+        NULL_TRACER.count("files scanned")
+    assert not NULL_TRACER.enabled
+
+
+def test_analyze_pollution_data_traced(tmp_workdir: Path):
+    with Tracer(profile=True) as tracer:
+        analyze_pollution_data(tmp_workdir, tracer=tracer)
+
+    totals = tracer.totals()
+    for stage in ["scan", "diagnostics", "restructure", "copy", "parse", "plot"]:
+        assert stage in totals
+    # A stage contains the file operations it runs
+    assert totals["copy"] <= totals["restructure"]
+    assert set(tracer.totals("file")) == {"copy", "render"}
+    assert tracer.counters["files copied"] == 15
+    assert tracer.counters["bytes copied"] > 0
+    assert tracer.counters["figures written"] == 3
+    assert tracer.counters["rows parsed"] == 15 * 33
+
+    profile_path = tmp_workdir / "run.prof"
+    tracer.save_profile(profile_path)
+    assert pstats.Stats(str(profile_path)).total_calls > 0
+
+
+def test_restructure_virtual_traced(tmp_workdir: Path):
+    by_gas = tmp_workdir / "by_gas"
+    by_gas.mkdir()
+    with Tracer() as tracer:
+        restructure_pollution_data(tmp_workdir / "pollution_data", by_gas, strategy="virtual", tracer=tracer)
+
+    # Nothing is written with the virtual strategy
+    assert "files copied" not in tracer.counters
+    assert "bytes copied" not in tracer.counters
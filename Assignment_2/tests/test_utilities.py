@@ -3,6 +3,7 @@
 """
 
 # Include the necessary packages here
+import json
 from pathlib import Path
 
 # This should work if analytic_tools has been installed properly in your environment
@@ -11,6 +12,8 @@ from analytic_tools.utilities import (
     get_diagnostics,
     display_diagnostics,
     display_directory_tree,
+    display_sources_tree,
+    delete_directories,
     is_gas_csv,
     merge_parent_and_basename,
 )
@@ -150,3 +153,62 @@ def test_merge_parent_and_basename():
 def test_merge_parent_and_basename_exceptions(exception, path):
     with pytest.raises(exception): 
         merge_parent_and_basename(path)
+
+
+def test_display_directory_tree_formats(example_config, capsys):
+    by_src = example_config / "pollution_data" / "by_src"
+    display_directory_tree(by_src, 2)
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "Root: by_src /"
+    assert "-  src_oil_and_gass" in out
+    assert "   - (2 more)" in out
+
+    display_directory_tree(example_config, 1, max_depth=2, fmt="json")
+    tree = json.loads(capsys.readouterr().out)
+    assert tree["subdirs"][0]["name"] == "pollution_data"
+    assert tree["subdirs"][0]["subdirs"][0]["more_subdirs"] == 3
+
+    for kwargs in [{"max_depth": -1}, {"maxdirs": 0}, {"fmt": "xml"}]:
+        with pytest.raises(ValueError):
+            display_directory_tree(example_config, 3, **kwargs)
+
+
+def test_display_sources_tree(example_config, capsys):
+    pollution_dir = example_config / "pollution_data"
+    (pollution_dir / "README.md").touch()
+    (pollution_dir / "by_src" / ".DS_Store").touch()
+    display_sources_tree(pollution_dir, 2)
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "Root: pollution_data /"
+    assert "-  src_oil_and_gass" in out
+    assert "   - (2 more)" in out
+    assert not any("README.md" in line or ".DS_Store" in line for line in out)
+
+    with pytest.raises(NotADirectoryError):
+        display_sources_tree(pollution_dir / "by_src")
+
+
+def test_delete_directories(example_config, monkeypatch, capsys):
+    answers = iter(["no", "yes"])
+    questions = []
+
+    def fake_input(question):
+        questions.append(question)
+        return next(answers)
+
+    monkeypatch.setattr("builtins.input", fake_input)
+    targets = [example_config / "pollution_data" / "by_src" / "src_airtraffic", example_config / "pollution_data" / "by_src" / "src_agriculture"]
+    assert delete_directories(targets).files == 0
+    assert all(target.exists() for target in targets)
+
+    # One question for the whole batch, non-empty directories included
+    report = delete_directories(targets)
+    assert len(questions) == 2
+    assert (report.files, report.dirs, report.errors) == (6, 2, [])
+    assert not any(target.exists() for target in targets)
+    assert "Removed 6 files and 2 directories, 0 bytes" in capsys.readouterr().out
+
+    remaining = example_config / "pollution_data" / "by_src" / "src_oil_and_gass"
+    assert delete_directories([remaining], confirm=False, dry_run=True).files == 4
+    assert delete_directories([remaining], confirm=False).dirs == 1
+    assert len(questions) == 2
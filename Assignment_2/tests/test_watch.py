@@ -0,0 +1,70 @@
+""" Test script executing the unit tests for the functions in analytic_tools/watch.py module
+    which is a part of the analytic_tools package
+"""
+from analytic_tools.watch import InotifyWatcher, PollingWatcher, affected_sources, open_watcher
+import pytest
+
+
+def _watchers():
+    yield PollingWatcher
+    try:
+        InotifyWatcher(".").close()
+    except OSError:
+        return
+    yield InotifyWatcher
+
+
+def _wait_for(watcher, expected, timeout=5.0):
+    changed = set()
+    for _ in range(int(timeout / 0.1)):
+        changed |= watcher.changes(0.1)
+        if expected <= changed:
+            break
+    return changed
+
+
+@pytest.mark.parametrize("watcher_class", list(_watchers()))
+def test_watcher_changes(tmp_path, watcher_class):
+    (tmp_path / "src_a").mkdir()
+    existing = tmp_path / "src_a" / "CO2.csv"
+    existing.write_text("year,value\n")
+
+    if watcher_class is PollingWatcher:
+        watcher = watcher_class(tmp_path, interval=0.05)
+    else:
+        watcher = watcher_class(tmp_path)
+
+    with watcher:
+        assert watcher.changes(0.1) == set()
+
+        new_dir = tmp_path / "src_b"
+        new_dir.mkdir()
+        new_file = new_dir / "CH4.csv"
+        new_file.write_text("year,value\n1990,1\n")
+        assert new_file in _wait_for(watcher, {new_file})
+
+        existing.unlink()
+        assert existing in _wait_for(watcher, {existing})
+
+
+def test_open_watcher_polling(tmp_path):
+    with open_watcher(tmp_path, polling_interval=0.5) as watcher:
+        assert isinstance(watcher, PollingWatcher)
+
+    with pytest.raises(NotADirectoryError):
+        open_watcher(tmp_path / "missing")
+
+
+def test_affected_sources(tmp_path):
+    changed = [
+        tmp_path / "src_a" / "CO2.csv",
+        tmp_path / "src_a" / "CO2_123.csv",
+        tmp_path / "src_b",
+        tmp_path.parent / "elsewhere.csv",
+    ]
+    affected = affected_sources(tmp_path, changed)
+
+    assert ("src_a", "CO2") in affected
+    assert ("src_b", "N2O") in affected
+    assert {source for source, _ in affected} == {"src_a", "src_b"}
+